@@ -0,0 +1,188 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+class AnswerBank:
+    """
+    Precomputed answers to a document's frequently asked questions, stored as one
+    gzipped JSON file: {normalized question: {"question", "answer", "pdf_hash", "cost", "generated_at"}}.
+
+    An answer is only served for the PDF hash it was generated from, so answers go
+    stale (and are regenerated by the next build) when the PDF changes. The file
+    is re-read when its mtime changes, so running app processes pick up a rebuild.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._answers = {}
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _reload(self):
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._answers, self._mtime_ns = {}, None
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                self._answers = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable answer bank {self.path}: {e}")
+            self._answers = {}
+        self._mtime_ns = mtime_ns
+
+    def get(self, question, pdf_hash):
+        """The banked answer to the question for this version of the PDF, or None"""
+        hit = self.lookup(question, pdf_hash)
+        return hit and hit[0]
+
+    def lookup(self, question, pdf_hash):
+        """Like get(), but returns (answer, what it cost to generate) or None"""
+        with self._lock:
+            self._reload()
+            entry = self._answers.get(normalize_question(question))
+            if entry is None or entry["pdf_hash"] != pdf_hash:
+                return None
+            self.hits += 1
+            return entry["answer"], entry["cost"]
+
+    def stale(self, questions, pdf_hash):
+        """Questions with no answer for this version of the PDF"""
+        with self._lock:
+            self._reload()
+            return [q for q in questions
+                    if self._answers.get(normalize_question(q), {}).get("pdf_hash") != pdf_hash]
+
+    def put(self, question, pdf_hash, answer, cost):
+        with self._lock:
+            self._answers[normalize_question(question)] = {
+                "question": question,
+                "answer": answer,
+                "pdf_hash": pdf_hash,
+                "cost": cost,
+                "generated_at": time.time(),
+            }
+
+    def retain(self, questions):
+        """Drop answers to questions that are no longer in the list; returns how many"""
+        keep = {normalize_question(q) for q in questions}
+        with self._lock:
+            dropped = [key for key in self._answers if key not in keep]
+            for key in dropped:
+                del self._answers[key]
+            return len(dropped)
+
+    def save(self):
+        """Write the bank atomically (readers never see a partial file)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._answers, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".answer_bank_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def __len__(self):
+        with self._lock:
+            self._reload()
+            return len(self._answers)
+
+def build(bank, questions, pdf_hash, answer, concurrency=4, force=False):
+    """
+    Answer the questions the bank has no current answer for, `concurrency` at a
+    time, with answer(question) -> (text, cost). Answers to questions no longer in
+    the list are dropped. What was answered is saved even if some questions fail.
+    """
+    todo = list(questions) if force else bank.stale(questions, pdf_hash)
+    summary = {"questions": len(questions), "current": len(questions) - len(todo), "answered": 0, "failed": 0,
+               "dropped": bank.retain(questions), "cost": 0.0}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(answer, question): question for question in todo}
+            for future in as_completed(futures):
+                question = futures[future]
+                try:
+                    text, cost = future.result()
+                except Exception as e:
+                    logger.error(f"Could not answer '{question}': {e}")
+                    summary["failed"] += 1
+                    continue
+                bank.put(question, pdf_hash, text, cost)
+                summary["answered"] += 1
+                summary["cost"] += cost
+    finally:
+        if summary["answered"] or summary["dropped"]:
+            bank.save()
+    return summary
+
+# Banks loaded in this process, shared by every session: path -> AnswerBank
+_banks = {}
+_banks_lock = threading.Lock()
+
+def get_answer_bank(directory, doc_id, language):
+    """The bank of a document's answers in one language ("english" or "telugu")"""
+    path = os.path.abspath(os.path.join(directory, f"{doc_id}.{language}.json.gz"))
+    with _banks_lock:
+        bank = _banks.get(path)
+        if bank is None:
+            bank = _banks[path] = AnswerBank(path)
+        return bank
+
+def read_questions(path):
+    """One question per line; blank lines, # comments and repeats (after normalizing) are skipped"""
+    questions = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                questions.setdefault(normalize_question(line), line.strip())
+    return list(questions.values())
+
+# Prewarm the answer bank from a list of FAQ questions, e.g.
+# python answer_bank.py faq.txt --concurrency 4
+# Re-running after the PDF changes only regenerates answers made from the old PDF.
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers to frequently asked questions")
+    parser.add_argument("questions", help="text file with one question per line")
+    parser.add_argument("--document", help="document id (default: the default document)")
+    parser.add_argument("--language", choices=("english", "telugu"),
+                        help="answer language (default FIRST_LANGUAGE; sessions in \"both\" mode translate it)")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions answered at once")
+    parser.add_argument("--force", action="store_true", help="regenerate every answer, not just missing or stale ones")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    import chat_engine  # needs the API key and the engine's configuration
+
+    doc_id = args.document or chat_engine.DEFAULT_DOCUMENT_ID
+    language = args.language or chat_engine.FIRST_LANGUAGE
+    if chat_engine.start_session(doc_id)["ready"] is False:
+        raise SystemExit(f"No context cache could be created for {doc_id}")
+    bank = get_answer_bank(chat_engine.ANSWER_BANK_DIR, doc_id, language)
+    pdf_hash = chat_engine.get_pdf_hash(doc_id)
+
+    started = time.perf_counter()
+    summary = build(bank, questions, pdf_hash, lambda q: chat_engine.precompute_answer(doc_id, q, language), args.concurrency, args.force)
+    print(f"{summary['answered']} answered, {summary['failed']} failed, "
+          f"{summary['current']} already current, {summary['dropped']} dropped "
+          f"in {time.perf_counter() - started:.1f}s, cost ${summary['cost']:.4f}; {len(bank)} answers in {bank.path}")
+
+if __name__ == "__main__":
+    main()
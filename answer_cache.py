@@ -0,0 +1,154 @@
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+def normalize_question(question):
+    """Lowercase, drop punctuation/symbols and collapse whitespace (keeps Telugu vowel signs)"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class AnswerCache:
+    """
+    Answers shared by all sessions, keyed on (document, PDF hash, normalized question).
+
+    Entries expire after `ttl_seconds` and the least recently used are evicted past
+    `max_entries`. A document's answers are dropped as soon as a lookup sees a new
+    PDF hash for it.
+    If `embed` is given, an exact miss falls back to the most similar cached
+    question above `similarity_threshold` (brute-force cosine over the entries).
+    """
+    def __init__(self, max_entries=500, ttl_seconds=24 * 3600, embed=None, similarity_threshold=0.92,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._embed = lru_cache(maxsize=256)(embed) if embed else None
+        self._entries = OrderedDict()  # (scope, normalized question) -> entry dict
+        self._pdf_hashes = {}  # scope -> PDF hash the scope's entries were generated from
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_cost = 0.0
+
+    def _check_pdf_hash(self, scope, pdf_hash):
+        if self._pdf_hashes.get(scope) != pdf_hash:
+            stale = [key for key in self._entries if key[0] == scope]
+            if stale:
+                logger.info(f"PDF {scope} changed, dropping {len(stale)} cached answers")
+            for key in stale:
+                del self._entries[key]
+            self._pdf_hashes[scope] = pdf_hash
+
+    def _expire(self):
+        now = self.clock()
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def _embedding(self, normalized):
+        try:
+            return self._embed(normalized)
+        except Exception as e:
+            logger.warning(f"Could not embed question for answer cache: {e}")
+            return None
+
+    def _semantic_match(self, scope, embedding):
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if key[0] == scope and entry["embedding"] is not None:
+                score = cosine_similarity(embedding, entry["embedding"])
+                if score >= best_score:
+                    best_key, best_score = key, score
+        return best_key
+
+    def get(self, question, pdf_hash, scope="default"):
+        """Return a cached answer for the question about document `scope`, or None"""
+        hit = self.lookup(question, pdf_hash, scope)
+        return hit and hit[0]
+
+    def lookup(self, question, pdf_hash, scope="default"):
+        """Like get(), but returns (answer, what it cost to generate) or None"""
+        normalized = normalize_question(question)
+        with self._lock:
+            self._check_pdf_hash(scope, pdf_hash)
+            self._expire()
+            if (scope, normalized) in self._entries:
+                return self._hit((scope, normalized))
+            if not self._embed or not self._entries:
+                self.misses += 1
+                return None
+
+        # The embedding is a network call on a miss, so other sessions' lookups must not wait on it
+        embedding = self._embedding(normalized)
+        with self._lock:
+            key = self._semantic_match(scope, embedding) if embedding is not None else None
+            if key is None:
+                self.misses += 1
+                return None
+            self.semantic_hits += 1
+            return self._hit(key)
+
+    def _hit(self, key):
+        entry = self._entries[key]
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_cost += entry["cost"]
+        return entry["answer"], entry["cost"]
+
+    def put(self, question, pdf_hash, answer, cost, scope="default"):
+        """Store an answer and what it cost to generate"""
+        normalized = normalize_question(question)
+        embedding = self._embedding(normalized) if self._embed else None
+        with self._lock:
+            self._check_pdf_hash(scope, pdf_hash)
+            self._entries[(scope, normalized)] = {
+                "answer": answer,
+                "cost": cost,
+                "created_at": self.clock(),
+                "embedding": embedding,
+            }
+            self._entries.move_to_end((scope, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+                "saved_cost": self.saved_cost,
+            }
+
+# One answer cache per process, shared by all Streamlit sessions
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache(**kwargs):
+    """Create the process-wide answer cache on first call and return it on every call"""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(**kwargs)
+        return _answer_cache
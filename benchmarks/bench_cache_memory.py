@@ -0,0 +1,70 @@
+"""
+Memory benchmark: tracemalloc peak while building the cache-creation request
+for synthetic 50, 300 and 1000-page PDFs, against the fake genai backend.
+
+  legacy    read bytes -> base64 bytes -> str -> (SDK decodes back to bytes)
+  inline    mmap -> one raw bytes copy handed to the protobuf Blob
+  file_api  File API upload read from disk one resumable chunk at a time
+            (the SDK uses 100 MB chunks); the cache request only carries a URI
+
+Usage: python benchmarks/bench_cache_memory.py [kb_per_page]
+"""
+import base64
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_genai
+from pdf_upload import inline_pdf_part, upload_pdf_part
+
+PAGE_COUNTS = (50, 300, 1000)
+
+def legacy_part(path):
+    """The original create_global_pdf_cache() encoding"""
+    with open(path, "rb") as file:
+        file_bytes = file.read()
+    pdf_base64 = base64.b64encode(file_bytes).decode('utf-8')
+    return {"inline_data": {"mime_type": "application/pdf", "data": pdf_base64}}
+
+PATHS = {
+    "legacy": legacy_part,
+    "inline": inline_pdf_part,
+    "file_api": lambda path: upload_pdf_part(fake_genai, path, "bench"),
+}
+
+def create_cache(make_part, path):
+    pdf_content = {"role": "user", "parts": [{"text": "Here is the PDF document to analyze"}, make_part(path)]}
+    return fake_genai.caching.CachedContent.create(
+        model="models/gemini-2.0-flash-001",
+        contents=[pdf_content],
+        ttl=timedelta(hours=1),
+    )
+
+def peak_mb(make_part, path):
+    tracemalloc.start()
+    create_cache(make_part, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def main():
+    kb_per_page = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    fake_genai.CachedContent.create_latency = 0
+
+    print(f"{'pages':>6} {'file MB':>8} " + " ".join(f"{name + ' MB':>12}" for name in PATHS))
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in PAGE_COUNTS:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            with open(path, "wb") as file:
+                file.write(b"%PDF-1.7\n" + os.urandom(pages * kb_per_page * 1024))
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            peaks = [peak_mb(make_part, path) for make_part in PATHS.values()]
+            print(f"{pages:>6} {size_mb:>8.1f} " + " ".join(f"{peak:>12.1f}" for peak in peaks))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: work per Streamlit rerun for the chat history, against history length.
+
+  legacy    every turn re-rendered as two inline-styled markdown elements, plus
+            the chat-input <style> block emitted again inside the chat area
+  windowed  what main.py does: the last CHAT_PAGE_TURNS turns from
+            chat_engine.open_session(), one element per turn, HTML built once per
+            message (chat_render.turn_html) with styles in the page CSS
+
+The windowed path runs the real chat engine (fake_genai installed, its
+session store in a temporary directory), so pages reaching past the turns
+it keeps in memory include the session store reads.
+
+Streamlit cannot run here, so the script reports what each rerun hands to it:
+HTML build time, markdown elements and bytes serialized to the browser.
+
+Usage: python benchmarks/bench_chat_render.py [page_turns]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_genai
+from chat_render import turn_html
+
+HISTORY_LENGTHS = (10, 50, 200, 500)
+RERUNS = 20
+
+CHAT_INPUT_STYLE = """
+        <style>
+        .chat-input-container {
+            display: flex;
+            align-items: end;
+            gap: 10px;
+            margin-top: 20px;
+        }
+        .chat-input-container .stTextInput {
+            flex: 1;
+        }
+        .chat-input-container .stButton {
+            margin-top: 0;
+        }
+        </style>
+        """
+
+def legacy_user_html(q):
+    return f"""
+            <div class="chat-user" style="padding: 12px; border-radius: 12px; margin: 8px 0; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+                <strong style="color: #1976d2;">🧑 You:</strong><br>
+                <span style="color: #1f1f1f;">{q}</span>
+            </div>
+            """
+
+def legacy_assistant_html(a):
+    return f"""
+            <div class="chat-assistant" style="padding: 12px; border-radius: 12px; margin: 8px 0; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+                <strong style="color: #7b1fa2;">🤖 Assistant:</strong><br>
+                <span style="color: #1f1f1f;">{a}</span>
+            </div>
+            """
+
+def legacy_rerun(history):
+    elements = []
+    for q, a in history:
+        elements.append(legacy_user_html(q))
+        elements.append(legacy_assistant_html(a))
+    elements.append(CHAT_INPUT_STYLE)
+    return elements
+
+def windowed_rerun(chat_engine, session_id, page_turns):
+    session = chat_engine.open_session(session_id, None, page_turns)
+    elements = ["load earlier"] if session["turns"] - len(session["history"]) else []
+    elements.extend(turn_html(q, a) for q, a in session["history"])
+    return elements
+
+def engine_session(chat_engine, history):
+    """A chat_engine session holding `history`, stored and windowed the way the app's are"""
+    session_id = chat_engine.open_session()["session_id"]
+    session = chat_engine._get_session(session_id)
+    for q, a in history:
+        chat_engine.add_turn(session, q, a)
+    return session_id
+
+def make_history(turns):
+    answer = ("English (Formal):\nApplicants must own a house site in the village. " * 8
+              + "\n\nTelugu (Formal):\nదరఖాస్తుదారులకు గ్రామంలో ఇంటి స్థలం ఉండాలి. " * 8)
+    return [(f"Question {i}: who is eligible for the scheme?", f"{answer} ({i})") for i in range(turns)]
+
+def measure(render, history):
+    render(history)  # first rerun fills any per-message cache
+    started = time.perf_counter()
+    for _ in range(RERUNS):
+        elements = render(history)
+    elapsed_ms = (time.perf_counter() - started) / RERUNS * 1000
+    return elapsed_ms, len(elements), sum(len(e.encode("utf-8")) for e in elements)
+
+def main():
+    page_turns = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    fake_genai.install()
+    os.environ["GEMINI_API_KEY"] = "fake-key"
+    os.environ["METRICS_PORT"] = "0"
+    os.chdir(tempfile.mkdtemp(prefix="bench_chat_render_"))
+    import chat_engine
+
+    print(f"Per-rerun cost (window of {page_turns} turns, averaged over {RERUNS} reruns)")
+    print(f"{'turns':>6} {'legacy ms':>10} {'elements':>9} {'KB':>8} | {'windowed ms':>12} {'elements':>9} {'KB':>8}")
+    for turns in HISTORY_LENGTHS:
+        history = make_history(turns)
+        legacy = measure(legacy_rerun, history)
+        session_id = engine_session(chat_engine, history)
+        windowed = measure(lambda h: windowed_rerun(chat_engine, session_id, page_turns), history)
+        print(f"{turns:>6} {legacy[0]:>10.3f} {legacy[1]:>9} {legacy[2] / 1024:>8.1f} | "
+              f"{windowed[0]:>12.3f} {windowed[1]:>9} {windowed[2] / 1024:>8.1f}")
+
+if __name__ == "__main__":
+    main()
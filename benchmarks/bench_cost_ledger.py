@@ -0,0 +1,102 @@
+"""
+Benchmark: recording API calls in the shared cost ledger, and reading rollups back.
+
+  direct  one INSERT + commit per call on the request path (rollback journal)
+  ledger  cost_ledger.CostLedger.record: in-memory append, batched WAL flushes
+          from a background thread
+
+Then compares a per-operation-type report from the hourly rollup table with the
+same GROUP BY over the raw calls, and shows the daily cap refusing calls.
+
+Usage: python benchmarks/bench_cost_ledger.py [calls]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_ledger import SCHEMA, BudgetExceeded, CostLedger
+
+OPERATION_TYPES = ("query", "query", "query", "generation", "answer_cache")
+
+def make_calls(calls, rng):
+    return [
+        (f"session-{rng.randrange(200)}", "Question Answering", rng.choice(OPERATION_TYPES),
+         round(rng.uniform(0.014, 0.016), 6), 2000 + rng.randrange(500), 387000, rng.randrange(200, 900))
+        for _ in range(calls)
+    ]
+
+def direct_record(connection, call):
+    session_id, operation, operation_type, cost, input_tokens, cached_tokens, output_tokens = call
+    now = time.time()
+    connection.execute(
+        "INSERT INTO api_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (now, time.strftime("%Y-%m-%d"), session_id, operation, operation_type, "Document",
+         input_tokens, cached_tokens, output_tokens, cost),
+    )
+    connection.commit()
+
+def per_call_us(fn, items):
+    timings = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.99)]
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(7)
+    workload = make_calls(calls, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = sqlite3.connect(os.path.join(tmp, "direct.db"))
+        connection.executescript(SCHEMA)
+        direct = per_call_us(lambda call: direct_record(connection, call), workload)
+        connection.close()
+
+        ledger = CostLedger(os.path.join(tmp, "ledger.db"), flush_interval=0.5)
+        batched = per_call_us(
+            lambda call: ledger.record(call[0], call[1], call[2], call[3], call[4], call[5], call[6], "Document"),
+            workload,
+        )
+        started = time.perf_counter()
+        ledger.flush()
+        final_flush_ms = (time.perf_counter() - started) * 1000
+        print(f"{calls:,} calls, request-path time per call (mean / p99):")
+        print(f"  direct commit  {direct[0]:8.1f} us / {direct[1]:8.1f} us")
+        print(f"  ledger record  {batched[0]:8.1f} us / {batched[1]:8.1f} us  (final flush {final_flush_ms:.1f} ms)")
+
+        started = time.perf_counter()
+        rows = ledger.rollup("operation_type")
+        rollup_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        with ledger._flush_lock:
+            raw = ledger._connection.execute(
+                "SELECT operation_type, COUNT(*), SUM(cost) FROM api_calls GROUP BY operation_type"
+            ).fetchall()
+        raw_ms = (time.perf_counter() - started) * 1000
+        assert sum(r["calls"] for r in rows) == sum(r[1] for r in raw) == calls
+        print(f"Report by operation type: rollup table {rollup_ms:.2f} ms, raw scan {raw_ms:.2f} ms")
+        for row in rows:
+            print(f"  {row['operation_type']:<14} {row['calls']:>6,} calls  ${row['cost']:.2f}")
+
+        cap = round(ledger.spent_today() + 0.1, 2)
+        ledger.daily_budget = cap
+        admitted = refused = 0
+        for session_id, operation, operation_type, cost, *_ in workload[:50]:
+            try:
+                ledger.admit(session_id, cost)
+                ledger.record(session_id, operation, operation_type, cost)
+                admitted += 1
+            except BudgetExceeded:
+                refused += 1
+        print(f"Daily cap ${cap:.2f}: {admitted} further calls admitted, {refused} refused before being made")
+        ledger.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: cost_analysis.txt handling per Streamlit rerun, and what-if grid pricing.
+
+  legacy   rebuild the report and rewrite the file on every rerun
+  cached   cost_projection.ensure_cost_report, which writes only on pricing changes
+
+The grid part prices users x queries/user x tokens/query x cache TTL in one
+vectorized pass (needs numpy, from requirements.txt) and compares it with a
+plain Python loop over the same scenarios.
+
+Usage: python benchmarks/bench_cost_projection.py [reruns]
+"""
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_projection import DEFAULT_PRICING, build_report, daily_costs, ensure_cost_report, projection_grid
+
+USERS = range(10, 1010, 10)
+QUERIES = range(1, 51)
+TOKENS = range(100, 10100, 500)
+TTLS = (1, 2, 4, 6, 12, 24)
+
+def legacy_rerun(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_report(DEFAULT_PRICING))
+
+def per_rerun_ms(fn, reruns):
+    started = time.perf_counter()
+    for _ in range(reruns):
+        fn()
+    return (time.perf_counter() - started) / reruns * 1000
+
+def main():
+    reruns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cost_analysis.txt")
+        legacy = per_rerun_ms(lambda: legacy_rerun(path), reruns)
+        os.remove(path)
+        cached = per_rerun_ms(lambda: ensure_cost_report(path, DEFAULT_PRICING), reruns)
+    print(f"Report per rerun: legacy {legacy:.3f} ms (1 file write each), cached {cached:.4f} ms (1 write total)")
+
+    scenarios = len(USERS) * len(QUERIES) * len(TOKENS) * len(TTLS)
+    started = time.perf_counter()
+    for users, queries, tokens, ttl in itertools.product(USERS, QUERIES, TOKENS, TTLS):
+        daily_costs(DEFAULT_PRICING, users, queries, tokens, 300, ttl)
+    loop_ms = (time.perf_counter() - started) * 1000
+    try:
+        started = time.perf_counter()
+        projection_grid(DEFAULT_PRICING, list(USERS), list(QUERIES), list(TOKENS), list(TTLS))
+        grid = f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    except ImportError:
+        grid = "n/a (numpy not installed)"
+    print(f"What-if grid of {scenarios:,} scenarios: python loop {loop_ms:.0f} ms, vectorized {grid}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: input tokens per turn with the full history vs. the bounded history
+window, replaying a long scripted conversation against a stub model.
+
+The stub answers with long bilingual text like the real prompt produces, and the
+stub summarizer is history_window.naive_summary (no API calls). Tokens are
+estimated with token_usage.approximate_tokens.
+
+Usage: python benchmarks/bench_history_window.py [turns] [keep_turns] [token_budget]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_window import naive_summary, new_summary_state, window_history
+from token_usage import approximate_tokens
+
+QUESTIONS = [
+    "Who is eligible for the Indiramma Indlu Scheme?",
+    "What documents are required to apply?",
+    "How much financial assistance is provided?",
+    "How is the assistance released in installments?",
+    "Can a family that already owns a house apply?",
+    "What is the selection process for beneficiaries?",
+]
+
+def stub_answer(question, turn):
+    english = f"English (Formal): Regarding '{question}', the scheme provides the following details. " * 12
+    telugu = "తెలుగు (అధికారిక): ఈ పథకం కింద అర్హులైన కుటుంబాలకు సహాయం అందించబడుతుంది. " * 8
+    return f"{english}\n\n{telugu} (turn {turn})"
+
+def conversation_tokens(summary, turns, question):
+    parts = [summary] if summary else []
+    for q, a in turns:
+        parts.extend([q, a])
+    parts.append(question)
+    return approximate_tokens(parts)
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    keep_turns = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    token_budget = int(sys.argv[3]) if len(sys.argv) > 3 else 4000
+
+    summarize_calls = []
+    def summarize(previous_summary, new_turns):
+        summarize_calls.append(len(new_turns))
+        return naive_summary(previous_summary, new_turns)
+
+    history = []
+    state = new_summary_state()
+    full_total = windowed_total = 0
+    print(f"{'turn':>4} {'full history':>13} {'windowed':>9}")
+    for turn in range(1, turns + 1):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        full = conversation_tokens("", history, question)
+        summary, recent, state = window_history(history, state, summarize, keep_turns, token_budget)
+        windowed = conversation_tokens(summary, recent, question)
+        full_total += full
+        windowed_total += windowed
+        if turn == 1 or turn % 5 == 0:
+            print(f"{turn:>4} {full:>13,} {windowed:>9,}")
+        history.append((question, stub_answer(question, turn)))
+
+    print(f"total input tokens: full {full_total:,} | windowed {windowed_total:,} "
+          f"({100 * (1 - windowed_total / full_total):.1f}% fewer)")
+    print(f"summarize calls: {len(summarize_calls)} (turns folded per call: max {max(summarize_calls, default=0)})")
+
+if __name__ == "__main__":
+    main()
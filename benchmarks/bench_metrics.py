@@ -0,0 +1,82 @@
+"""
+Benchmark: cost of the hot-path timing instrumentation, and a scrape of /metrics.
+
+  bare   a function returning a memoized value, as get_pdf_hash does on reruns
+  timed  the same function under metrics.timed, which feeds a histogram
+
+Then records a simulated session's worth of API calls, starts the metrics
+endpoint on a free port, scrapes it over HTTP and prints a few series, and
+writes one cProfile capture with metrics.profile_request.
+
+Usage: python benchmarks/bench_metrics.py [calls]
+"""
+import os
+import pstats
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+_memo = {"hash": "3f2a9c"}
+
+def bare_lookup():
+    return _memo["hash"]
+
+timed_lookup = metrics.timed("get_pdf_hash")(bare_lookup)
+
+@metrics.timed("stream_question")
+def fake_stream(chunks):
+    for i in range(chunks):
+        time.sleep(0.001)
+        yield f"chunk {i} "
+
+def per_call_ns(fn, calls):
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter_ns() - started) / calls
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    bare = per_call_ns(bare_lookup, calls)
+    timed = per_call_ns(timed_lookup, calls)
+    print(f"{calls:,} calls: bare {bare:.0f} ns, timed {timed:.0f} ns (+{timed - bare:.0f} ns per instrumented call)")
+
+    api_calls = metrics.counter("gemini_api_calls_total", "API calls", ("operation", "operation_type"))
+    latency = metrics.histogram("gemini_api_call_duration_seconds", "API call latency", ("operation",))
+    rng = random.Random(5)
+    for _ in range(500):
+        api_calls.inc(operation="Question Answering", operation_type="query")
+        latency.observe(rng.lognormvariate(0.5, 0.5), operation="Question Answering")
+    metrics.touch_session("bench")
+    metrics.gauge("active_sessions", "Sessions active in the last 30 minutes").set_function(
+        lambda: metrics.active_sessions(1800))
+    "".join(fake_stream(20))
+
+    server = metrics.start_metrics_server(0)  # port 0: any free port
+    port = server.server_address[1]
+    started = time.perf_counter()
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        body = response.read().decode("utf-8")
+    scrape_ms = (time.perf_counter() - started) * 1000
+    print(f"Scraped {len(body.splitlines())} lines ({len(body)} bytes) from /metrics in {scrape_ms:.1f} ms:")
+    for line in body.splitlines():
+        if line.startswith(("gemini_api_calls_total{", "active_sessions ", "gemini_api_call_duration_seconds_count")) \
+                or ('function="stream_question"' in line and "_sum" in line):
+            print(f"  {line}")
+    server.shutdown()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with metrics.profile_request("cprofile", tmp, "question"):
+            "".join(fake_stream(10))
+        (profile,) = os.listdir(tmp)
+        stats = pstats.Stats(os.path.join(tmp, profile))
+        print(f"cProfile capture {profile}: {stats.total_calls} calls in {stats.total_tt * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
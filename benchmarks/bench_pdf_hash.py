@@ -0,0 +1,61 @@
+"""
+Micro-benchmark: PDF fingerprinting cost per Streamlit rerun.
+
+Each rerun used to hash Document.pdf about three times (status display plus the
+validity checks in the start-session and chat branches). This compares the old
+read-everything-and-MD5 approach with the stat-keyed memo in pdf_fingerprint.
+
+Usage: python benchmarks/bench_pdf_hash.py [size_mb] [reruns]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_fingerprint import clear_fingerprints, get_fingerprint
+
+HASHES_PER_RERUN = 3
+
+def legacy_pdf_hash(pdf_path):
+    """The original get_pdf_hash(): read the whole file and MD5 it"""
+    with open(pdf_path, "rb") as file:
+        content = file.read()
+        return hashlib.md5(content).hexdigest()
+
+def time_reruns(hash_fn, pdf_path, reruns):
+    """Return per-rerun latencies in milliseconds"""
+    latencies = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        for _ in range(HASHES_PER_RERUN):
+            hash_fn(pdf_path)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    mean = sum(latencies) / len(latencies)
+    p50 = latencies[len(latencies) // 2]
+    print(f"{label:<12} mean {mean:9.3f} ms | p50 {p50:9.3f} ms | max {latencies[-1]:9.3f} ms")
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    reruns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "Document.pdf")
+        with open(pdf_path, "wb") as file:
+            file.write(os.urandom(size_mb * 1024 * 1024))
+
+        print(f"Synthetic PDF: {size_mb} MB, {reruns} reruns, {HASHES_PER_RERUN} hashes per rerun")
+        assert legacy_pdf_hash(pdf_path) == get_fingerprint(pdf_path)
+        clear_fingerprints()
+
+        summarize("before", time_reruns(legacy_pdf_hash, pdf_path, reruns))
+        summarize("after", time_reruns(get_fingerprint, pdf_path, reruns))
+
+if __name__ == "__main__":
+    main()
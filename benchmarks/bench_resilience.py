@@ -0,0 +1,144 @@
+"""
+Fault-injection benchmark for the resilience policies in resilience.py, run
+against the fake genai backend with injected 429/503 errors and latency spikes.
+
+Policies, mirroring the call path in main.py:
+  none           one attempt, no timeout (the original ask_question)
+  retry          backoff with jitter on 429/503, no timeout
+  retry+timeout  plus a per-attempt timeout that cuts latency spikes short
+  +hedge         plus a hedged duplicate once a call outlives HEDGE_AFTER
+
+Reports success rate, p50/p99 latency and API calls made per policy. Then it
+simulates a full outage to show the circuit breaker failing fast instead of
+hammering the API, and checks that a half-open breaker whose probe stream
+fails midway is settled rather than left waiting on the probe.
+
+Usage: python benchmarks/bench_resilience.py [calls] [concurrency]
+"""
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_genai
+from resilience import CircuitBreaker, CircuitOpen, RetryPolicy, call_with_retry, hedged_call, retry_stream
+
+ERROR_RATE = 0.08
+SPIKE_RATE = 0.05
+SPIKE_LATENCY = 3.0
+ATTEMPT_TIMEOUT = 0.6
+HEDGE_AFTER = 0.35
+
+RETRY = RetryPolicy(attempts=4, base_delay=0.05, max_delay=0.5, deadline=None)
+RETRY_WITH_DEADLINE = RETRY._replace(deadline=5.0)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def make_call(policy_name, model, breaker):
+    def attempt(timeout):
+        options = {}
+        if policy_name != "retry":
+            options["timeout"] = ATTEMPT_TIMEOUT if timeout is None else min(ATTEMPT_TIMEOUT, timeout)
+        if policy_name == "+hedge":
+            return hedged_call(lambda: model.generate_content("question", request_options=options), HEDGE_AFTER)
+        return model.generate_content("question", request_options=options)
+
+    if policy_name == "none":
+        return lambda: model.generate_content("question")
+    policy = RETRY if policy_name == "retry" else RETRY_WITH_DEADLINE
+    return lambda: call_with_retry(attempt, policy, breaker)
+
+def run_policy(policy_name, calls, concurrency):
+    fake_genai.GenerativeModel.reset()
+    model = fake_genai.GenerativeModel()
+    breaker = CircuitBreaker(policy_name, failure_threshold=20, reset_after=1)
+    call = make_call(policy_name, model, breaker)
+
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            call()
+            return time.perf_counter() - started, True
+        except Exception:
+            return time.perf_counter() - started, False
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, range(calls)))
+    latencies = [latency for latency, ok in results if ok]
+    successes = sum(ok for _, ok in results)
+    return successes, latencies, fake_genai.GenerativeModel.generate_calls
+
+def run_outage(calls, use_breaker):
+    """Every call fails; count how many actually reach the API"""
+    fake_genai.GenerativeModel.reset()
+    fake_genai.GenerativeModel.error_rate = 1.0
+    model = fake_genai.GenerativeModel()
+    breaker = CircuitBreaker("outage", failure_threshold=5, reset_after=60) if use_breaker else None
+    fast_failures = 0
+    for _ in range(calls):
+        try:
+            call_with_retry(lambda timeout: model.generate_content("question"), RETRY, breaker)
+        except CircuitOpen:
+            fast_failures += 1
+        except Exception:
+            pass
+    fake_genai.GenerativeModel.error_rate = ERROR_RATE
+    return fake_genai.GenerativeModel.generate_calls, fast_failures
+
+def check_probe_fails_midway(error, expected_state):
+    """A half-open breaker's probe stream yields an item, then raises `error`"""
+    clock = [0.0]
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_after=10, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 10.0  # half-open: the next call is the probe
+
+    def open_stream(timeout):
+        yield "first chunk"
+        raise error
+
+    try:
+        for _ in retry_stream(open_stream, RETRY, breaker):
+            pass
+    except type(error):
+        pass
+    assert not breaker.probing, f"probe still out after {error!r}"
+    assert breaker.state == expected_state, f"{breaker.state} after {error!r}, expected {expected_state}"
+    return breaker.state
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    logging.getLogger("resilience").setLevel(logging.ERROR)  # silence per-retry warnings
+    fake_genai.GenerativeModel.latency_min = 0.1
+    fake_genai.GenerativeModel.latency_max = 0.3
+    fake_genai.GenerativeModel.error_rate = ERROR_RATE
+    fake_genai.GenerativeModel.spike_rate = SPIKE_RATE
+    fake_genai.GenerativeModel.spike_latency = SPIKE_LATENCY
+
+    print(f"{calls} calls, {concurrency} concurrent | faults: {ERROR_RATE:.0%} 429/503, "
+          f"{SPIKE_RATE:.0%} spikes of {SPIKE_LATENCY:.0f}s | normal latency 0.1-0.3s")
+    print(f"{'policy':<14} {'success':>8} {'p50':>7} {'p99':>7} {'API calls':>10}")
+    for policy_name in ("none", "retry", "retry+timeout", "+hedge"):
+        successes, latencies, api_calls = run_policy(policy_name, calls, concurrency)
+        print(f"{policy_name:<14} {successes / calls:>8.1%} {percentile(latencies, 50):>6.2f}s "
+              f"{percentile(latencies, 99):>6.2f}s {api_calls:>10}")
+
+    fake_genai.GenerativeModel.latency_min = fake_genai.GenerativeModel.latency_max = 0.01
+    print("\nOutage (every call fails), 50 sequential questions with retry:")
+    for use_breaker in (False, True):
+        api_calls, fast_failures = run_outage(50, use_breaker)
+        label = "with breaker" if use_breaker else "no breaker"
+        print(f"  {label:<13} {api_calls:>4} API calls, {fast_failures} failed fast")
+
+    print("\nHalf-open probe stream failing after its first chunk:")
+    for error, expected_state in ((ValueError("response blocked"), "closed"), (fake_genai.ServiceUnavailable("503"), "open")):
+        print(f"  {type(error).__name__:<20} breaker {check_probe_fails_midway(error, expected_state)}")
+
+if __name__ == "__main__":
+    main()
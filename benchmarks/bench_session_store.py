@@ -0,0 +1,86 @@
+"""
+Benchmark: memory and disk taken by chat sessions with the session store.
+
+Fills N sessions with M turns of long bilingual stub answers and compares the
+memory of keeping every turn in memory (the old behaviour) with keeping only
+the latest SESSION_HOT_TURNS, then reports the store's write latency per
+turn, the size of the stored answers against the raw text, and how long
+resuming a session and paging in its older turns takes.
+
+Runs against a temporary database; no API calls. The stub answers repeat their
+sentences, so they compress better than real answers do.
+
+Usage: python benchmarks/bench_session_store.py [sessions] [turns] [hot_turns]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_history_window import QUESTIONS, stub_answer
+from history_window import new_summary_state
+from session_store import SessionStore
+
+def history_bytes(history):
+    # Same estimate as chat_engine.history_bytes, without importing the engine
+    return sys.getsizeof(history) + sum(sys.getsizeof(q) + sys.getsizeof(a) for q, a in history)
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    hot_turns = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    workdir = tempfile.mkdtemp(prefix="bench_session_store_")
+    try:
+        store = SessionStore(os.path.join(workdir, "sessions.db"))
+        full_bytes = hot_bytes = raw_answer_bytes = 0
+        write_times = []
+        for s in range(sessions):
+            session_id = f"{s:032x}"
+            history = []
+            for turn in range(turns):
+                question = QUESTIONS[turn % len(QUESTIONS)]
+                answer = stub_answer(question, turn) + f" (session {s})"
+                started = time.perf_counter()
+                store.append_turn(session_id, "Document", turn, question, answer, new_summary_state())
+                write_times.append(time.perf_counter() - started)
+                history.append((question, answer))
+                raw_answer_bytes += len(answer.encode("utf-8"))
+            full_bytes += history_bytes(history)
+            hot_bytes += history_bytes(history[-hot_turns:])
+
+        print(f"{sessions} sessions x {turns} turns")
+        print(f"  memory, every turn:         {full_bytes / 2**20:8.1f} MB")
+        print(f"  memory, latest {hot_turns:>3} turns:   {hot_bytes / 2**20:8.1f} MB ({full_bytes / hot_bytes:.1f}x less)")
+        stats = store.stats()
+        print(f"  stored answers: {stats['answer_bytes'] / 2**20:.1f} MB compressed from {raw_answer_bytes / 2**20:.1f} MB "
+              f"({raw_answer_bytes / stats['answer_bytes']:.1f}x); database {os.path.getsize(store.path) / 2**20:.1f} MB "
+              f"+ WAL {os.path.getsize(store.path + '-wal') / 2**20:.1f} MB")
+        write_times.sort()
+        print(f"  append_turn: median {statistics.median(write_times) * 1000:.2f} ms, "
+              f"p99 {write_times[int(len(write_times) * 0.99)] * 1000:.2f} ms")
+
+        resume_times, page_times = [], []
+        for s in range(0, sessions, max(sessions // 50, 1)):
+            session_id = f"{s:032x}"
+            started = time.perf_counter()
+            stored = store.load(session_id)
+            store.turns(session_id, max(stored["turns"] - hot_turns, 0))
+            resume_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            store.turns(session_id, 0, max(stored["turns"] - hot_turns, 0))
+            page_times.append(time.perf_counter() - started)
+        print(f"  resume (latest {hot_turns} turns): median {statistics.median(resume_times) * 1000:.2f} ms; "
+              f"older turns: median {statistics.median(page_times) * 1000:.2f} ms")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: cold start of the chat engine and first paint of the app.
+
+  import      `import chat_engine` in a fresh interpreter (median of N runs),
+              and whether the Gemini SDK got imported along the way
+  importtime  the heaviest modules of that import, from python -X importtime
+  sdk         `import google.generativeai` on its own: what the first API call pays
+  first paint main.py's first run under Streamlit's AppTest (a new session on a
+              cold process) and a rerun (every interaction after that)
+
+Each run happens in a temporary working directory, since the engine creates its
+log, ledger and status files on import. AppTest timing needs streamlit.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ENGINE = """
+import sys, time
+started = time.perf_counter()
+import chat_engine
+print(time.perf_counter() - started, "google.generativeai" in sys.modules)
+"""
+
+IMPORT_SDK = """
+import time
+started = time.perf_counter()
+import google.generativeai
+print(time.perf_counter() - started)
+"""
+
+FIRST_PAINT = """
+import time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(%r, default_timeout=120)
+started = time.perf_counter()
+at.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+at.run()
+print(first, time.perf_counter() - started, len(at.exception))
+"""
+
+def run_python(code, workdir, *flags):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+               GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark-key"), METRICS_PORT="0")
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=workdir, env=env, capture_output=True, text=True)
+
+def heaviest_imports(stderr, top):
+    """(cumulative µs, module) of the slowest modules imported directly by chat_engine, from python -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # nested imports are indented, and counted in their parent
+        if depth == 1:
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        timings = []
+        for _ in range(runs):
+            result = run_python(IMPORT_ENGINE, workdir)
+            if result.returncode:
+                sys.exit(f"import chat_engine failed:\n{result.stderr[-2000:]}")
+            seconds, sdk_loaded = result.stdout.split()
+            timings.append(float(seconds))
+        print(f"import chat_engine: median {statistics.median(timings) * 1000:.0f} ms over {runs} runs "
+              f"(min {min(timings) * 1000:.0f} ms); Gemini SDK imported: {sdk_loaded}")
+
+        result = run_python("import chat_engine", workdir, "-X", "importtime")
+        print("Heaviest imports made by chat_engine (cumulative):")
+        for cumulative_us, name in heaviest_imports(result.stderr, 8):
+            print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+        result = run_python(IMPORT_SDK, workdir)
+        if result.returncode:
+            print("google.generativeai not installed; skipping SDK import timing")
+        else:
+            print(f"import google.generativeai (deferred to the first API call): {float(result.stdout) * 1000:.0f} ms")
+
+        result = run_python(FIRST_PAINT % os.path.join(REPO_DIR, "main.py"), workdir)
+        if result.returncode:
+            reason = "streamlit not installed" if "No module named 'streamlit'" in result.stderr else result.stderr[-500:]
+            print(f"First paint: skipped ({reason})")
+        else:
+            first, rerun, exceptions = result.stdout.split()
+            print(f"First paint (AppTest): first run {float(first) * 1000:.0f} ms, rerun {float(rerun) * 1000:.0f} ms"
+                  + (f", {exceptions} exceptions" if exceptions != "0" else ""))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
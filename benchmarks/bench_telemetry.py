@@ -0,0 +1,140 @@
+"""
+Benchmark: time spent on the request path per logged API call.
+
+  legacy     multi-line text entry through a synchronous FileHandler, plus print()
+  telemetry  one JSON record handed to a QueueHandler; a listener thread writes it
+
+Each runs twice: on the local (page-cached) disk, and with a simulated slow disk
+that stalls STALL_MS on every STALL_EVERY-th write, as a busy or network volume does.
+
+Afterwards the telemetry file is read back and aggregated with the same code as
+`python telemetry.py`, to check that nothing was lost and show the report.
+
+Usage: python benchmarks/bench_telemetry.py [calls]
+"""
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetry
+
+STALL_EVERY = 200
+STALL_MS = 20
+
+@contextlib.contextmanager
+def slow_disk(enabled):
+    """Make every STALL_EVERY-th log write block for STALL_MS, like a busy or network volume"""
+    if not enabled:
+        yield
+        return
+    original_emit = logging.StreamHandler.emit
+    writes = [0]
+
+    def stalling_emit(handler, record):
+        writes[0] += 1
+        if writes[0] % STALL_EVERY == 0:
+            time.sleep(STALL_MS / 1000)
+        original_emit(handler, record)
+
+    logging.StreamHandler.emit = stalling_emit
+    try:
+        yield
+    finally:
+        logging.StreamHandler.emit = original_emit
+
+def legacy_logger(path):
+    legacy = logging.getLogger("bench_legacy")
+    legacy.propagate = False
+    legacy.setLevel(logging.INFO)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    legacy.addHandler(handler)
+    return legacy, handler
+
+def legacy_call(legacy, i, cost, total):
+    legacy.info(f"""
+    API Call: Question Answering
+    - Document: Document
+    - Operation Type: query
+    - Input Tokens: {2000 + i % 500:,}
+    - Cached Tokens: 387,000
+    - Output Tokens: 600
+    - Cache Hours: 0
+    - Cost: ${cost:.6f}
+    - Running Total: ${total:.6f}
+    """)
+    print(f"💰 Cost: ${cost:.6f} | Total: ${total:.6f}")
+
+def telemetry_call(i, cost, total, rng):
+    telemetry.record_event(
+        "api_call",
+        operation="Question Answering" if i % 10 else "History Summary",
+        operation_type="query",
+        session_id=f"session-{i % 50}",
+        document="Document",
+        input_tokens=2000 + i % 500,
+        cached_tokens=387000,
+        output_tokens=600,
+        cache_hours=0,
+        latency_s=round(rng.lognormvariate(0.5, 0.5), 3),
+        ttft_s=None,
+        answer_cache_hit=i % 7 == 0,
+        cost=cost,
+        session_total_cost=total,
+    )
+
+def per_call_us(fn, calls):
+    timings = []
+    for i in range(calls):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return sum(timings) / calls, timings[int(calls * 0.99)], timings[-1]
+
+def run(tmp, calls, slow):
+    cost = 0.0147
+    rng = random.Random(3)
+    label = "slow" if slow else "local"
+    with slow_disk(slow):
+        legacy, handler = legacy_logger(os.path.join(tmp, f"api_calls_{label}.log"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_timing = per_call_us(lambda i: legacy_call(legacy, i, cost, cost * i), calls)
+        legacy.removeHandler(handler)
+        handler.close()
+
+        path = os.path.join(tmp, f"api_telemetry_{label}.jsonl")
+        telemetry.start_telemetry(path, max_bytes=2 * 1024 * 1024, backup_count=20)
+        queued_timing = per_call_us(lambda i: telemetry_call(i, cost, cost * i, rng), calls)
+        telemetry.stop_telemetry()  # write out the queue
+    return legacy_timing, queued_timing, path
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{calls:,} calls, request-path time per call (mean / p99 / max):")
+    with tempfile.TemporaryDirectory() as tmp:
+        for slow in (False, True):
+            legacy_timing, queued_timing, path = run(tmp, calls, slow)
+            disk = f"slow disk ({STALL_MS} ms stall every {STALL_EVERY} writes)" if slow else "local disk"
+            print(f"  {disk}")
+            for name, (mean, p99, worst) in (("legacy", legacy_timing), ("telemetry", queued_timing)):
+                print(f"    {name:<10} {mean:8.1f} us / {p99:8.1f} us / {worst:8.1f} us")
+
+        files = [name for name in os.listdir(tmp) if name.startswith(os.path.basename(path))]
+        summary = telemetry.summarize(telemetry.read_records(path))
+        recorded = sum(row["calls"] for row in summary.values())
+
+    print(f"Read back {recorded:,} records from {len(files)} rotated files:")
+    for operation, row in summary.items():
+        print(f"  {operation:<20} calls {row['calls']:>6,}  p50 {row['p50_s']:.2f}s  p95 {row['p95_s']:.2f}s  "
+              f"p99 {row['p99_s']:.2f}s  hits {row['answer_cache_hits']:>5,}  cost ${row['cost']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Simulated-clock check of the background cache refresher against the fake
+genai.caching backend.
+
+Steps a fake clock through three days in 10-minute ticks with users active the
+whole time, and counts how often a user would have hit an expired cache (a
+cold-start gap) under each refresh policy. Also checks that an idle deployment
+is left to expire instead of paying for storage nobody uses.
+
+Usage: python benchmarks/cache_refresh_simulation.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_genai
+from cache_refresher import CacheRefresher
+from cache_registry import get_expires_at
+
+TTL = timedelta(hours=24)
+MARGIN = timedelta(hours=1)
+TICK = timedelta(minutes=10)
+DURATION = timedelta(hours=72)
+
+class SimClock:
+    def __init__(self):
+        self.current = datetime(2025, 8, 1, 9, 0)
+
+    def __call__(self):
+        return self.current
+
+    def advance(self, delta):
+        self.current += delta
+
+def simulate(policy, active_for=DURATION):
+    fake_genai.CachedContent.reset()
+    fake_genai.CachedContent.create_latency = 0
+    fake_genai.CachedContent.get_latency = 0
+    clock = SimClock()
+    store = {}
+
+    def create_cache():
+        cache = fake_genai.caching.CachedContent.create(model="models/gemini-2.0-flash-001", ttl=TTL)
+        store["status"] = {
+            "cache_name": cache.name,
+            "created_at": clock().isoformat(),
+            "ttl_hours": TTL.total_seconds() / 3600,
+            "expires_at": (clock() + TTL).isoformat(),
+        }
+        return cache
+
+    refresher = CacheRefresher(
+        load_status=lambda: store.get("status"),
+        save_status=lambda status: store.__setitem__("status", status),
+        caching=fake_genai.caching,
+        create_cache=create_cache,
+        ttl=TTL,
+        margin=MARGIN,
+        policy=policy,
+        idle_after=timedelta(hours=2),
+        now=clock,
+    )
+
+    create_cache()  # first user clicks Start Session
+    gaps, actions = 0, {}
+    started = clock()
+    while clock() - started < DURATION:
+        clock.advance(TICK)
+        users_active = clock() - started < active_for
+        if users_active:
+            refresher.touch()
+            if get_expires_at(store["status"]) <= clock():
+                gaps += 1  # a user is kicked back to the start screen and pays a cold start
+                create_cache()
+        action = refresher.check_once()
+        actions[action] = actions.get(action, 0) + 1
+
+    expired_at_end = get_expires_at(store["status"]) <= clock()
+    return gaps, fake_genai.CachedContent.create_calls, fake_genai.CachedContent.update_calls, expired_at_end, actions
+
+def main():
+    print(f"{'policy':<8} {'gaps':>5} {'creates':>8} {'extends':>8}")
+    for policy in ("off", "extend", "replace"):
+        gaps, creates, extends, _, _ = simulate(policy)
+        print(f"{policy:<8} {gaps:>5} {creates:>8} {extends:>8}")
+        if policy != "off":
+            assert gaps == 0, f"{policy}: users saw {gaps} expiry gaps"
+
+    _, _, _, expired, actions = simulate("extend", active_for=timedelta(hours=30))
+    print(f"idle after 30h (extend): expired at end={expired}, actions={actions}")
+    assert expired, "idle cache should be left to expire"
+    print("OK")
+
+if __name__ == "__main__":
+    main()
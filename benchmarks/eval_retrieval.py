@@ -0,0 +1,115 @@
+"""
+Offline evaluation: tokens, cost and latency per query for the context-cache
+answer mode vs. the local retrieval (RAG) mode, using a stub model.
+
+Without arguments a synthetic 300-page bilingual corpus is generated, with one
+distinctive fact per page and a question targeting it, so retrieval recall can
+be measured too. Pass a PDF path (needs pypdf) to index a real document; recall
+is then not reported.
+
+Generation latency is modeled from token counts (prefill + decode rates), not
+slept, so the script runs in seconds. Pricing mirrors main.py.
+
+Usage: python benchmarks/eval_retrieval.py [Document.pdf] [top_k]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import RetrievalIndex, extract_pages, format_context, get_index
+from token_usage import approximate_tokens
+
+PDF_TOKENS = 387000
+CACHED_COST_PER_1M = 0.0375
+INPUT_COST_PER_1M = 0.075
+OUTPUT_COST_PER_1M = 0.30
+OUTPUT_TOKENS = 600
+
+# Stub model timing
+PREFILL_SECONDS_PER_1K_TOKENS = 0.02
+CACHED_PREFILL_SECONDS_PER_1K_TOKENS = 0.004
+DECODE_SECONDS_PER_TOKEN = 0.006
+
+DISTRICTS = ["Adilabad", "Karimnagar", "Warangal", "Khammam", "Nalgonda", "Mahabubnagar", "Medak", "Nizamabad"]
+
+def synthetic_corpus(pages=300, seed=7):
+    """Pages of filler text, each with one unique fact, plus a question per fact"""
+    rng = random.Random(seed)
+    filler = (
+        "The Indiramma Indlu Scheme provides housing assistance to eligible families. "
+        "Applications are verified by the village level committee. "
+        "ఈ పథకం కింద అర్హులైన కుటుంబాలకు గృహ నిర్మాణ సహాయం అందించబడుతుంది. "
+    )
+    corpus, questions = [], []
+    for page in range(1, pages + 1):
+        district = rng.choice(DISTRICTS)
+        amount = rng.randrange(100, 900) * 1000
+        code = f"IIS-{page:04d}"
+        fact = f"Circular {code} sets the {district} installment ceiling at Rs {amount}. "
+        corpus.append(filler * 4 + fact + filler * 2)
+        questions.append((f"What installment ceiling does circular {code} set for {district}?", page))
+    return corpus, questions
+
+def query_cost(input_tokens, cached_tokens):
+    return (cached_tokens * CACHED_COST_PER_1M + input_tokens * INPUT_COST_PER_1M
+            + OUTPUT_TOKENS * OUTPUT_COST_PER_1M) / 1_000_000
+
+def modeled_latency(input_tokens, cached_tokens):
+    return (input_tokens / 1000 * PREFILL_SECONDS_PER_1K_TOKENS
+            + cached_tokens / 1000 * CACHED_PREFILL_SECONDS_PER_1K_TOKENS
+            + OUTPUT_TOKENS * DECODE_SECONDS_PER_TOKEN)
+
+def main():
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].isdigit() else None
+    top_k = int(sys.argv[-1]) if sys.argv[-1].isdigit() else 6
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        if pdf_path:
+            index = get_index(pdf_path, "eval", index_dir)
+            questions = [(q, None) for q in ("Who is eligible?", "What documents are required?", "How much assistance is given?")]
+            pdf_tokens = sum(approximate_tokens(p) for p in extract_pages(pdf_path))
+        else:
+            pages, questions = synthetic_corpus()
+            index = RetrievalIndex.build(pages)
+            pdf_tokens = PDF_TOKENS
+        build_seconds = time.perf_counter() - started
+
+        index_path = os.path.join(index_dir, "eval.json")
+        index.save(index_path)
+        started = time.perf_counter()
+        RetrievalIndex.load(index_path)
+        load_seconds = time.perf_counter() - started
+
+        print(f"Index: {len(index.chunks)} chunks | build {build_seconds:.2f}s | load {load_seconds:.3f}s | top_k {top_k}")
+
+        rows = {"cache": [], "rag": []}
+        hits = 0
+        for question, page in questions:
+            prompt_tokens = approximate_tokens(question) + 80  # bilingual prompt template
+            rows["cache"].append((prompt_tokens, pdf_tokens, 0.0))
+
+            started = time.perf_counter()
+            chunks = index.search(question, k=top_k)
+            retrieval_seconds = time.perf_counter() - started
+            context_tokens = approximate_tokens(format_context(chunks))
+            rows["rag"].append((prompt_tokens + context_tokens, 0, retrieval_seconds))
+            if page is not None:
+                hits += page in {c["page"] for c in chunks}
+
+    print(f"{'mode':<6} {'input tok/query':>16} {'cost/query':>11} {'latency/query':>14}")
+    for mode, mode_rows in rows.items():
+        n = len(mode_rows)
+        tokens = sum(i + c for i, c, _ in mode_rows) / n
+        cost = sum(query_cost(i, c) for i, c, _ in mode_rows) / n
+        latency = sum(modeled_latency(i, c) + r for i, c, r in mode_rows) / n
+        print(f"{mode:<6} {tokens:>16,.0f} {'$' + format(cost, '.6f'):>11} {latency:>13.3f}s")
+    if questions[0][1] is not None:
+        print(f"retrieval recall@{top_k}: {hits / len(questions):.1%} over {len(questions)} questions")
+
+if __name__ == "__main__":
+    main()
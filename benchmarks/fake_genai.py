@@ -0,0 +1,312 @@
+"""
+Local stand-in for the parts of google.generativeai that main.py uses, so the
+benchmarks and harnesses can run without an API key or spending money.
+
+Latencies are configurable class attributes; GenerativeModel can also draw its
+latency and output tokens from samplers such as lognormal(). If
+CachedContent.call_log is set to a file path, every create() is appended to it so
+call counts and cache names can be shared between processes. GenerativeModel can
+enforce a requests-per-minute limit, to show what happens to unthrottled load.
+
+install() puts this module in sys.modules as google.generativeai, so main.py
+itself can run against it.
+"""
+import base64
+import hashlib
+import itertools
+import math
+import os
+import random
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+def install():
+    """Make `import google.generativeai` return this module"""
+    module = sys.modules[__name__]
+    google = sys.modules.get("google")
+    if google is None:
+        try:
+            import google
+        except ImportError:
+            google = types.ModuleType("google")
+            google.__path__ = []
+            sys.modules["google"] = google
+    google.generativeai = module
+    sys.modules["google.generativeai"] = module
+    return module
+
+def configure(api_key=None, **kwargs):
+    pass
+
+def lognormal(median, sigma, low=0.0, high=math.inf):
+    """Sampler for latency_sampler / output_tokens_sampler with a long right tail, like real latencies"""
+    return lambda: min(high, max(low, random.lognormvariate(math.log(median), sigma)))
+
+class NotFound(Exception):
+    """Raised when a cached content name is unknown (mirrors google.api_core NotFound)"""
+
+class ResourceExhausted(Exception):
+    """Raised past the fake rate limit (mirrors google.api_core ResourceExhausted)"""
+    code = 429
+
+class ServiceUnavailable(Exception):
+    """Injected server error (mirrors google.api_core ServiceUnavailable)"""
+    code = 503
+
+class DeadlineExceeded(Exception):
+    """Raised when a call outlives its request_options timeout (mirrors google.api_core DeadlineExceeded)"""
+    code = 504
+
+class CachedContent:
+    create_latency = 0.5
+    get_latency = 0.01
+    call_log = None
+
+    _store = {}
+    _counter = itertools.count(1)
+    _lock = threading.Lock()
+    create_calls = 0
+    get_calls = 0
+    update_calls = 0
+
+    def __init__(self, name, display_name, model, expire_time):
+        self.name = name
+        self.display_name = display_name
+        self.model = model
+        self.expire_time = expire_time
+
+    @classmethod
+    def create(cls, model, display_name=None, system_instruction=None, contents=None, ttl=None):
+        _to_protos(contents or [])
+        time.sleep(cls.create_latency)
+        ttl = ttl or timedelta(hours=1)
+        with cls._lock:
+            cls.create_calls += 1
+            name = f"cachedContents/fake-{time.time_ns()}-{next(cls._counter)}"
+            cache = cls(name, display_name, model, datetime.now(timezone.utc) + ttl)
+            cls._store[name] = cache
+            if cls.call_log:
+                with open(cls.call_log, "a") as f:
+                    f.write(f"create {name}\n")
+        return cache
+
+    @classmethod
+    def get(cls, name):
+        time.sleep(cls.get_latency)
+        with cls._lock:
+            cls.get_calls += 1
+            if name in cls._store:
+                return cls._store[name]
+            if cls.call_log and name in logged_cache_names(cls.call_log):
+                # Created by another process - hand out a local handle
+                cache = cls(name, name, "models/gemini-2.0-flash-001", datetime.now(timezone.utc) + timedelta(hours=1))
+                cls._store[name] = cache
+                return cache
+        raise NotFound(f"Cached content {name} not found")
+
+    def update(self, ttl=None, expire_time=None):
+        with self._lock:
+            type(self).update_calls += 1
+            if self.name not in self._store:
+                raise NotFound(f"Cached content {self.name} not found")
+            self.expire_time = expire_time or datetime.now(timezone.utc) + ttl
+
+    def delete(self):
+        with self._lock:
+            self._store.pop(self.name, None)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._store.clear()
+            cls.create_calls = 0
+            cls.get_calls = 0
+            cls.update_calls = 0
+
+def _to_protos(contents):
+    """Mimic proto-plus: inline base64 str data is decoded back to bytes for the Blob field"""
+    blobs = []
+    for content in contents:
+        for part in content.get("parts", []) if isinstance(content, dict) else []:
+            data = part.get("inline_data", {}).get("data")
+            if isinstance(data, str):
+                blobs.append(base64.b64decode(data))
+            elif data is not None:
+                blobs.append(data)
+    return blobs
+
+# googleapiclient's default resumable upload chunk size, used by genai.upload_file
+UPLOAD_CHUNK_SIZE = 100 * 1024 * 1024
+uploaded_files = {}
+
+def upload_file(path, mime_type=None, display_name=None, **kwargs):
+    """Read the file in resumable-upload sized chunks, like the real client"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        for offset in range(0, size, UPLOAD_CHUNK_SIZE):
+            f.read(min(UPLOAD_CHUNK_SIZE, size - offset))
+    name = f"files/fake-{time.time_ns()}"
+    uploaded = SimpleNamespace(
+        name=name,
+        uri=f"https://generativelanguage.googleapis.com/v1beta/{name}",
+        mime_type=mime_type,
+        display_name=display_name,
+        size_bytes=size,
+        state=SimpleNamespace(name="ACTIVE"),
+    )
+    uploaded_files[name] = uploaded
+    return uploaded
+
+def get_file(name):
+    return uploaded_files[name]
+
+class GenerativeModel:
+    """
+    Answers with canned text after a latency drawn from [latency_min, latency_max]
+    seconds, reporting usage_metadata like the real API. Calls beyond rate_limit
+    (if set) within rate_window_seconds raise ResourceExhausted, the way a 429 surfaces.
+
+    latency_sampler and output_tokens_sampler, if set, replace the uniform latency
+    and fixed output token count with draws from a distribution.
+
+    For fault injection, error_rate of calls fail with a 429 or 503 and spike_rate
+    of calls take spike_latency seconds instead. A request_options timeout cuts a
+    call short with DeadlineExceeded.
+    """
+    latency_min = 0.5
+    latency_max = 1.5
+    latency_sampler = None
+    output_tokens = 600
+    output_tokens_sampler = None
+    rate_limit = None
+    rate_window_seconds = 60  # shrink to compress "a minute" in fast simulations
+    error_rate = 0.0
+    spike_rate = 0.0
+    spike_latency = 10.0
+    answer_text = "English (Formal):\nThis is a simulated answer.\n\nTelugu (Formal):\nఇది అనుకరణ సమాధానం."
+
+    _lock = threading.Lock()
+    _call_times = []
+    generate_calls = 0
+    rate_limited_calls = 0
+
+    def __init__(self, model_name="gemini-2.0-flash-001", system_instruction=None, cached_content=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls(cached_content.model, cached_content=cached_content)
+
+    @classmethod
+    def _admit(cls):
+        with cls._lock:
+            cls.generate_calls += 1
+            now = time.monotonic()
+            cls._call_times = [t for t in cls._call_times if now - t < cls.rate_window_seconds]
+            if cls.rate_limit and len(cls._call_times) >= cls.rate_limit:
+                cls.rate_limited_calls += 1
+                raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            cls._call_times.append(now)
+
+    def _usage(self, contents):
+        prompt_tokens = max(1, len(_contents_text(contents)) // 4)
+        cached_tokens = 387000 if self.cached_content else 0
+        sampler = type(self).output_tokens_sampler
+        output_tokens = int(sampler()) if sampler else self.output_tokens
+        return SimpleNamespace(
+            prompt_token_count=prompt_tokens + cached_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + cached_tokens + output_tokens,
+        )
+
+    def _inject_faults(self, timeout):
+        """Latency for this call, or raise the injected error"""
+        roll = random.random()
+        if roll < self.error_rate:
+            time.sleep(self.latency_min / 2)
+            error = random.choice((ResourceExhausted, ServiceUnavailable))
+            raise error(f"{error.code} injected fault")
+        spike = roll < self.error_rate + self.spike_rate
+        sampler = type(self).latency_sampler
+        if spike:
+            latency = self.spike_latency
+        else:
+            latency = sampler() if sampler else random.uniform(self.latency_min, self.latency_max)
+        if timeout is not None and latency > timeout:
+            time.sleep(max(timeout, 0))
+            raise DeadlineExceeded(f"504 Deadline of {timeout:.2f}s exceeded")
+        return latency
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        self._admit()
+        latency = self._inject_faults((request_options or {}).get("timeout"))
+        usage = self._usage(contents)
+        if not stream:
+            time.sleep(latency)
+            return SimpleNamespace(text=self.answer_text, usage_metadata=usage)
+        return _FakeStream(self.answer_text, latency, usage)
+
+    def count_tokens(self, contents, request_options=None):
+        time.sleep(self.latency_min / 10)
+        return SimpleNamespace(total_tokens=max(1, len(_contents_text(contents)) // 4))
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._call_times = []
+            cls.generate_calls = 0
+            cls.rate_limited_calls = 0
+
+class _FakeStream:
+    """Streamed response: the answer's words spread over the latency; usage_metadata is set once consumed"""
+    def __init__(self, text, latency, usage):
+        self._words = text.split(" ")
+        self._delay = latency / len(self._words)
+        self._usage = usage
+        self.usage_metadata = None
+
+    def __iter__(self):
+        for i, word in enumerate(self._words):
+            time.sleep(self._delay)
+            yield SimpleNamespace(text=word if i == 0 else " " + word)
+        self.usage_metadata = self._usage
+
+EMBEDDING_DIMENSIONS = 64
+embed_latency = 0.05
+
+def _embedding(text):
+    """Deterministic unit vector from the text's words, so similar questions land close together"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in str(text).lower().split():
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        vector[digest[0] % EMBEDDING_DIMENSIONS] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def embed_content(model, content, task_type=None, **kwargs):
+    time.sleep(embed_latency)
+    if isinstance(content, (list, tuple)):
+        return {"embedding": [_embedding(text) for text in content]}
+    return {"embedding": _embedding(content)}
+
+def _contents_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(c if isinstance(c, str) else "" for c in contents)
+
+def logged_cache_names(call_log):
+    """Cache names recorded in a call log file"""
+    try:
+        with open(call_log) as f:
+            return [line.split()[1] for line in f if line.startswith("create ")]
+    except FileNotFoundError:
+        return []
+
+caching = SimpleNamespace(CachedContent=CachedContent)
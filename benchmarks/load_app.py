@@ -0,0 +1,341 @@
+"""
+Headless load test of the whole app: N simulated users run main.py through
+Streamlit's AppTest (no browser, no server) against fake_genai, which is
+installed as google.generativeai, so no API key is used and nothing is billed.
+
+AppTest swaps a process-wide Streamlit runtime in and out around every script
+run, so two runs cannot overlap in one process. Each user therefore runs
+main.py in a process of its own, with CHAT_ENGINE_URL pointing at one chat
+engine served from this process by engine_server.py, as in a deployment with
+the UI and the engine split.
+
+Each user opens the app (the first one clicks Start Session and creates the
+context cache), then asks questions from a shared pool with some think time in
+between. Everything the engine writes (cost ledger, telemetry, cache status,
+sessions) goes to a temporary working directory.
+
+Reports requests/sec, answer latency percentiles, failures, the engine's memory and
+cost from the cost ledger, and writes the results as JSON so runs can be
+compared across commits:
+
+    python benchmarks/load_app.py --users 20 --questions 5
+    python benchmarks/load_app.py --users 20 --questions 5 --compare benchmarks/results/<earlier run>.json
+
+Needs the app's requirements (streamlit); the Gemini SDK is not used.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+MAIN_PY = os.path.join(REPO_DIR, "main.py")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_genai
+
+QUESTIONS = [
+    "Who is eligible for the Indiramma Indlu scheme?",
+    "What documents are required to apply?",
+    "How much financial assistance is given per house?",
+    "Can a woman apply in her own name?",
+    "What is the minimum size of the house site?",
+    "How are beneficiaries selected in a village?",
+    "In how many installments is the money released?",
+    "Who verifies the construction stages?",
+    "Is a ration card mandatory?",
+    "Can families who already own a pucca house apply?",
+    "How do I check my application status?",
+    "What happens if construction is not completed on time?",
+]
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def rss_mb():
+    """Current resident memory of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.failures = {}
+
+    def success(self, latency):
+        self.latencies.append(latency)
+
+    def failure(self, reason):
+        self.failures[reason] = self.failures.get(reason, 0) + 1
+
+def find_button(at, label):
+    return next((button for button in at.button if button.label == label), None)
+
+def session_turns(engine, at):
+    """Turns in the user's conversation, which lives in the chat engine"""
+    return engine.open_session(at.session_state["session_id"], None, 0)["turns"]
+
+def ask(at, question, language, timeout):
+    """
+    Pick the answer language, type the question and click Send.
+
+    AppTest matches a radio's value against its formatted labels, so the language
+    is set by label. After a Send the page holds the widgets of both that run and
+    the st.rerun() it ends with, so every copy is set.
+    """
+    from translation import OUTPUT_LANGUAGES
+
+    for radio in at.radio:
+        if radio.key == "output_language":
+            radio.set_value(radio.options[OUTPUT_LANGUAGES.index(language)])
+    for text_input in at.text_input:
+        if text_input.key == "question_input":
+            text_input.input(question)
+    for button in at.button:
+        if button.label == "Send":
+            button.click()
+    at.run(timeout=timeout)
+
+def reset_triggers_on_rerun():
+    """
+    AppTest leaves button triggers set after a run so tests can inspect them, so
+    the st.rerun() after Send would send again forever. Clear them on st.rerun()
+    as a real Streamlit server does at the end of every run.
+    """
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    rerun = st.rerun
+    def rerun_with_triggers_reset():
+        get_script_run_ctx().session_state._state._reset_triggers()
+        rerun()
+    st.rerun = rerun_with_triggers_reset
+
+def open_app(at, timeout):
+    """Load the page; click Start Session if no cache exists yet"""
+    at.run(timeout=timeout)
+    start = find_button(at, "🚀 Start Session")
+    if start is not None:
+        start.click().run(timeout=timeout)
+    return bool(at.session_state["session_started"]) if "session_started" in at.session_state else False
+
+def simulate_user(user, args, engine_url, start_gate, results):
+    """One user's process: reports {"latencies", "failures"} on `results`"""
+    recorder = Recorder()
+    try:
+        run_user(user, args, engine_url, recorder, start_gate)
+    except Exception as e:
+        recorder.failure(f"harness: {type(e).__name__}: {e}"[:120])
+    finally:
+        results.put({"latencies": recorder.latencies, "failures": recorder.failures})
+
+def run_user(user, args, engine_url, recorder, start_gate):
+    from streamlit.testing.v1 import AppTest
+    from engine_client import RemoteEngine
+
+    os.environ["CHAT_ENGINE_URL"] = engine_url
+    reset_triggers_on_rerun()
+    engine = RemoteEngine(engine_url, args.timeout)
+    rng = random.Random(args.seed + user)
+    at = AppTest.from_file(MAIN_PY, default_timeout=args.timeout)
+    start_gate.wait()  # every process has imported streamlit
+    time.sleep(rng.uniform(0, args.ramp_up))
+    if not open_app(at, args.timeout):
+        recorder.failure("session not started")
+        return
+    for _ in range(args.questions):
+        question = rng.choice(QUESTIONS)
+        turns_before = session_turns(engine, at)
+        started = time.perf_counter()
+        ask(at, question, args.language, args.timeout)
+        latency = time.perf_counter() - started
+        if session_turns(engine, at) > turns_before:
+            recorder.success(latency)
+        elif at.exception:
+            recorder.failure(f"exception: {at.exception[0].value}"[:120])
+        elif at.warning:
+            recorder.failure(f"warning: {at.warning[0].value}"[:120])
+        elif at.error:
+            recorder.failure(f"error: {at.error[0].value}"[:120])
+        else:
+            recorder.failure("no answer")
+        time.sleep(rng.uniform(0, args.think_time))
+
+def configure_fake_backend(args):
+    fake_genai.install()
+    fake_genai.CachedContent.create_latency = args.cache_create_latency
+    fake_genai.GenerativeModel.latency_sampler = fake_genai.lognormal(args.latency_median, args.latency_sigma)
+    fake_genai.GenerativeModel.output_tokens_sampler = fake_genai.lognormal(args.output_tokens, 0.4, low=1)
+    fake_genai.GenerativeModel.error_rate = args.error_rate
+
+def ledger_costs():
+    """Cost per operation type from the app's cost ledger (the same process-wide instance main.py uses)"""
+    import cost_ledger
+    ledger = cost_ledger._ledger
+    if ledger is None:
+        return {}
+    return {row["operation_type"]: {"calls": row["calls"], "cost": row["cost"]} for row in ledger.rollup("operation_type")}
+
+def run(args):
+    from load_engine import start_http_engine
+
+    configure_fake_backend(args)
+    os.environ["GEMINI_API_KEY"] = "fake-key"
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ["STREAM_ANSWERS"] = "true" if args.stream else "false"
+    # Measure the app, not the pacing to Gemini's quotas (each cached query counts the whole PDF's tokens)
+    os.environ.setdefault("PIPELINE_MAX_CONCURRENCY", str(args.users))
+    os.environ.setdefault("PIPELINE_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("PIPELINE_TOKENS_PER_MINUTE", "1000000000")
+
+    workdir = tempfile.mkdtemp(prefix="load_app_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with open("Document.pdf", "wb") as f:
+            f.write(b"%PDF-1.4\n" + os.urandom(args.pdf_kb * 1024))
+        import chat_engine
+        engine_url = start_http_engine(chat_engine, args.users)
+
+        context = multiprocessing.get_context("spawn")
+        start_gate = context.Barrier(args.users + 1)
+        results = context.Queue()
+        processes = [context.Process(target=simulate_user, args=(user, args, engine_url, start_gate, results), daemon=True)
+                     for user in range(args.users)]
+        for process in processes:
+            process.start()
+        rss_before = rss_mb()
+        start_gate.wait()
+        started = time.perf_counter()
+        recorder = Recorder()
+        for _ in processes:
+            user_results = results.get()
+            recorder.latencies += user_results["latencies"]
+            for reason, count in user_results["failures"].items():
+                recorder.failures[reason] = recorder.failures.get(reason, 0) + count
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        rss_after = rss_mb()  # the engine's process; each UI process adds its own Streamlit
+        costs = ledger_costs()
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    answered = len(recorder.latencies)
+    total_cost = sum(row["cost"] for row in costs.values())
+    return {
+        "users": args.users,
+        "questions": args.users * args.questions,
+        "answered": answered,
+        "failures": recorder.failures,
+        "elapsed_s": elapsed,
+        "requests_per_s": answered / elapsed if elapsed else 0.0,
+        "latency_p50_s": percentile(recorder.latencies, 50),
+        "latency_p95_s": percentile(recorder.latencies, 95),
+        "latency_p99_s": percentile(recorder.latencies, 99),
+        "latency_max_s": max(recorder.latencies, default=None),
+        "rss_before_mb": rss_before,
+        "rss_after_mb": rss_after,
+        "generate_calls": fake_genai.GenerativeModel.generate_calls,
+        "cache_creates": fake_genai.CachedContent.create_calls,
+        "cost_by_operation_type": costs,
+        "total_cost": total_cost,
+        "cost_per_question": total_cost / answered if answered else None,
+        "projected_cost_per_hour": total_cost / elapsed * 3600 if elapsed else None,  # at this run's throughput
+    }
+
+def compare(previous, current):
+    """Print the numeric results side by side with an earlier run"""
+    print(f"Compared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    for key, value in current["results"].items():
+        before = previous.get("results", {}).get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        change = f"{(value - before) / before * 100:+.1f}%" if before else ""
+        print(f"  {key:<24} {before:>12.4f} -> {value:>12.4f} {change}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load test of main.py against a fake Gemini backend")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=5, help="questions per user")
+    parser.add_argument("--think-time", type=float, default=2.0, help="max seconds between a user's questions")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="users arrive spread over this many seconds")
+    parser.add_argument("--latency-median", type=float, default=1.5, help="generation latency median (lognormal)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--output-tokens", type=float, default=600, help="median output tokens (lognormal)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with 429/503")
+    parser.add_argument("--cache-create-latency", type=float, default=2.0)
+    parser.add_argument("--pdf-kb", type=int, default=512, help="size of the stand-in PDF")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--language", choices=("english", "telugu", "both"), default="both", help="answer language picked in the UI")
+    parser.add_argument("--timeout", type=float, default=120, help="per script run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default benchmarks/results/load_app-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        sys.exit("load_app.py drives main.py through streamlit's AppTest: pip install -r requirements.txt")
+
+    results = run(args)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    report = {"commit": git_commit(), "timestamp": timestamp, "config": vars(args), "results": results}
+
+    print(f"{results['answered']}/{results['questions']} answered by {args.users} users in {results['elapsed_s']:.1f}s "
+          f"({results['requests_per_s']:.2f} req/s)")
+    if results["answered"]:
+        print(f"Latency p50 {results['latency_p50_s']:.2f}s, p95 {results['latency_p95_s']:.2f}s, "
+              f"p99 {results['latency_p99_s']:.2f}s, max {results['latency_max_s']:.2f}s")
+    for reason, count in results["failures"].items():
+        print(f"  {count} failed: {reason}")
+    if results["rss_after_mb"] is not None:
+        print(f"Engine memory: {results['rss_before_mb']:.0f} MB -> {results['rss_after_mb']:.0f} MB RSS")
+    print(f"{results['generate_calls']} generate calls, {results['cache_creates']} cache creations, "
+          f"cost ${results['total_cost']:.4f}"
+          + (f" (${results['cost_per_question']:.5f}/question, ${results['projected_cost_per_hour']:.2f}/hour at this rate)"
+             if results["answered"] else ""))
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"load_app-{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Load test of the chat engine without a browser or Streamlit: N simulated users
+open sessions and stream answers, once calling chat_engine in-process ("direct")
+and once through engine_server.py over HTTP with engine_client.RemoteEngine
+("http"), against fake_genai installed as google.generativeai.
+
+The difference between the two is the cost of the HTTP/JSON hop the UI pays
+when CHAT_ENGINE_URL points at engine workers. Reports requests/sec, answer
+latency and time-to-first-chunk percentiles and failures per target, and writes
+the results as JSON next to load_app.py's:
+
+    python benchmarks/load_engine.py --users 50 --questions 5
+    python benchmarks/load_engine.py --target http --compare benchmarks/results/<earlier run>.json
+
+The answer cache is off by default so every question reaches the model
+(--answer-cache to turn it on). Needs the engine's requirements (python-dotenv);
+the Gemini SDK is not used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_genai
+from load_app import QUESTIONS, compare, git_commit, percentile, rss_mb
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.first_chunks = []
+        self.failures = {}
+
+    def success(self, latency, first_chunk):
+        with self.lock:
+            self.latencies.append(latency)
+            self.first_chunks.append(first_chunk)
+
+    def failure(self, reason):
+        with self.lock:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+
+def run_user(engine, user, args, recorder, start_gate):
+    rng = random.Random(args.seed + user)
+    start_gate.wait()
+    time.sleep(rng.uniform(0, args.ramp_up))
+    try:
+        session_id = engine.open_session()["session_id"]
+    except Exception as e:
+        recorder.failure(f"open_session: {type(e).__name__}")
+        return
+    for _ in range(args.questions):
+        started = time.perf_counter()
+        first_chunk = None
+        try:
+            if args.stream:
+                for _text in engine.stream(session_id, rng.choice(QUESTIONS), args.language):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+            else:
+                engine.ask(session_id, rng.choice(QUESTIONS), args.language)
+        except Exception as e:
+            recorder.failure(f"{type(e).__name__}: {e}"[:120])
+        else:
+            latency = time.perf_counter() - started
+            recorder.success(latency, latency if first_chunk is None else first_chunk)
+        time.sleep(rng.uniform(0, args.think_time))
+
+def start_http_engine(chat_engine, workers):
+    """engine_server on a free local port, its event loop on a daemon thread; returns the base URL"""
+    from engine_server import EngineServer
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(EngineServer(chat_engine, workers).start("127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, name="engine-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+def run_target(engine, args):
+    recorder = Recorder()
+    start_gate = threading.Event()
+    threads = [threading.Thread(target=run_user, args=(engine, user, args, recorder, start_gate), daemon=True)
+               for user in range(args.users)]
+    for thread in threads:
+        thread.start()
+    calls_before = fake_genai.GenerativeModel.generate_calls
+    started = time.perf_counter()
+    start_gate.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    answered = len(recorder.latencies)
+    return {
+        "questions": args.users * args.questions,
+        "answered": answered,
+        "failures": recorder.failures,
+        "elapsed_s": elapsed,
+        "requests_per_s": answered / elapsed if elapsed else 0.0,
+        "latency_p50_s": percentile(recorder.latencies, 50),
+        "latency_p95_s": percentile(recorder.latencies, 95),
+        "latency_p99_s": percentile(recorder.latencies, 99),
+        "first_chunk_p50_s": percentile(recorder.first_chunks, 50),
+        "first_chunk_p95_s": percentile(recorder.first_chunks, 95),
+        "generate_calls": fake_genai.GenerativeModel.generate_calls - calls_before,
+        "rss_mb": rss_mb(),
+    }
+
+def run(args):
+    fake_genai.install()
+    fake_genai.CachedContent.create_latency = args.cache_create_latency
+    fake_genai.GenerativeModel.latency_sampler = fake_genai.lognormal(args.latency_median, args.latency_sigma)
+    fake_genai.GenerativeModel.error_rate = args.error_rate
+    os.environ["GEMINI_API_KEY"] = "fake-key"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    # Measure the engine, not the pacing to Gemini's quotas (each cached query counts the whole PDF's tokens)
+    os.environ.setdefault("PIPELINE_MAX_CONCURRENCY", str(args.users))
+    os.environ.setdefault("PIPELINE_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("PIPELINE_TOKENS_PER_MINUTE", "1000000000")
+
+    workdir = tempfile.mkdtemp(prefix="load_engine_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # the engine's ledger, telemetry, logs and cache status files
+    try:
+        with open("Document.pdf", "wb") as f:
+            f.write(b"%PDF-1.4\n" + os.urandom(args.pdf_kb * 1024))
+        import chat_engine
+
+        started = time.perf_counter()
+        chat_engine.start_session()
+        results = {"start_session_s": time.perf_counter() - started}
+        targets = ["direct", "http"] if args.target == "both" else [args.target]
+        for target in targets:
+            engine = chat_engine if target == "direct" else __import__("engine_client").RemoteEngine(
+                start_http_engine(chat_engine, args.users), args.timeout)
+            results[target] = run_target(engine, args)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def flatten(results):
+    """{"http": {"latency_p50_s": ..}} -> {"http.latency_p50_s": ..} for compare()"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict) and key in ("direct", "http"):
+            flat.update({f"{key}.{name}": v for name, v in value.items()})
+        else:
+            flat[key] = value
+    return flat
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of chat_engine, in-process and over HTTP, against a fake Gemini backend")
+    parser.add_argument("--target", choices=("direct", "http", "both"), default="both")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=5, help="questions per user")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max seconds between a user's questions")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="users arrive spread over this many seconds")
+    parser.add_argument("--latency-median", type=float, default=0.5, help="generation latency median (lognormal)")
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with 429/503")
+    parser.add_argument("--cache-create-latency", type=float, default=0.5)
+    parser.add_argument("--pdf-kb", type=int, default=512, help="size of the stand-in PDF")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--language", choices=("english", "telugu", "both"), help="answer language (default OUTPUT_LANGUAGE)")
+    parser.add_argument("--answer-cache", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--timeout", type=float, default=120, help="HTTP client timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default benchmarks/results/load_engine-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    report = {"commit": git_commit(), "timestamp": timestamp, "config": vars(args), "results": flatten(results)}
+
+    print(f"Context cache ready in {results['start_session_s']:.2f}s")
+    for target in ("direct", "http"):
+        if target not in results:
+            continue
+        r = results[target]
+        print(f"{target:>6}: {r['answered']}/{r['questions']} answered in {r['elapsed_s']:.1f}s ({r['requests_per_s']:.2f} req/s), "
+              f"latency p50 {r['latency_p50_s'] or 0:.3f}s p95 {r['latency_p95_s'] or 0:.3f}s, "
+              f"first chunk p50 {r['first_chunk_p50_s'] or 0:.3f}s")
+        for reason, count in r["failures"].items():
+            print(f"        {count} failed: {reason}")
+    if "direct" in results and "http" in results and results["direct"]["answered"] and results["http"]["answered"]:
+        overhead = results["http"]["latency_p50_s"] - results["direct"]["latency_p50_s"]
+        print(f"HTTP hop adds {overhead * 1000:+.1f} ms at p50")
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"load_engine-{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Load test: 100 simulated users asking questions against the fake genai backend,
+once calling generate_content directly (as main.py used to) and once through the
+shared RequestPipeline.
+
+The fake backend allows RATE_LIMIT calls per RATE_WINDOW seconds, a compressed
+stand-in for a per-minute quota so the run takes seconds rather than minutes.
+The pipeline is tuned to 80% of that quota. One extra "heavy" session fires a
+burst of requests at once, to show that the fair queue keeps it from starving
+everyone else.
+
+Reports throughput, rate-limit errors, queue wait percentiles, peak queue depth
+and peak concurrency.
+
+Usage: python benchmarks/load_pipeline.py [users] [questions_per_user]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_genai
+from request_pipeline import PipelineBusy, RequestPipeline
+
+RATE_LIMIT = 60
+RATE_WINDOW = 6.0  # seconds standing in for one minute
+MAX_CONCURRENCY = 8
+HEAVY_BURST = 40
+THINK_TIME = (0.2, 1.0)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.rate_limited = 0
+        self.busy = 0
+        self.waits = {"user": [], "heavy": []}
+        self.active = 0
+        self.peak_active = 0
+
+    def call(self, fn):
+        with self.lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            return fn()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def ask(model, recorder, pipeline, session_id, kind):
+    question = f"Question from {session_id}: who is eligible for the scheme?"
+    enqueued = time.perf_counter()
+    try:
+        if pipeline is None:
+            response = recorder.call(lambda: model.generate_content(question))
+            wait = 0.0
+        else:
+            with pipeline.slot(session_id, tokens=len(question) // 4 + 600) as slot:
+                wait = time.perf_counter() - enqueued
+                response = recorder.call(lambda: model.generate_content(question))
+                slot["tokens"] = response.usage_metadata.total_token_count
+    except fake_genai.ResourceExhausted:
+        with recorder.lock:
+            recorder.rate_limited += 1
+        return
+    except PipelineBusy:
+        with recorder.lock:
+            recorder.busy += 1
+        return
+    with recorder.lock:
+        recorder.ok += 1
+        recorder.waits[kind].append(wait)
+
+def run(users, questions, use_pipeline):
+    fake_genai.GenerativeModel.reset()
+    model = fake_genai.GenerativeModel()
+    recorder = Recorder()
+    pipeline = None
+    if use_pipeline:
+        pipeline = RequestPipeline(
+            max_concurrency=MAX_CONCURRENCY,
+            requests_per_minute=0.8 * RATE_LIMIT * 60 / RATE_WINDOW,
+            tokens_per_minute=10_000_000,
+            burst_seconds=1,
+        )
+    rng = random.Random(42)
+    start = threading.Event()
+
+    def user(session_id, think_times):
+        start.wait()
+        for think in think_times:
+            time.sleep(think)
+            ask(model, recorder, pipeline, session_id, "user")
+
+    def heavy():
+        start.wait()
+        burst = [threading.Thread(target=ask, args=(model, recorder, pipeline, "heavy", "heavy")) for _ in range(HEAVY_BURST)]
+        for thread in burst:
+            thread.start()
+        for thread in burst:
+            thread.join()
+
+    threads = [threading.Thread(target=user, args=(f"user-{i}", [rng.uniform(*THINK_TIME) for _ in range(questions)]))
+               for i in range(users)]
+    threads.append(threading.Thread(target=heavy))
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = pipeline.stats() if pipeline else {"max_queue_depth": 0}
+    return recorder, elapsed, stats
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    fake_genai.GenerativeModel.latency_min = 0.3
+    fake_genai.GenerativeModel.latency_max = 0.9
+    fake_genai.GenerativeModel.rate_limit = RATE_LIMIT
+    fake_genai.GenerativeModel.rate_window_seconds = RATE_WINDOW
+
+    total = users * questions + HEAVY_BURST
+    print(f"{users} users x {questions} questions + {HEAVY_BURST}-request burst = {total} calls, "
+          f"quota {RATE_LIMIT} calls / {RATE_WINDOW:.0f}s")
+    print(f"{'mode':<9} {'ok':>5} {'429s':>5} {'busy':>5} {'calls/s':>8} {'user wait p50/p99':>18} "
+          f"{'heavy wait p50':>15} {'max queue':>10} {'peak conc':>10}")
+    for mode in ("direct", "pipeline"):
+        recorder, elapsed, stats = run(users, questions, mode == "pipeline")
+        user_waits = recorder.waits["user"]
+        print(f"{mode:<9} {recorder.ok:>5} {recorder.rate_limited:>5} {recorder.busy:>5} {recorder.ok / elapsed:>8.1f} "
+              f"{percentile(user_waits, 50):>8.2f}s/{percentile(user_waits, 99):.2f}s "
+              f"{percentile(recorder.waits['heavy'], 50):>14.2f}s {stats['max_queue_depth']:>10} {recorder.peak_active:>10}")
+        if mode == "pipeline":
+            assert recorder.peak_active <= MAX_CONCURRENCY, "pipeline exceeded its concurrency limit"
+            assert recorder.rate_limited == 0, "pipeline still hit the rate limit"
+
+if __name__ == "__main__":
+    main()
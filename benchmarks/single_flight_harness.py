@@ -0,0 +1,92 @@
+"""
+Harness: fire N simultaneous "Start Session" clicks (threads across several
+processes) at chat_engine.start_session(), the entry point the UI and the
+engine server both use, and assert that the fake genai.caching backend saw
+exactly one CachedContent.create call.
+
+Every process runs the real chat_engine against fake_genai in one shared
+working directory, so they share the PDF, the cache status file and its
+creation lock the way engine workers on one host do: the leader uploads and
+records the status file, everyone else waits and picks the cache up from it.
+
+Usage: python benchmarks/single_flight_harness.py [processes] [threads_per_process]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_genai
+
+def run_process(workdir, call_log, threads, go, results):
+    os.chdir(workdir)
+    fake_genai.install()
+    fake_genai.CachedContent.call_log = call_log
+    fake_genai.CachedContent.create_latency = 0.5  # long enough for every click to pile up on the leader
+    import chat_engine
+
+    progress_counts = []
+    starts = []
+    barrier = threading.Barrier(threads)
+
+    def click():
+        barrier.wait()
+        status = chat_engine.start_session(on_wait=lambda message, elapsed: progress_counts.append(message))
+        starts.append((status["ready"], chat_engine.load_cache_status()["cache_name"]))
+
+    go.wait()
+    workers = [threading.Thread(target=click) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((starts, len(progress_counts)))
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+
+    os.environ["GEMINI_API_KEY"] = "fake-key"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["ANSWER_MODE"] = "cache"
+    os.environ.setdefault("PIPELINE_TOKENS_PER_MINUTE", "1000000000")  # each creation reserves the whole PDF
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "Document.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n" + os.urandom(64 * 1024))
+        call_log = os.path.join(workdir, "calls.log")
+        # spawn: chat_engine starts threads on import, so each process imports its own
+        context = multiprocessing.get_context("spawn")
+        go = context.Event()
+        results = context.Queue()
+        workers = [
+            context.Process(target=run_process, args=(workdir, call_log, threads, go, results))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        go.set()
+
+        names, ready, progress_updates = set(), 0, 0
+        for _ in workers:
+            process_starts, process_progress = results.get()
+            names.update(name for _, name in process_starts)
+            ready += sum(1 for was_ready, _ in process_starts if was_ready)
+            progress_updates += process_progress
+        for worker in workers:
+            worker.join()
+
+        create_calls = len(fake_genai.logged_cache_names(call_log))
+        print(f"{processes * threads} simultaneous starts across {processes} processes")
+        print(f"create calls: {create_calls} | distinct caches: {len(names)} | ready: {ready} | progress updates seen: {progress_updates}")
+        assert create_calls == 1, f"expected exactly one create call, got {create_calls}"
+        assert ready == processes * threads and len(names) == 1
+        print("OK")
+
+if __name__ == "__main__":
+    main()
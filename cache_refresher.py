@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from cache_registry import get_expires_at
+from single_flight import run_once
+
+logger = logging.getLogger(__name__)
+
+REFRESH_POLICIES = ("extend", "replace", "off")
+
+class CacheRefresher:
+    """
+    Background scheduler that keeps the global context cache alive before its TTL runs out.
+
+    policy "extend" pushes the existing CachedContent's TTL forward (falling back to
+    "replace" if that fails); "replace" builds a new cache ahead of time and swaps it
+    into the status registry atomically; "off" does nothing.
+    Nothing is refreshed once the cache has expired or nobody has used it within `idle_after`.
+
+    An extension buys more hours of storage: admit_extension(status, hours) is called
+    first and may raise to refuse it (the cache is then left to expire), and
+    record_extension(status, hours, latency) once it is done.
+    """
+    def __init__(self, load_status, save_status, caching, create_cache, ttl, margin,
+                 policy="extend", idle_after=None, key="global_pdf_cache", lock_path=None,
+                 admit_extension=None, record_extension=None, now=datetime.now):
+        if policy not in REFRESH_POLICIES:
+            raise ValueError(f"Unknown cache refresh policy: {policy}")
+        self.load_status = load_status
+        self.save_status = save_status
+        self.caching = caching
+        self.create_cache = create_cache
+        self.ttl = ttl
+        self.margin = margin
+        self.policy = policy
+        self.idle_after = idle_after
+        self.key = key
+        self.lock_path = lock_path
+        self.admit_extension = admit_extension
+        self.record_extension = record_extension
+        self.now = now
+        self.last_activity = now()
+        self.last_action = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self):
+        """Record user activity so idle caches are left to expire"""
+        self.last_activity = self.now()
+
+    def _is_due(self, status):
+        remaining = get_expires_at(status) - self.now()
+        return remaining.total_seconds() > 0 and remaining <= self.margin
+
+    def _extension_hours(self, status):
+        """Storage hours an extension adds: from the current expiry to a full TTL from now"""
+        return round(max((self.now() + self.ttl - get_expires_at(status)).total_seconds() / 3600, 0), 3)
+
+    def _extend(self, status):
+        started = time.perf_counter()
+        hours = self._extension_hours(status)
+        cache = self.caching.CachedContent.get(status["cache_name"])
+        cache.update(ttl=self.ttl)
+        now = self.now()
+        self.save_status(dict(status, expires_at=(now + self.ttl).isoformat(), refreshed_at=now.isoformat()))
+        logger.info(f"Extended global cache {cache.name} by {self.ttl}")
+        if self.record_extension:
+            self.record_extension(status, hours, time.perf_counter() - started)
+        self.last_action = "extended"
+        return cache
+
+    def _replace(self):
+        cache = self.create_cache()
+        logger.info(f"Replaced global cache with {cache.name if cache else None}")
+        self.last_action = "replaced"
+        return cache
+
+    def _refresh(self, status):
+        if self.policy == "extend":
+            if self.admit_extension:
+                self.admit_extension(status, self._extension_hours(status))  # refused: no replacement either
+            try:
+                return self._extend(status)
+            except Exception as e:
+                logger.warning(f"Could not extend global cache {status['cache_name']}: {e}; replacing it")
+        return self._replace()
+
+    def _find_refreshed_cache(self):
+        """Another process may already have refreshed the cache while we waited"""
+        status = self.load_status()
+        if status and not self._is_due(status):
+            self.last_action = "fresh"
+            return self.caching.CachedContent.get(status["cache_name"])
+        return None
+
+    def check_once(self):
+        """Refresh the cache if it is inside the refresh margin; returns the action taken"""
+        self.last_action = None
+        if self.policy == "off":
+            return "off"
+
+        status = self.load_status()
+        if not status:
+            return "none"
+        if self.idle_after is not None and self.now() - self.last_activity > self.idle_after:
+            return "idle"
+        if get_expires_at(status) <= self.now():
+            return "expired"
+        if not self._is_due(status):
+            return "fresh"
+
+        run_once(self.key, lambda: self._refresh(status), lock_path=self.lock_path,
+                 check_existing=self._find_refreshed_cache)
+        return self.last_action
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.error(f"Global cache refresh failed: {e}")
+
+    def start(self, interval):
+        """Run check_once() every `interval` seconds on a daemon thread"""
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="cache-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+# One refresher per cache key per process, shared by all Streamlit sessions
+_refreshers = {}
+_refresher_lock = threading.Lock()
+
+def start_refresher(interval, key="global_pdf_cache", **kwargs):
+    """Start the process-wide refresher for `key` on first call and return it on every call"""
+    with _refresher_lock:
+        refresher = _refreshers.get(key)
+        if refresher is None:
+            refresher = _refreshers[key] = CacheRefresher(key=key, **kwargs)
+            if refresher.policy != "off":
+                refresher.start(interval)
+                logger.info(f"Started cache refresher for {key} (policy={refresher.policy}, margin={refresher.margin})")
+        return refresher
@@ -0,0 +1,82 @@
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+class CacheUnavailable(Exception):
+    """A document has no valid context cache; one has to be created (Start Session) first"""
+
+# Process-wide view of the cache status files, shared by every Streamlit session:
+# absolute path -> {"mtime_ns": mtime of the file when it was read, "status": parsed JSON}
+_entries = {}
+_lock = threading.RLock()
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def load_status(path):
+    """
+    Get the cache status stored in `path`.
+    The file is only re-read when its mtime changes (e.g. another process wrote it).
+    """
+    abs_path = os.path.abspath(path)
+    with _lock:
+        entry = _entries.get(abs_path)
+        if entry is not None and entry["mtime_ns"] == _mtime_ns(abs_path):
+            return copy.deepcopy(entry["status"])
+
+        status = None
+        if _mtime_ns(abs_path) is None:
+            _entries[abs_path] = {"mtime_ns": None, "status": None}
+            return None
+        try:
+            with file_lock(abs_path, shared=True):
+                mtime_ns = _mtime_ns(abs_path)
+                if mtime_ns is not None:
+                    with open(abs_path, "r") as f:
+                        status = json.load(f)
+        except ValueError:
+            # Empty or unparseable file - treat as no cache
+            logger.warning(f"Ignoring unreadable cache status file {path}")
+        except OSError as e:
+            logger.error(f"Error loading cache status: {e}")
+            return copy.deepcopy(entry["status"]) if entry else None
+
+        _entries[abs_path] = {"mtime_ns": mtime_ns, "status": status}
+        return copy.deepcopy(status)
+
+def save_status(path, status):
+    """Write the cache status through to disk atomically and update the in-memory copy"""
+    abs_path = os.path.abspath(path)
+    directory = os.path.dirname(abs_path)
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        with file_lock(abs_path):
+            fd, tmp_path = tempfile.mkstemp(prefix=".cache_status_", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(status, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, abs_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            _entries[abs_path] = {"mtime_ns": _mtime_ns(abs_path), "status": copy.deepcopy(status)}
+
+def get_expires_at(status):
+    """Expiry time of a cache status entry (naive local time, like created_at)"""
+    if status.get("expires_at"):
+        return datetime.fromisoformat(status["expires_at"])
+    return datetime.fromisoformat(status["created_at"]) + timedelta(hours=status.get("ttl_hours", 0))
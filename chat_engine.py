@@ -0,0 +1,1206 @@
+import os
+from dotenv import load_dotenv
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pdf_fingerprint import get_fingerprint
+from cache_registry import CacheUnavailable, get_expires_at, load_status, save_status
+from single_flight import run_once, set_progress
+from cache_refresher import start_refresher
+from token_usage import TokenUsage, approximate_tokens, usage_from_metadata
+from history_window import new_summary_state, summary_prompt, window_history
+from answer_cache import get_answer_cache
+from answer_bank import get_answer_bank
+from translation import (LANGUAGES, OUTPUT_LANGUAGES, answer_prompt, estimated_tokens_saved, get_translation_cache, labelled,
+                         other_language, translation_prompt)
+from retrieval import format_context, get_index
+from document_registry import discover_documents, last_used, select_evictions, touch_document
+from pdf_upload import inline_pdf_part, upload_pdf_part
+from request_pipeline import get_pipeline
+from telemetry import record_event, start_telemetry
+from cost_ledger import get_ledger
+from session_store import TurnConflict, get_session_store
+from metrics import active_sessions, counter, gauge, histogram, profile_request, start_metrics_server, timed, touch_session
+from cost_projection import Pricing, ensure_cost_report
+from resilience import RetryPolicy, call_with_retry, get_breaker, hedged_call, retry_stream
+
+# Setup logging - once per process, and only if nothing (e.g. an embedding app) configured it first,
+# so the log file is not opened again by every importer
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('api_calls.log'),
+            logging.StreamHandler()
+        ]
+    )
+logger = logging.getLogger(__name__)
+
+# Load API Key
+load_dotenv()
+API_KEY = os.getenv("GEMINI_API_KEY")
+
+# The Gemini SDK takes a second or more to import; it is loaded and configured on the first API call
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """google.generativeai, imported and configured once per process on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                started = time.perf_counter()
+                import google.generativeai as genai
+                if API_KEY:
+                    genai.configure(api_key=API_KEY)
+                else:
+                    logger.error("GEMINI_API_KEY not found in .env file")
+                logger.info(f"Gemini SDK loaded in {time.perf_counter() - started:.2f}s")
+                _genai = genai
+    return _genai
+
+# Cost tracking - Updated for 300-page PDF with accurate Gemini 2.0 Flash pricing
+# 300 pages × 1,290 tokens per page = 387,000 tokens
+PDF_TOKENS = 387000  # 300-page PDF tokens
+INPUT_COST_PER_1M_TOKENS = 0.15  # For prompts > 128K tokens
+OUTPUT_COST_PER_1M_TOKENS = 0.60  # For prompts > 128K tokens
+CONTEXT_CACHING_COST_PER_1M_TOKENS = 0.0375  # For prompts > 128K tokens (75% discount)
+CONTEXT_CACHING_STORAGE_PER_HOUR = 0.01875  # Per 1M tokens per hour
+
+# Cost breakdown for 300-page PDF
+INITIAL_UPLOAD_COST = (PDF_TOKENS / 1_000_000) * INPUT_COST_PER_1M_TOKENS  # $0.05805
+STORAGE_COST_PER_HOUR = (PDF_TOKENS / 1_000_000) * CONTEXT_CACHING_STORAGE_PER_HOUR  # $0.00725625
+CACHED_CONTENT_COST_PER_QUERY = (PDF_TOKENS / 1_000_000) * CONTEXT_CACHING_COST_PER_1M_TOKENS  # $0.0145125
+
+# Pricing behind the cost projections in cost_analysis.txt
+PRICING = Pricing(
+    pdf_tokens=PDF_TOKENS,
+    upload_per_1m=INPUT_COST_PER_1M_TOKENS,
+    cached_per_1m=CONTEXT_CACHING_COST_PER_1M_TOKENS,
+    storage_per_1m_hour=CONTEXT_CACHING_STORAGE_PER_HOUR,
+    input_per_1m=0.075,  # Standard rate for ≤128K
+    output_per_1m=0.30,  # Standard rate for ≤128K
+)
+COST_ANALYSIS_FILE = "cost_analysis.txt"
+COST_SCENARIO_USERS = (10, 20, 50, 70, 100)
+
+# Global cache settings - Extended TTL for shared usage
+GLOBAL_CACHE_DURATION_HOURS = 24  # 24 hours for global cache
+CACHE_STATUS_FILE = "global_cache_status.json"
+PDF_PATH = "Document.pdf"
+ANSWER_MODEL = "gemini-2.0-flash-001"
+SYSTEM_INSTRUCTION = "You are an expert document analyzer with proficiency in both English and Telugu. Answer user questions based on the PDF document you have access to. Always provide responses in both formal English and formal Telugu when requested."
+CACHE_CREATION_KEY = "global_pdf_cache"
+
+# Multi-document corpus: every PDF in DOCUMENTS_DIR gets its own cache, fingerprint and TTL.
+# Without that directory the single PDF_PATH is served as before.
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "documents")
+DEFAULT_DOCUMENT_ID = os.path.splitext(os.path.basename(PDF_PATH))[0]
+CACHE_STATUS_DIR = "cache_status"  # status files for documents other than the default one
+MAX_CACHE_STORAGE_COST_PER_HOUR = float(os.getenv("MAX_CACHE_STORAGE_COST_PER_HOUR", "0.05"))  # LRU-evict caches beyond this
+
+# How the PDF reaches Gemini when a cache is created: "file_api" streams it from disk
+# and references it by URI; "inline" embeds the raw bytes in the request
+PDF_UPLOAD_MODE = os.getenv("PDF_UPLOAD_MODE", "file_api")
+
+# Conversation history sent with each question: recent turns verbatim, older ones summarized
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+
+# Chat sessions are stored on disk (SQLite, answers compressed) and resumed by session id after a restart.
+# Only the latest turns of each session stay in memory, and idle sessions are dropped from memory
+# (least recently used first) while all sessions together take more than SESSION_MEMORY_LIMIT_MB
+SESSION_STORE_FILE = os.getenv("SESSION_STORE_FILE", "sessions.db")
+SESSION_HOT_TURNS = max(int(os.getenv("SESSION_HOT_TURNS", "10")), HISTORY_KEEP_TURNS + 1)  # enough for the history window
+SESSION_MEMORY_LIMIT_MB = float(os.getenv("SESSION_MEMORY_LIMIT_MB", "256"))
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "30"))  # delete stored sessions idle this long (0 = keep)
+
+# Answers shared across all users for repeated questions about the same PDF
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", str(GLOBAL_CACHE_DURATION_HOURS)))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true"  # embedding-similarity tier
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+ANSWER_CACHE_FOLLOWUPS = os.getenv("ANSWER_CACHE_FOLLOWUPS", "false").lower() == "true"  # also cache mid-conversation questions
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Answer language: "english", "telugu" or "both" (the UI can choose per question). "both" answers in
+# FIRST_LANGUAGE against the PDF, then translates that answer in a separate pass without the PDF
+OUTPUT_LANGUAGE = os.getenv("OUTPUT_LANGUAGE", "both")
+FIRST_LANGUAGE = os.getenv("FIRST_LANGUAGE", "english")
+if FIRST_LANGUAGE not in LANGUAGES:
+    raise ValueError(f"FIRST_LANGUAGE must be one of {', '.join(LANGUAGES)}, not {FIRST_LANGUAGE!r}")
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "1000"))
+
+# Answers to the FAQ precomputed offline (python answer_bank.py faq.txt), one file per document
+ANSWER_BANK_DIR = os.getenv("ANSWER_BANK_DIR", "answer_bank")
+
+# How questions are answered: "cache" sends the whole PDF via the context cache,
+# "rag" sends only the most relevant chunks from a local index of the PDF
+ANSWER_MODE = os.getenv("ANSWER_MODE", "cache")
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "6"))
+RAG_EMBEDDINGS = os.getenv("RAG_EMBEDDINGS", "false").lower() == "true"  # fuse embedding similarity with BM25
+EMBEDDING_BATCH_SIZE = 100
+
+# Background refresh of the global cache before it expires
+CACHE_REFRESH_POLICY = os.getenv("CACHE_REFRESH_POLICY", "extend")  # "extend", "replace" or "off"
+CACHE_REFRESH_MARGIN_MINUTES = int(os.getenv("CACHE_REFRESH_MARGIN_MINUTES", "60"))  # refresh this long before expiry
+CACHE_REFRESH_INTERVAL_SECONDS = int(os.getenv("CACHE_REFRESH_INTERVAL_SECONDS", "60"))
+CACHE_REFRESH_IDLE_HOURS = float(os.getenv("CACHE_REFRESH_IDLE_HOURS", "6"))  # let the cache expire if unused this long
+
+# Shared request pipeline: bounds concurrent Gemini calls across sessions and paces them to the API quotas
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "8"))
+PIPELINE_REQUESTS_PER_MINUTE = int(os.getenv("PIPELINE_REQUESTS_PER_MINUTE", "1000"))
+PIPELINE_TOKENS_PER_MINUTE = int(os.getenv("PIPELINE_TOKENS_PER_MINUTE", "4000000"))
+PIPELINE_MAX_QUEUE_DEPTH = int(os.getenv("PIPELINE_MAX_QUEUE_DEPTH", "200"))  # reject beyond this many waiting calls
+EXPECTED_OUTPUT_TOKENS = 1000  # reserved per call until usage_metadata reports the real count
+CACHE_PIPELINE_SESSION = "cache"  # queue shared by cache creation (also runs on the refresher thread)
+ANSWER_BANK_SESSION = "answer-bank"  # session id prefix of answer bank builds
+
+# Resilience: per-attempt timeouts, retries with jittered backoff on 429/5xx, and a circuit breaker per model
+GENERATE_TIMEOUT_SECONDS = float(os.getenv("GENERATE_TIMEOUT_SECONDS", "90"))  # per attempt
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "180"))  # whole call, retries included
+RETRY_POLICY = RetryPolicy(
+    attempts=int(os.getenv("RETRY_ATTEMPTS", "3")),
+    base_delay=1.0,
+    max_delay=16.0,
+    deadline=REQUEST_DEADLINE_SECONDS,
+)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive transient failures
+CIRCUIT_RESET_SECONDS = int(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "0"))  # duplicate slow non-streamed answers after this long (0 = off)
+
+# Telemetry: one JSON line per API call, written off the request path by a queue listener thread
+TELEMETRY_FILE = os.getenv("TELEMETRY_FILE", "api_telemetry.jsonl")
+TELEMETRY_MAX_BYTES = int(os.getenv("TELEMETRY_MAX_BYTES", str(10 * 1024 * 1024)))  # rotate past this size
+TELEMETRY_BACKUP_COUNT = int(os.getenv("TELEMETRY_BACKUP_COUNT", "5"))
+
+# Deployment-wide cost ledger (SQLite, WAL mode) and daily budget caps in $ (0 = no cap)
+COST_LEDGER_FILE = os.getenv("COST_LEDGER_FILE", "cost_ledger.db")
+COST_LEDGER_FLUSH_SECONDS = float(os.getenv("COST_LEDGER_FLUSH_SECONDS", "2"))
+DAILY_BUDGET = float(os.getenv("DAILY_BUDGET", "0"))
+SESSION_DAILY_BUDGET = float(os.getenv("SESSION_DAILY_BUDGET", "0"))
+BUDGET_THROTTLE_AT = float(os.getenv("BUDGET_THROTTLE_AT", "0.8"))  # past this fraction of a cap, space out each session's calls
+BUDGET_THROTTLE_SECONDS = float(os.getenv("BUDGET_THROTTLE_SECONDS", "10"))
+
+# Prometheus-style /metrics endpoint on this host (0 = off), and opt-in per-question profiling:
+# "cprofile" writes .prof files, "pyinstrument" HTML reports, to PROFILE_DIR
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+ACTIVE_SESSION_MINUTES = int(os.getenv("ACTIVE_SESSION_MINUTES", "30"))  # sessions seen this recently count as active
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "off")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+pipeline = get_pipeline(
+    max_concurrency=PIPELINE_MAX_CONCURRENCY,
+    requests_per_minute=PIPELINE_REQUESTS_PER_MINUTE,
+    tokens_per_minute=PIPELINE_TOKENS_PER_MINUTE,
+    max_queue_depth=PIPELINE_MAX_QUEUE_DEPTH,
+)
+
+start_telemetry(TELEMETRY_FILE, TELEMETRY_MAX_BYTES, TELEMETRY_BACKUP_COUNT)
+
+ledger = get_ledger(
+    COST_LEDGER_FILE,
+    flush_interval=COST_LEDGER_FLUSH_SECONDS,
+    daily_budget=DAILY_BUDGET,
+    session_daily_budget=SESSION_DAILY_BUDGET,
+    throttle_at=BUDGET_THROTTLE_AT,
+    throttle_interval=BUDGET_THROTTLE_SECONDS,
+)
+
+session_store = get_session_store(SESSION_STORE_FILE)
+if SESSION_RETENTION_DAYS:
+    session_store.prune(SESSION_RETENTION_DAYS * 86400)
+
+# Cost projections - rebuilt and rewritten only when the pricing changes, off the startup path
+threading.Thread(target=ensure_cost_report, args=(COST_ANALYSIS_FILE, PRICING, COST_SCENARIO_USERS, CACHE_REFRESH_POLICY),
+                 name="cost-report", daemon=True).start()
+
+API_CALLS = counter("gemini_api_calls_total", "API calls (answer cache hits included)", ("operation", "operation_type"))
+API_TOKENS = counter("gemini_tokens_total", "Tokens billed", ("operation_type", "kind"))
+API_COST = counter("gemini_cost_dollars_total", "Estimated API cost in $", ("operation_type",))
+API_LATENCY = histogram("gemini_api_call_duration_seconds", "API call latency, retries included", ("operation",))
+CACHE_VALID = gauge("context_cache_valid", "1 while a document's context cache is valid", ("document",))
+gauge("active_sessions", f"Sessions active in the last {ACTIVE_SESSION_MINUTES} minutes").set_function(
+    lambda: active_sessions(ACTIVE_SESSION_MINUTES * 60))
+gauge("request_pipeline_queue_depth", "Calls waiting for a pipeline slot").set_function(lambda: pipeline.stats()["queue_depth"])
+gauge("request_pipeline_active_calls", "Calls holding a pipeline slot").set_function(lambda: pipeline.stats()["active"])
+gauge("cost_spent_today_dollars", "Deployment spend today from the cost ledger").set_function(ledger.spent_today)
+gauge("chat_sessions_in_memory", "Chat sessions held in memory").set_function(lambda: len(_sessions))
+gauge("chat_session_memory_bytes", "Estimated memory of in-memory chat sessions: total, mean and max per session",
+      ("stat",)).set_function(lambda: session_memory_stats())
+SESSIONS_EVICTED = counter("chat_sessions_evicted_total", "Idle sessions dropped from memory past SESSION_MEMORY_LIMIT_MB")
+SESSIONS_RESUMED = counter("chat_sessions_resumed_total", "Sessions loaded back from the session store")
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT, METRICS_HOST)
+
+def estimate_request_tokens(contents, operation_type="generation"):
+    """Tokens a call is expected to use, reserved from the pipeline's tokens-per-minute budget"""
+    cached_tokens = PDF_TOKENS if operation_type == "query" else 0
+    return cached_tokens + approximate_tokens(contents) + EXPECTED_OUTPUT_TOKENS
+
+def log_pipeline_stats():
+    """Request pipeline load, logged after each generated answer"""
+    stats = pipeline.stats()
+    logger.info(
+        f"Request pipeline: {stats['active']} active, queue depth {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+        f"wait {stats['avg_wait_seconds']:.3f}s avg / {stats['max_wait_seconds']:.3f}s max, "
+        f"{stats['granted']} granted, {stats['rejected']} rejected"
+    )
+
+def get_model_breaker(name=ANSWER_MODEL):
+    return get_breaker(name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_after=CIRCUIT_RESET_SECONDS)
+
+def request_options(timeout):
+    """Per-attempt timeout, cut down to whatever is left of the call's deadline"""
+    return {"timeout": GENERATE_TIMEOUT_SECONDS if timeout is None else min(GENERATE_TIMEOUT_SECONDS, timeout)}
+
+def reported_tokens(response):
+    """Prompt plus output tokens from a response's usage_metadata (None keeps the estimate)"""
+    usage = usage_from_metadata(getattr(response, "usage_metadata", None))
+    return usage.prompt_tokens + usage.output_tokens if usage else None
+
+def get_documents():
+    """All servable documents: document id -> {"id", "path", "title", "ttl_hours"}"""
+    return discover_documents(DOCUMENTS_DIR, PDF_PATH)
+
+def get_document(doc_id=DEFAULT_DOCUMENT_ID):
+    documents = get_documents()
+    return documents.get(doc_id) or next(iter(documents.values()))
+
+def get_document_ttl_hours(doc_id=DEFAULT_DOCUMENT_ID):
+    return get_document(doc_id)["ttl_hours"] or GLOBAL_CACHE_DURATION_HOURS
+
+def get_cache_status_file(doc_id=DEFAULT_DOCUMENT_ID):
+    """The default document keeps the original status file; others get one each"""
+    if doc_id == DEFAULT_DOCUMENT_ID:
+        return CACHE_STATUS_FILE
+    return os.path.join(CACHE_STATUS_DIR, f"{doc_id}.json")
+
+def get_cache_key(doc_id=DEFAULT_DOCUMENT_ID):
+    """Single-flight key for creating/refreshing a document's cache"""
+    if doc_id == DEFAULT_DOCUMENT_ID:
+        return CACHE_CREATION_KEY
+    return f"{CACHE_CREATION_KEY}:{doc_id}"
+
+def get_cache_creation_lock(doc_id=DEFAULT_DOCUMENT_ID):
+    """Cross-process lock for creating a document's cache"""
+    return f"{get_cache_status_file(doc_id)}.create"
+
+@timed("load_cache_status")
+def load_cache_status(doc_id=DEFAULT_DOCUMENT_ID):
+    """Load a document's cache status from the process-wide registry"""
+    return load_status(get_cache_status_file(doc_id))
+
+def save_cache_status(cache_name, created_at, pdf_hash, doc_id=DEFAULT_DOCUMENT_ID, tokens=PDF_TOKENS):
+    """Save a document's cache status to the registry (atomic write-through to file)"""
+    try:
+        ttl_hours = get_document_ttl_hours(doc_id)
+        status = {
+            "cache_name": cache_name,
+            "created_at": created_at.isoformat(),
+            "pdf_hash": pdf_hash,
+            "ttl_hours": ttl_hours,
+            "expires_at": (created_at + timedelta(hours=ttl_hours)).isoformat(),
+            "document": doc_id,
+            "tokens": tokens
+        }
+        save_status(get_cache_status_file(doc_id), status)
+    except Exception as e:
+        logger.error(f"Error saving cache status: {e}")
+
+@timed("get_pdf_hash")
+def get_pdf_hash(doc_id=DEFAULT_DOCUMENT_ID):
+    """Get hash of the PDF file to detect changes (memoized per file version)"""
+    return get_fingerprint(get_document(doc_id)["path"])
+
+def is_global_cache_valid(doc_id=DEFAULT_DOCUMENT_ID):
+    """Check if a document's cache is still valid"""
+    status = load_cache_status(doc_id)
+    if not status:
+        return False, None
+    
+    # Check if PDF has changed
+    current_pdf_hash = get_pdf_hash(doc_id)
+    if current_pdf_hash != status.get("pdf_hash"):
+        logger.info("PDF has changed, cache invalid")
+        return False, None
+    
+    # Check if cache has expired
+    if datetime.now() >= get_expires_at(status):
+        logger.info("Global cache expired")
+        return False, None
+    
+    return True, status["cache_name"]
+
+def cache_status(doc_id=DEFAULT_DOCUMENT_ID):
+    """
+    Whether a document is ready for questions: with ANSWER_MODE "cache" that needs
+    a valid context cache (see start_session); "rag" is always ready.
+    """
+    is_valid, cache_name = is_global_cache_valid(doc_id)
+    CACHE_VALID.set(int(is_valid), document=doc_id)
+    status = {"document": doc_id, "mode": ANSWER_MODE, "ready": is_valid or ANSWER_MODE == "rag",
+              "cache_valid": is_valid, "cache_name": cache_name, "remaining_seconds": None,
+              "message": "No global cache", "color": "red"}
+    cache_file_status = load_cache_status(doc_id) if is_valid else None
+    if cache_file_status:
+        remaining = (get_expires_at(cache_file_status) - datetime.now()).total_seconds()
+        hours = int(remaining // 3600)
+        minutes = int((remaining % 3600) // 60)
+        status.update(remaining_seconds=remaining, message=f"Global cache valid ({hours}h {minutes}m)", color="green")
+    return status
+
+def calculate_cost(input_tokens, output_tokens, operation_type="query", cache_hours=0, cached_tokens=0):
+    """
+    Calculate cost based on operation type and token usage
+    operation_type: "initial_upload", "query", "generation", "storage"
+    cached_tokens: cached-content tokens actually billed (falls back to the full PDF if unknown)
+    cache_hours: hours of cache storage bought ("initial_upload" for the first TTL, "storage" for an extension)
+    """
+    if operation_type == "initial_upload":
+        # Initial PDF upload cost, plus storage for the cache's first TTL
+        if input_tokens:
+            return (input_tokens / 1_000_000) * INPUT_COST_PER_1M_TOKENS + cache_hours * get_storage_cost_per_hour(input_tokens)
+        return INITIAL_UPLOAD_COST + cache_hours * STORAGE_COST_PER_HOUR
+    
+    elif operation_type == "query":
+        # Query cost: cached content + new input + output
+        if cached_tokens:
+            cached_content_cost = (cached_tokens / 1_000_000) * CONTEXT_CACHING_COST_PER_1M_TOKENS
+        else:
+            cached_content_cost = CACHED_CONTENT_COST_PER_QUERY
+        
+        # New input cost (user question)
+        if input_tokens <= 128000:
+            input_cost = (input_tokens / 1_000_000) * 0.075  # Standard rate for ≤128K
+        else:
+            input_cost = (input_tokens / 1_000_000) * INPUT_COST_PER_1M_TOKENS
+        
+        # Output cost
+        if output_tokens <= 128000:
+            output_cost = (output_tokens / 1_000_000) * 0.30  # Standard rate for ≤128K
+        else:
+            output_cost = (output_tokens / 1_000_000) * OUTPUT_COST_PER_1M_TOKENS
+        
+        return cached_content_cost + input_cost + output_cost
+    
+    elif operation_type == "generation":
+        # Plain model call without the cached PDF (e.g. history summaries)
+        input_cost = (input_tokens / 1_000_000) * 0.075
+        output_cost = (output_tokens / 1_000_000) * 0.30
+        return input_cost + output_cost
+    
+    elif operation_type == "storage":
+        # Storage cost per hour of the cached tokens
+        if cached_tokens:
+            return cache_hours * get_storage_cost_per_hour(cached_tokens)
+        return cache_hours * STORAGE_COST_PER_HOUR
+    
+    return 0.0
+
+def get_storage_cost_per_hour(tokens):
+    """Hourly storage cost of a context cache holding `tokens` tokens"""
+    return (tokens / 1_000_000) * CONTEXT_CACHING_STORAGE_PER_HOUR
+
+def log_api_call(session_id, operation, input_tokens, output_tokens, operation_type="query", cache_hours=0, cached_tokens=0,
+                 document=None, latency=None, time_to_first_token=None, answer_cache_hit=False, language=None,
+                 output_tokens_saved=0, cost_saved=0.0, translation_cache_hit=False):
+    cost = calculate_cost(input_tokens, output_tokens, operation_type, cache_hours, cached_tokens)
+    session_total = ledger.record(
+        session_id, operation, operation_type, cost,
+        input_tokens=input_tokens, cached_tokens=cached_tokens, output_tokens=output_tokens, document=document,
+    )
+    API_CALLS.inc(operation=operation, operation_type=operation_type)
+    API_COST.inc(cost, operation_type=operation_type)
+    for kind, tokens in (("input", input_tokens), ("cached", cached_tokens), ("output", output_tokens)):
+        if tokens:
+            API_TOKENS.inc(tokens, operation_type=operation_type, kind=kind)
+    if latency is not None:
+        API_LATENCY.observe(latency, operation=operation)
+    # Queued for the telemetry file; never blocks on disk
+    record_event(
+        "api_call",
+        operation=operation,
+        operation_type=operation_type,
+        session_id=session_id,
+        document=document,
+        input_tokens=input_tokens,
+        cached_tokens=cached_tokens,
+        output_tokens=output_tokens,
+        cache_hours=cache_hours,
+        latency_s=None if latency is None else round(latency, 3),
+        ttft_s=None if time_to_first_token is None else round(time_to_first_token, 3),
+        answer_cache_hit=answer_cache_hit,
+        translation_cache_hit=translation_cache_hit,
+        language=language,
+        output_tokens_saved=output_tokens_saved,  # vs. a bilingual answer, or a cached translation
+        cost_saved=round(cost_saved, 8),  # what a banked/cached answer or translation cost to generate
+        cost=round(cost, 8),
+        session_total_cost=round(session_total, 8),
+    )
+
+    # Shown under the chat with SHOW_API_CALL_DETAILS
+    session = _sessions.get(session_id)
+    if session is not None:
+        session.last_calls.append({
+            "operation": operation,
+            "operation_type": operation_type,
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "output_tokens": output_tokens,
+            "cache_hours": cache_hours,
+            "cost": cost,
+            "session_total": session_total,
+        })
+
+def check_budget(session_id, contents, operation_type="query"):
+    """
+    Refuse a call that would go over a daily budget cap (BudgetExceeded) before
+    anything is spent; close to a cap, wait so each session's calls are spaced out.
+    """
+    admit_cost(session_id, calculate_cost(approximate_tokens(contents), EXPECTED_OUTPUT_TOKENS, operation_type))
+
+def admit_cost(session_id, estimated_cost):
+    delay = ledger.admit(session_id, estimated_cost)
+    if delay:
+        logger.info(f"Near the daily budget, throttling session {session_id} for {delay:.1f}s")
+        time.sleep(delay)
+
+def get_stored_pdf_path(doc_id=DEFAULT_DOCUMENT_ID):
+    """Path of the pre-stored PDF file in the project directory (None if missing)"""
+    pdf_path = get_document(doc_id)["path"]
+    if not os.path.exists(pdf_path):
+        logger.error(f"{pdf_path} not found in the project directory")
+        return None
+    return pdf_path
+
+def delete_cache(cache_name):
+    """Delete a CachedContent from Gemini so its storage stops being billed"""
+    try:
+        get_genai().caching.CachedContent.get(cache_name).delete()
+        logger.info(f"Deleted cache {cache_name}")
+    except Exception as e:
+        logger.warning(f"Could not delete cache {cache_name}: {e}")
+
+def delete_document_cache(doc_id):
+    """Delete a document's cache from Gemini and mark its status expired"""
+    status = load_cache_status(doc_id)
+    if not status:
+        return
+    delete_cache(status["cache_name"])
+    now = datetime.now().isoformat()
+    save_status(get_cache_status_file(doc_id), dict(status, expires_at=now, evicted_at=now))
+    logger.info(f"Evicted cache for document {doc_id}")
+
+def enforce_storage_budget(doc_id, new_tokens=PDF_TOKENS):
+    """Evict least recently used document caches so total storage cost stays within budget"""
+    live_caches = {}
+    for other_id in get_documents():
+        if other_id == doc_id or not is_global_cache_valid(other_id)[0]:
+            continue
+        status = load_cache_status(other_id)
+        created_at = datetime.fromisoformat(status["created_at"]).timestamp()
+        live_caches[other_id] = {
+            "cost_per_hour": get_storage_cost_per_hour(status.get("tokens", PDF_TOKENS)),
+            "last_used": max(last_used(other_id) or 0, created_at),
+        }
+    for victim in select_evictions(live_caches, get_storage_cost_per_hour(new_tokens), MAX_CACHE_STORAGE_COST_PER_HOUR):
+        delete_document_cache(victim)
+
+def _upload_global_pdf_cache(doc_id=DEFAULT_DOCUMENT_ID):
+    """Upload the document's PDF as a new cache and record it (no UI calls)"""
+    cache_key = get_cache_key(doc_id)
+    pdf_path = get_document(doc_id)["path"]
+    # Checked before anything is uploaded; raises BudgetExceeded past a daily cap
+    tokens = (load_cache_status(doc_id) or {}).get("tokens", PDF_TOKENS)
+    admit_cost(CACHE_PIPELINE_SESSION, calculate_cost(tokens, 0, "initial_upload", get_document_ttl_hours(doc_id)))
+    enforce_storage_budget(doc_id)
+    pdf_hash = get_pdf_hash(doc_id)
+    
+    # Create unique cache name with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    cache_name = f"global_pdf_cache_{timestamp}" if doc_id == DEFAULT_DOCUMENT_ID else f"pdf_cache_{doc_id}_{timestamp}"
+    
+    set_progress(cache_key, "Uploading document to Gemini...")
+    if PDF_UPLOAD_MODE == "inline":
+        pdf_part = inline_pdf_part(pdf_path)
+    else:
+        pdf_part = upload_pdf_part(get_genai(), pdf_path, cache_name)
+    
+    # Add additional text to meet minimum token requirement (4096 tokens)
+    additional_text = "Please analyze this PDF document thoroughly. " * 2  # Add context to meet minimum tokens
+    
+    pdf_content = {
+        "role": "user",
+        "parts": [
+            {"text": f"Here is the PDF document to analyze: {additional_text}"},
+            pdf_part
+        ]
+    }
+    
+    set_progress(cache_key, "Creating context cache...")
+    with pipeline.slot(CACHE_PIPELINE_SESSION, PDF_TOKENS) as slot:
+        cache = get_genai().caching.CachedContent.create(
+            model=f"models/{ANSWER_MODEL}",
+            display_name=cache_name,
+            system_instruction=SYSTEM_INSTRUCTION,
+            contents=[pdf_content],
+            ttl=timedelta(hours=get_document_ttl_hours(doc_id)),
+        )
+        slot["tokens"] = getattr(getattr(cache, "usage_metadata", None), "total_token_count", None)
+    
+    # Save cache status
+    usage_metadata = getattr(cache, "usage_metadata", None)
+    tokens = getattr(usage_metadata, "total_token_count", 0) or PDF_TOKENS
+    save_cache_status(cache.name, datetime.now(), pdf_hash, doc_id, tokens)
+    
+    return cache
+
+def _build_global_pdf_cache(doc_id=DEFAULT_DOCUMENT_ID):
+    """Create a document's cache from its pre-stored PDF file"""
+    if get_stored_pdf_path(doc_id) is None:
+        return None
+    
+    started = time.perf_counter()
+    cache = _upload_global_pdf_cache(doc_id)
+    log_cache_upload(doc_id, "Global Cache Creation", time.perf_counter() - started)
+    return cache
+
+def log_cache_upload(doc_id, operation, latency):
+    tokens = (load_cache_status(doc_id) or {}).get("tokens", PDF_TOKENS)
+    ttl_hours = get_document_ttl_hours(doc_id)
+    log_api_call(CACHE_PIPELINE_SESSION, operation, tokens, 0, "initial_upload", ttl_hours, document=doc_id, latency=latency)
+
+def admit_cache_extension(status, hours):
+    """Check the storage an extension buys against the daily caps (BudgetExceeded lets the cache expire)"""
+    admit_cost(CACHE_PIPELINE_SESSION, calculate_cost(0, 0, "storage", hours, status.get("tokens", PDF_TOKENS)))
+
+def log_cache_extension(status, hours, latency):
+    log_api_call(CACHE_PIPELINE_SESSION, "Global Cache Extension", 0, 0, "storage", hours, status.get("tokens", PDF_TOKENS),
+                 document=status.get("document"), latency=latency)
+
+def _replace_global_pdf_cache(doc_id=DEFAULT_DOCUMENT_ID):
+    """Build a replacement cache for a document from the background refresher thread, then delete the old one"""
+    previous = load_cache_status(doc_id)
+    started = time.perf_counter()
+    cache = _upload_global_pdf_cache(doc_id)
+    log_cache_upload(doc_id, "Global Cache Replacement", time.perf_counter() - started)
+    if previous and previous["cache_name"] != cache.name:
+        # Questions already running against the old cache get up to REQUEST_DEADLINE_SECONDS to finish
+        timer = threading.Timer(REQUEST_DEADLINE_SECONDS, delete_cache, args=(previous["cache_name"],))
+        timer.daemon = True
+        timer.start()
+    return cache
+
+def create_global_pdf_cache(on_wait=None, doc_id=DEFAULT_DOCUMENT_ID):
+    """
+    Create a document's cache exactly once, even when many sessions (or processes)
+    click Start Session together. Everyone else waits for and reuses that cache.
+    on_wait(progress_message, elapsed_seconds) is called periodically while waiting.
+    """
+    def find_existing_cache():
+        is_valid, _ = is_global_cache_valid(doc_id)
+        return get_or_create_global_cache(doc_id) if is_valid else None
+    
+    cache, created = run_once(
+        get_cache_key(doc_id),
+        lambda: _build_global_pdf_cache(doc_id),
+        lock_path=get_cache_creation_lock(doc_id),
+        check_existing=find_existing_cache,
+        on_wait=on_wait,
+    )
+    if cache and not created:
+        logger.info(f"Reusing cache for {doc_id} created by another session")
+    if cache:
+        start_document_refresher(doc_id)
+    return cache
+
+@timed("get_or_create_global_cache")
+def get_or_create_global_cache(doc_id=DEFAULT_DOCUMENT_ID):
+    """Get a document's existing cache (caches are only created from Start Session)"""
+    is_valid, cache_name = is_global_cache_valid(doc_id)
+    
+    if is_valid and cache_name:
+        # Try to retrieve existing cache
+        try:
+            cache = call_with_retry(
+                lambda timeout: get_genai().caching.CachedContent.get(cache_name),
+                RETRY_POLICY,
+                get_model_breaker("cachedContents"),
+            )
+            logger.info(f"Using existing global cache: {cache_name}")
+            start_document_refresher(doc_id)
+            return cache
+        except Exception as e:
+            logger.error(f"Error retrieving cache {cache_name}: {e}")
+            # Don't create new cache automatically - return None
+            return None
+    
+    # Don't create new global cache automatically - return None
+    logger.info("Global cache expired or invalid - manual creation required")
+    return None
+
+def start_document_refresher(doc_id=DEFAULT_DOCUMENT_ID):
+    """Keep a document's cache alive in the background (one refresher thread per document per process)"""
+    touch_document(doc_id)
+    refresher = start_refresher(
+        CACHE_REFRESH_INTERVAL_SECONDS,
+        key=get_cache_key(doc_id),
+        load_status=lambda: load_cache_status(doc_id),
+        save_status=lambda status: save_status(get_cache_status_file(doc_id), status),
+        caching=get_genai().caching,
+        create_cache=lambda: _replace_global_pdf_cache(doc_id),
+        ttl=timedelta(hours=get_document_ttl_hours(doc_id)),
+        margin=timedelta(minutes=CACHE_REFRESH_MARGIN_MINUTES),
+        policy=CACHE_REFRESH_POLICY,
+        idle_after=timedelta(hours=CACHE_REFRESH_IDLE_HOURS),
+        lock_path=get_cache_creation_lock(doc_id),
+        admit_extension=admit_cache_extension,
+        record_extension=log_cache_extension,
+    )
+    refresher.touch()
+    return refresher
+
+@timed("get_token_count")
+def get_token_count(session_id, text):
+    """Get accurate token count using Gemini API (extra round-trip - prefer usage_metadata)"""
+    try:
+        model = get_genai().GenerativeModel(ANSWER_MODEL)
+        # Use count_tokens method if available
+        if hasattr(model, 'count_tokens'):
+            with pipeline.slot(session_id):
+                result = model.count_tokens(text, request_options=request_options(None))
+            return result.total_tokens
+        else:
+            # Fallback to approximation
+            return approximate_tokens(text)
+    except Exception as e:
+        logger.warning(f"Could not get exact token count: {e}")
+        return approximate_tokens(text)
+
+def get_response_usage(session_id, response, conversation, answer):
+    """
+    Token usage of a generate_content call, taken from the usage_metadata the
+    response already carries. count_tokens is only called if that is missing.
+    """
+    usage = usage_from_metadata(getattr(response, "usage_metadata", None))
+    if usage:
+        return usage
+    logger.warning("Response has no usage_metadata, counting tokens separately")
+    return TokenUsage(prompt_tokens=get_token_count(session_id, conversation), cached_tokens=0,
+                      output_tokens=get_token_count(session_id, answer))
+
+def embed_question(text):
+    """Embedding vector for the answer cache's similarity tier"""
+    result = get_genai().embed_content(model=EMBEDDING_MODEL, content=text, task_type="retrieval_query")
+    return result["embedding"]
+
+def embed_documents(texts):
+    """Embedding vectors for PDF chunks in the retrieval index"""
+    embeddings = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        result = get_genai().embed_content(model=EMBEDDING_MODEL, content=batch, task_type="retrieval_document")
+        embeddings.extend(result["embedding"])
+    return embeddings
+
+def get_retrieval_index(doc_id=DEFAULT_DOCUMENT_ID):
+    """On-disk BM25 (+ optional embedding) index of a document, built once per PDF version"""
+    pdf_path = get_document(doc_id)["path"]
+    return get_index(pdf_path, get_pdf_hash(doc_id), RAG_INDEX_DIR, embed_documents if RAG_EMBEDDINGS else None)
+
+def retrieve_context(question, doc_id=DEFAULT_DOCUMENT_ID):
+    """The top-k PDF chunks for a question, formatted with page numbers"""
+    started = time.perf_counter()
+    query_embedding = embed_question(question) if RAG_EMBEDDINGS else None
+    chunks = get_retrieval_index(doc_id).search(question, k=RAG_TOP_K, query_embedding=query_embedding)
+    logger.info(f"Retrieved {len(chunks)} chunks (pages {sorted({c['page'] for c in chunks})}) in {time.perf_counter() - started:.3f}s")
+    return format_context(chunks)
+
+# Process-wide answer cache shared by all sessions
+answer_cache = get_answer_cache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_HOURS * 3600,
+    embed=embed_question if ANSWER_CACHE_SEMANTIC else None,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY,
+)
+gauge("answer_cache_hit_rate", "Share of answer cache lookups served from the cache").set_function(
+    lambda: answer_cache.stats()["hit_rate"])
+gauge("answer_cache_saved_dollars", "Generation cost of the answers served from the answer cache").set_function(
+    lambda: answer_cache.stats()["saved_cost"])
+
+def is_answer_cacheable(turns):
+    """Follow-up questions depend on the conversation, so only standalone ones are shared by default"""
+    return ANSWER_CACHE_ENABLED and (not turns or ANSWER_CACHE_FOLLOWUPS)
+
+def get_cached_answer(session, question, language=FIRST_LANGUAGE):
+    """Serve a banked FAQ answer, or a previously generated answer to the same question about the same PDF, if any"""
+    doc_id = session.document_id
+    started = time.perf_counter()
+    pdf_hash = get_pdf_hash(doc_id)
+    hit, source = get_answer_bank(ANSWER_BANK_DIR, doc_id, language).lookup(question, pdf_hash), "answer_bank"
+    if hit is None and is_answer_cacheable(session.turns):
+        hit, source = answer_cache.lookup(question, pdf_hash, scope=f"{doc_id}:{language}"), "answer_cache"
+    if hit is None:
+        return None
+    answer, cost_saved = hit
+    log_api_call(session.id, "Question Answering", 0, 0, source, document=doc_id, latency=time.perf_counter() - started,
+                 answer_cache_hit=True, language=language, cost_saved=cost_saved)
+    return answer
+
+def store_answer(turns, question, answer, cost, doc_id=DEFAULT_DOCUMENT_ID, language=FIRST_LANGUAGE):
+    """Share a freshly generated answer with later askers"""
+    if is_answer_cacheable(turns):
+        answer_cache.put(question, get_pdf_hash(doc_id), answer, cost, scope=f"{doc_id}:{language}")
+
+def generate(session_id, model, contents, operation_type="generation", hedge=False):
+    """
+    generate_content with per-attempt timeouts and retries on transient errors,
+    each attempt in a pipeline slot. With hedge=True and HEDGE_AFTER_SECONDS set,
+    a slow attempt gets a duplicate and the first to finish wins.
+    """
+    tokens = estimate_request_tokens(contents, operation_type)
+    check_budget(session_id, contents, operation_type)
+    
+    def attempt(timeout):
+        def call():
+            with pipeline.slot(session_id, tokens) as slot:
+                response = model.generate_content(contents, request_options=request_options(timeout))
+                slot["tokens"] = reported_tokens(response)
+            return response
+        if hedge and HEDGE_AFTER_SECONDS > 0:
+            on_hedge = lambda n: logger.info(f"Hedging slow request after {HEDGE_AFTER_SECONDS}s (duplicate {n} is billed too)")
+            return hedged_call(call, HEDGE_AFTER_SECONDS, on_hedge=on_hedge, on_discard=log_discarded)
+        return call()
+    
+    def log_discarded(response):
+        # The losing call was answered and billed like the winner
+        usage = get_response_usage(session_id, response, contents, response.text)
+        log_api_call(session_id, "Hedged Duplicate", usage.input_tokens, usage.output_tokens, operation_type,
+                     cached_tokens=usage.cached_tokens)
+    
+    return call_with_retry(attempt, RETRY_POLICY, get_model_breaker())
+
+def summarize_history(session_id, previous_summary, turns):
+    """Fold older conversation turns into the running summary (cheap call, no cached PDF)"""
+    model = get_genai().GenerativeModel(ANSWER_MODEL)
+    prompt = summary_prompt(previous_summary, turns)
+    started = time.perf_counter()
+    response = generate(session_id, model, prompt)
+    latency = time.perf_counter() - started
+    usage = get_response_usage(session_id, response, prompt, response.text)
+    log_api_call(session_id, "History Summary", usage.input_tokens, usage.output_tokens, "generation", latency=latency)
+    return response.text.strip()
+
+def get_windowed_history(session):
+    """Recent turns verbatim plus a summary of older ones, memoized in the session"""
+    # Turns the summary already covers are not needed, so this rarely reaches past the in-memory turns
+    covered = min(session.summary["covered_turns"], session.turns)
+    summary, recent_turns, state = window_history(
+        get_turns(session, covered),
+        dict(session.summary, covered_turns=0),
+        lambda previous_summary, turns: summarize_history(session.id, previous_summary, turns),
+        keep_turns=HISTORY_KEEP_TURNS,
+        token_budget=HISTORY_TOKEN_BUDGET,
+    )
+    session.summary = dict(state, covered_turns=state["covered_turns"] + covered)
+    return summary, recent_turns
+
+def build_conversation(session, question, context=None, language=FIRST_LANGUAGE):
+    """Build the conversation sent to Gemini: document excerpts (RAG), previous turns and the question in one language"""
+    summary, recent_turns = get_windowed_history(session)
+    
+    conversation = []
+    if context:
+        conversation.append(f"Relevant excerpts from the PDF document:\n\n{context}")
+    if summary:
+        conversation.append(f"Summary of the earlier conversation:\n{summary}")
+    for q, a in recent_turns:
+        conversation.append(q)
+        conversation.append(a)
+    
+    # One language per pass; "both" translates the answer separately (translate_answer)
+    conversation.append(answer_prompt(question, language))
+    return conversation
+
+def prepare_question(session, question, mode=None, language=FIRST_LANGUAGE):
+    """
+    Pick the model and conversation for an answer mode.
+    "cache" answers against the whole PDF in the context cache; "rag" sends only the
+    retrieved chunks to a plain model. Returns (model, conversation, operation_type).
+    """
+    mode = mode or ANSWER_MODE
+    doc_id = session.document_id
+    touch_document(doc_id)
+    if mode == "rag":
+        model = get_genai().GenerativeModel(ANSWER_MODEL, system_instruction=SYSTEM_INSTRUCTION)
+        return model, build_conversation(session, question, retrieve_context(question, doc_id), language), "generation"
+    model = get_genai().GenerativeModel.from_cached_content(cached_content=get_live_cache(doc_id))
+    return model, build_conversation(session, question, language=language), "query"
+
+@timed("ask_question")
+def ask_question(session, question, mode=None, language=FIRST_LANGUAGE, bilingual=False):
+    """
+    Answer in one language. With bilingual=False the answer replaces the bilingual one the
+    app used to generate, and the other language's output tokens it skipped are logged as saved.
+    """
+    model, conversation, operation_type = prepare_question(session, question, mode, language)
+    
+    started = time.perf_counter()
+    response = generate(session.id, model, conversation, operation_type, hedge=True)
+    latency = time.perf_counter() - started
+    
+    usage = get_response_usage(session.id, response, conversation, response.text)
+    log_api_call(session.id, "Question Answering", usage.input_tokens, usage.output_tokens, operation_type, cached_tokens=usage.cached_tokens,
+                 document=session.document_id, latency=latency, language=language,
+                 output_tokens_saved=0 if bilingual else estimated_tokens_saved(usage.output_tokens, language))
+    
+    return response.text
+
+def generate_stream(session_id, model, contents, operation_type="generation"):
+    """
+    Stream generate_content, yielding text chunks, in a pipeline slot held until the
+    stream is consumed. Returns (last response, time to first token, full text) when done.
+    """
+    tokens = estimate_request_tokens(contents, operation_type)
+    check_budget(session_id, contents, operation_type)
+    responses = []
+    
+    def open_stream(timeout):
+        # The slot is held until the stream is fully consumed
+        with pipeline.slot(session_id, tokens) as slot:
+            response = model.generate_content(contents, stream=True, request_options=request_options(timeout))
+            responses.append(response)
+            yield from response
+            slot["tokens"] = reported_tokens(response)
+    
+    started = time.perf_counter()
+    time_to_first_token = None
+    answer = ""
+    # Retried only until the first chunk arrives; a stream cut off later is raised
+    for chunk in retry_stream(open_stream, RETRY_POLICY, get_model_breaker()):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety or finish metadata)
+            continue
+        if time_to_first_token is None:
+            time_to_first_token = time.perf_counter() - started
+        answer += text
+        yield text
+    return responses[-1], time_to_first_token, answer
+
+@timed("stream_question")
+def stream_question(session, question, mode=None, language=FIRST_LANGUAGE, bilingual=False):
+    """Like ask_question(), but yields the answer text chunk by chunk as it is generated"""
+    model, conversation, operation_type = prepare_question(session, question, mode, language)
+    
+    started = time.perf_counter()
+    response, time_to_first_token, answer = yield from generate_stream(session.id, model, conversation, operation_type)
+    total_latency = time.perf_counter() - started
+    
+    # usage_metadata is populated once the stream has been fully consumed
+    usage = get_response_usage(session.id, response, conversation, answer)
+    log_api_call(session.id, "Question Answering", usage.input_tokens, usage.output_tokens, operation_type, cached_tokens=usage.cached_tokens,
+                 document=session.document_id, latency=total_latency, time_to_first_token=time_to_first_token, language=language,
+                 output_tokens_saved=0 if bilingual else estimated_tokens_saved(usage.output_tokens, language))
+
+# Translations of answers shared by all sessions, so a repeated or shared answer is translated once
+translation_cache = get_translation_cache(max_entries=TRANSLATION_CACHE_MAX_ENTRIES)
+
+@timed("translate_answer")
+def translate_answer(session, text, language, streaming=True):
+    """
+    Yield `text` translated into `language`: a plain model call on the answer alone,
+    without the cached PDF, or the cached translation of the same text.
+    """
+    started = time.perf_counter()
+    cached = translation_cache.get(text, language)
+    if cached is not None:
+        log_api_call(session.id, "Translation", 0, 0, "translation_cache", document=session.document_id,
+                     latency=time.perf_counter() - started, translation_cache_hit=True, language=language,
+                     output_tokens_saved=cached["output_tokens"], cost_saved=cached["cost"])
+        yield cached["text"]
+        return
+    
+    model = get_genai().GenerativeModel(ANSWER_MODEL)
+    contents = [translation_prompt(text, language)]
+    time_to_first_token = None
+    if streaming:
+        response, time_to_first_token, translation = yield from generate_stream(session.id, model, contents)
+    else:
+        response = generate(session.id, model, contents)
+        translation = response.text
+        yield translation
+    latency = time.perf_counter() - started
+    
+    usage = get_response_usage(session.id, response, contents, translation)
+    cost = calculate_cost(usage.input_tokens, usage.output_tokens, "generation")
+    log_api_call(session.id, "Translation", usage.input_tokens, usage.output_tokens, "generation", document=session.document_id,
+                 latency=latency, time_to_first_token=time_to_first_token, language=language)
+    translation_cache.put(text, language, translation, usage.output_tokens, cost)
+
+# Chat sessions, shared by every client of this engine. Every turn is written to the session
+# store; memory holds only the latest SESSION_HOT_TURNS turns of the sessions in use
+class Session:
+    def __init__(self, session_id, document_id, turns=0, history=None, summary=None):
+        self.id = session_id
+        self.document_id = document_id
+        self.history = history or []  # the latest (question, answer) turns
+        self.turns = turns  # all turns so far; the ones before `history` are only in the session store
+        self.summary = summary or new_summary_state()
+        self.last_calls = []  # API calls made for the latest question
+        self.last_answer = None
+        self.lock = threading.Lock()  # one question at a time per session
+        self.memory_bytes = history_bytes(self.history)
+
+_sessions = OrderedDict()  # least recently used first
+_live_caches = {}  # document id -> CachedContent handle in use
+_state_lock = threading.Lock()
+
+def history_bytes(history):
+    """Rough memory taken by a session's turns (the strings dominate)"""
+    return sys.getsizeof(history) + sum(sys.getsizeof(q) + sys.getsizeof(a) for q, a in history)
+
+def session_memory_stats():
+    with _state_lock:
+        sizes = [session.memory_bytes for session in _sessions.values()]
+    return {("total",): sum(sizes), ("mean",): sum(sizes) / len(sizes) if sizes else 0, ("max",): max(sizes, default=0)}
+
+def evict_idle_sessions(limit_bytes):
+    """Drop idle sessions from memory, least recently used first, until they fit in `limit_bytes`. Caller holds _state_lock."""
+    total = sum(session.memory_bytes for session in _sessions.values())
+    for session_id in list(_sessions)[:-1]:  # never the session just used
+        if total <= limit_bytes:
+            break
+        session = _sessions[session_id]
+        if session.lock.locked():  # answering a question right now
+            continue
+        del _sessions[session_id]
+        total -= session.memory_bytes
+        SESSIONS_EVICTED.inc()
+
+def _load_session(session_id):
+    """The session from memory, or resumed from the session store; None if unknown. Caller holds _state_lock."""
+    session = _sessions.get(session_id)
+    if session is None:
+        stored = session_store.load(session_id)
+        if stored is None:
+            return None
+        if stored["document"] not in get_documents():
+            logger.info(f"Not resuming session {session_id}: document {stored['document']} is no longer served")
+            session_store.delete(session_id)
+            return None
+        history = session_store.turns(session_id, max(stored["turns"] - SESSION_HOT_TURNS, 0))
+        session = _sessions[session_id] = Session(session_id, stored["document"], stored["turns"], history, stored["summary"])
+        SESSIONS_RESUMED.inc()
+        evict_idle_sessions(SESSION_MEMORY_LIMIT_MB * 1024 * 1024)  # it was added last, so it stays
+    _sessions.move_to_end(session_id)
+    return session
+
+def _new_session(session_id, document_id):
+    """A session on `document_id`, or the default document if it is not served. Caller holds _state_lock."""
+    documents = get_documents()
+    if document_id not in documents:
+        document_id = DEFAULT_DOCUMENT_ID if DEFAULT_DOCUMENT_ID in documents else next(iter(documents))
+    session = _sessions[session_id] = Session(session_id, document_id)
+    return session
+
+def _get_session(session_id, document_id=None):
+    """
+    The session to answer in. With `document_id` an unknown session is opened on it: a session
+    without turns is not in the session store, so another engine worker may have opened it.
+    """
+    with _state_lock:
+        session = _load_session(session_id)
+        if session is None and document_id is not None:
+            session = _new_session(session_id, document_id)
+    if session is None:
+        raise KeyError(f"Unknown session {session_id}")
+    touch_session(session_id)
+    return session
+
+def get_turns(session, start=0):
+    """The session's turns from number `start` on; older ones than memory holds are read from the session store"""
+    first_in_memory = session.turns - len(session.history)
+    if start >= first_in_memory:
+        return session.history[start - first_in_memory:]
+    return session_store.turns(session.id, start, first_in_memory) + session.history
+
+def _reload_session(session):
+    """Catch a session up with the turns another copy of it (e.g. on another engine worker) stored"""
+    stored = session_store.load(session.id) or {"turns": 0, "summary": None}
+    session.turns = stored["turns"]
+    session.summary = stored["summary"] or new_summary_state()
+    session.history = session_store.turns(session.id, max(session.turns - SESSION_HOT_TURNS, 0))
+
+def add_turn(session, question, answer):
+    """Record a finished turn: stored, kept in memory, and the oldest in-memory turn let go past SESSION_HOT_TURNS"""
+    try:
+        try:
+            session_store.append_turn(session.id, session.document_id, session.turns, question, answer, session.summary)
+        except TurnConflict as e:
+            logger.info(f"{e}: reloading the session and adding this turn after the stored ones")
+            _reload_session(session)
+            session_store.append_turn(session.id, session.document_id, session.turns, question, answer, session.summary)
+    except (sqlite3.Error, TurnConflict) as e:
+        logger.error(f"Could not store turn {session.turns} of session {session.id}: {e}")
+    session.history = (session.history + [(question, answer)])[-SESSION_HOT_TURNS:]
+    session.turns += 1
+    with _state_lock:
+        session.memory_bytes = history_bytes(session.history)
+        evict_idle_sessions(SESSION_MEMORY_LIMIT_MB * 1024 * 1024)
+
+def _session_state(session, turns=None):
+    history = get_turns(session, 0 if turns is None else max(session.turns - turns, 0))
+    return {
+        "session_id": session.id,
+        "document": session.document_id,
+        "turns": session.turns,
+        "history": [list(turn) for turn in history],
+        "total_cost": ledger.session_total(session.id),
+        "last_calls": list(session.last_calls),
+        "last_answer": session.last_answer,
+    }
+
+def open_session(session_id=None, document_id=None, turns=None):
+    """
+    Get a chat session, resuming it from the session store (e.g. after a restart) or creating it if unknown.
+    Returns its state, with only the latest `turns` turns of history if given.
+    """
+    session_id = session_id or uuid.uuid4().hex
+    with _state_lock:
+        session = _load_session(session_id) or _new_session(session_id, document_id)
+    touch_session(session_id)
+    return _session_state(session, turns)
+
+def get_live_cache(doc_id=DEFAULT_DOCUMENT_ID):
+    """
+    The document's CachedContent for answering, following replacements made by the
+    background refresher. Raises CacheUnavailable when there is no valid cache.
+    """
+    is_valid, cache_name = is_global_cache_valid(doc_id)
+    if not is_valid:
+        raise CacheUnavailable(f"No valid context cache for {doc_id}")
+    with _state_lock:
+        cache = _live_caches.get(doc_id)
+    if cache is not None and cache.name == cache_name:
+        start_document_refresher(doc_id)  # records activity
+        return cache
+    cache = get_or_create_global_cache(doc_id)
+    if cache is None:
+        raise CacheUnavailable(f"Context cache {cache_name} for {doc_id} could not be loaded")
+    with _state_lock:
+        _live_caches[doc_id] = cache
+    return cache
+
+def start_session(doc_id=DEFAULT_DOCUMENT_ID, on_wait=None):
+    """
+    Make a document ready for questions: in "cache" mode reuse or create (once,
+    across sessions and processes) its context cache; in "rag" mode build its index.
+    Returns cache_status().
+    """
+    if ANSWER_MODE == "rag":
+        get_retrieval_index(doc_id)
+    else:
+        cache = create_global_pdf_cache(on_wait=on_wait, doc_id=doc_id)
+        if cache is not None:
+            with _state_lock:
+                _live_caches[doc_id] = cache
+    return cache_status(doc_id)
+
+def check_language(language):
+    """The output language to use (OUTPUT_LANGUAGE if None); ValueError if unknown"""
+    language = language or OUTPUT_LANGUAGE
+    if language not in OUTPUT_LANGUAGES:
+        raise ValueError(f"Unknown output language {language!r}, expected one of {OUTPUT_LANGUAGES}")
+    return language
+
+def _answer(session, question, streaming, language):
+    """
+    Answer from the answer bank/cache or the model, yielding text; records the turn when done.
+    With language "both" the FIRST_LANGUAGE answer comes first, then its translation.
+    """
+    bilingual = language == "both"
+    first = FIRST_LANGUAGE if bilingual else language
+    session.last_calls = []
+    cost_before = ledger.session_total(session.id)
+    heading = labelled(first, "") if bilingual else ""  # sent with the first chunk, so errors come before any output
+    answer = get_cached_answer(session, question, first)
+    cache_hit = answer is not None
+    if cache_hit:
+        yield heading + answer
+    elif streaming:
+        answer = ""
+        for i, text in enumerate(stream_question(session, question, language=first, bilingual=bilingual)):
+            yield heading + text if i == 0 else text
+            answer += text
+    else:
+        answer = ask_question(session, question, language=first, bilingual=bilingual)
+        yield heading + answer
+    if not cache_hit:
+        store_answer(session.turns, question, answer, ledger.session_total(session.id) - cost_before, session.document_id, first)
+        log_pipeline_stats()
+    
+    full_answer = answer
+    if bilingual:
+        second = other_language(first)
+        heading = "\n\n" + labelled(second, "")
+        translation = ""
+        try:
+            for i, text in enumerate(translate_answer(session, answer, second, streaming)):
+                translation += text
+                yield heading + text if i == 0 else text
+            full_answer = f"{labelled(first, answer)}\n\n{labelled(second, translation)}"
+        except Exception as e:
+            # The answer has been paid for and shown: keep the turn in the first language alone
+            logger.error(f"Translating the answer into {second} failed, keeping it in {first} only: {e}")
+            language = first
+    cost = ledger.session_total(session.id) - cost_before
+    add_turn(session, question, full_answer)
+    session.last_answer = {"question": question, "answer": full_answer, "language": language, "answer_cache_hit": cache_hit,
+                           "cost": cost}
+
+def precompute_answer(doc_id, question, language=FIRST_LANGUAGE):
+    """Answer a standalone question from the model for the answer bank, bypassing the answer caches. Returns (answer, cost)."""
+    session = Session(f"{ANSWER_BANK_SESSION}-{uuid.uuid4().hex[:8]}", doc_id)
+    with _state_lock:
+        _sessions[session.id] = session  # so log_api_call collects the calls' costs
+    try:
+        with session.lock:  # keeps it from being evicted
+            answer = ask_question(session, question, language=language)
+        return answer, sum(call["cost"] for call in session.last_calls)
+    finally:
+        with _state_lock:
+            _sessions.pop(session.id, None)
+
+def ask(session_id, question, language=None, document_id=None):
+    """
+    Answer a question in a session, in "english", "telugu" or "both" (default OUTPUT_LANGUAGE).
+    Returns the answer, whether it came from the answer cache and its cost.
+    An unknown session raises KeyError, unless `document_id` is given to open it on.
+    """
+    language = check_language(language)
+    session = _get_session(session_id, document_id)
+    # PROFILE_REQUESTS captures a profile of each question
+    with session.lock, profile_request(PROFILE_REQUESTS, PROFILE_DIR, "question"):
+        for _ in _answer(session, question, False, language):
+            pass
+    return dict(session.last_answer, total_cost=ledger.session_total(session_id))
+
+def stream(session_id, question, language=None, document_id=None):
+    """Like ask(), but yields the answer text as it is generated; open_session()["last_answer"] has the outcome"""
+    language = check_language(language)
+    session = _get_session(session_id, document_id)
+    with session.lock, profile_request(PROFILE_REQUESTS, PROFILE_DIR, "question"):
+        yield from _answer(session, question, True, language)
@@ -0,0 +1,72 @@
+from functools import lru_cache
+
+# Bubble styling lives in the page CSS (see CHAT_CSS) rather than inline on
+# every message, so each message's HTML stays small.
+CHAT_CSS = """
+    /* Chat bubbles */
+    .chat-user, .chat-assistant {
+        padding: 12px;
+        border-radius: 12px;
+        margin: 8px 0;
+        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+    }
+
+    .chat-user {
+        background-color: #e3f2fd !important;
+        border: 1px solid #bbdefb !important;
+        color: #1f1f1f !important;
+    }
+
+    .chat-assistant {
+        background-color: #f3e5f5 !important;
+        border: 1px solid #e1bee7 !important;
+        color: #1f1f1f !important;
+    }
+
+    .chat-user .chat-label {
+        color: #1976d2;
+    }
+
+    .chat-assistant .chat-label {
+        color: #7b1fa2;
+    }
+
+    .chat-text {
+        color: #1f1f1f;
+    }
+
+    /* Chat input row */
+    .chat-input-container {
+        display: flex;
+        align-items: end;
+        gap: 10px;
+        margin-top: 20px;
+    }
+    .chat-input-container .stTextInput {
+        flex: 1;
+    }
+    .chat-input-container .stButton {
+        margin-top: 0;
+    }
+"""
+
+def user_message_html(q):
+    return f"""
+            <div class="chat-user">
+                <strong class="chat-label">🧑 You:</strong><br>
+                <span class="chat-text">{q}</span>
+            </div>
+            """
+
+def assistant_message_html(a):
+    return f"""
+            <div class="chat-assistant">
+                <strong class="chat-label">🤖 Assistant:</strong><br>
+                <span class="chat-text">{a}</span>
+            </div>
+            """
+
+@lru_cache(maxsize=1024)
+def turn_html(q, a):
+    """HTML for one finished question/answer turn, built once per message and reused on every rerun"""
+    return user_message_html(q) + assistant_message_html(a)
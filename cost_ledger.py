@@ -0,0 +1,295 @@
+import argparse
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_calls (
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    operation_type TEXT NOT NULL,
+    document TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS api_calls_day ON api_calls (day);
+CREATE INDEX IF NOT EXISTS api_calls_session ON api_calls (session_id);
+CREATE TABLE IF NOT EXISTS hourly_usage (
+    hour INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    operation_type TEXT NOT NULL,
+    document TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    PRIMARY KEY (hour, session_id, operation, operation_type, document)
+);
+"""
+
+UPSERT_HOURLY = """
+INSERT INTO hourly_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (hour, session_id, operation, operation_type, document) DO UPDATE SET
+    calls = calls + excluded.calls,
+    input_tokens = input_tokens + excluded.input_tokens,
+    cached_tokens = cached_tokens + excluded.cached_tokens,
+    output_tokens = output_tokens + excluded.output_tokens,
+    cost = cost + excluded.cost
+"""
+
+# Columns of hourly_usage that rollups can group by
+ROLLUP_KEYS = ("hour", "day", "session_id", "operation", "operation_type", "document")
+
+class BudgetExceeded(Exception):
+    """A call would take today's spend past a daily budget cap"""
+
+def _day(ts):
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe; only the last commit can be lost on power failure
+    return connection
+
+class CostLedger:
+    """
+    Deployment-wide record of API spend, shared by every session in the process.
+
+    record() only appends to an in-memory batch and updates today's running totals;
+    a background thread writes batches to SQLite (WAL mode, one transaction per
+    batch) together with an hourly rollup table, so reports never scan raw calls.
+    admit() checks a call's estimated cost against the daily caps before it is made.
+    Every flush re-reads today's totals from the database, so the caps count the
+    spend of every process sharing the ledger (e.g. several engine workers), at
+    most `flush_interval` behind.
+    """
+    def __init__(self, path, flush_interval=2.0, daily_budget=0.0, session_daily_budget=0.0,
+                 throttle_at=0.8, throttle_interval=10.0, clock=time.time):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.daily_budget = daily_budget  # 0 = no cap
+        self.session_daily_budget = session_daily_budget
+        self.throttle_at = throttle_at  # fraction of a cap after which calls are spaced out
+        self.throttle_interval = throttle_interval
+        self.clock = clock
+
+        self._connection = connect(path)
+        self._connection.executescript(SCHEMA)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._session_totals = {}  # all-time, loaded from the database on a session's first use in this process
+        self._last_admitted = {}
+        self._today = _day(self.clock())
+        self._day_total = 0.0
+        self._session_day_totals = defaultdict(float)
+        with self._flush_lock:
+            self._reload_today()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cost-ledger", daemon=True)
+        self._thread.start()
+
+    def _reload_today(self):
+        """
+        Today's spend from the database plus what is still pending here, so caps hold
+        across restarts and count other processes' calls. Caller holds _flush_lock,
+        so nothing moves from the pending batch to the database meanwhile.
+        """
+        today = _day(self.clock())
+        rows = self._connection.execute(
+            "SELECT session_id, SUM(cost) FROM api_calls WHERE day = ? GROUP BY session_id", (today,)
+        ).fetchall()
+        with self._lock:
+            totals = defaultdict(float, rows)
+            for _, day, session_id, *_, cost in self._pending:
+                if day == today:
+                    totals[session_id] += cost
+            self._today = today
+            self._session_day_totals = totals
+            self._day_total = sum(totals.values())
+
+    def _load_session_total(self, session_id):
+        """A session's spend before this process first saw it (e.g. resumed after a restart)"""
+        if session_id in self._session_totals:
+            return
+        with self._flush_lock:
+            stored, = self._connection.execute("SELECT SUM(cost) FROM api_calls WHERE session_id = ?", (session_id,)).fetchone()
+        with self._lock:
+            self._session_totals.setdefault(session_id, stored or 0.0)
+
+    def _roll_day(self, now):
+        day = _day(now)
+        if day != self._today:
+            self._today = day
+            self._day_total = 0.0
+            self._session_day_totals = defaultdict(float)
+
+    def record(self, session_id, operation, operation_type, cost, input_tokens=0, cached_tokens=0,
+               output_tokens=0, document=None):
+        """Add one API call to the ledger; returns the session's total cost"""
+        now = self.clock()
+        self._load_session_total(session_id)
+        with self._lock:
+            self._roll_day(now)
+            self._pending.append((now, _day(now), session_id, operation, operation_type, document or "",
+                                  input_tokens, cached_tokens, output_tokens, cost))
+            self._day_total += cost
+            self._session_day_totals[session_id] += cost
+            self._session_totals[session_id] += cost
+            return self._session_totals[session_id]
+
+    def session_total(self, session_id):
+        self._load_session_total(session_id)
+        with self._lock:
+            return self._session_totals[session_id]
+
+    def spent_today(self, session_id=None):
+        with self._lock:
+            self._roll_day(self.clock())
+            return self._day_total if session_id is None else self._session_day_totals[session_id]
+
+    def admit(self, session_id, estimated_cost):
+        """
+        Check a call against the daily caps before it is made.
+        Raises BudgetExceeded if it would go over a cap; past `throttle_at` of a cap,
+        returns how long the session should wait so its calls are `throttle_interval` apart.
+        """
+        now = self.clock()
+        with self._lock:
+            self._roll_day(now)
+            usage = 0.0
+            for cap, spent, scope in ((self.daily_budget, self._day_total, "deployment"),
+                                      (self.session_daily_budget, self._session_day_totals[session_id], "session")):
+                if not cap:
+                    continue
+                if spent + estimated_cost > cap:
+                    raise BudgetExceeded(f"Daily {scope} budget of ${cap:.2f} reached (${spent:.4f} spent today)")
+                usage = max(usage, spent / cap)
+            delay = 0.0
+            if usage >= self.throttle_at:
+                last = self._last_admitted.get(session_id)
+                if last is not None:
+                    delay = max(0.0, last + self.throttle_interval - now)
+            self._last_admitted[session_id] = now + delay
+            return delay
+
+    def flush(self):
+        """Write everything recorded so far in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                self._reload_today()
+                return 0
+            hourly = defaultdict(lambda: [0, 0, 0, 0, 0.0])
+            for ts, _, session_id, operation, operation_type, document, input_tokens, cached_tokens, output_tokens, cost in batch:
+                totals = hourly[(int(ts // 3600) * 3600, session_id, operation, operation_type, document)]
+                totals[0] += 1
+                totals[1] += input_tokens
+                totals[2] += cached_tokens
+                totals[3] += output_tokens
+                totals[4] += cost
+            try:
+                with self._connection:
+                    self._connection.executemany("INSERT INTO api_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    self._connection.executemany(UPSERT_HOURLY, [key + tuple(totals) for key, totals in hourly.items()])
+            except sqlite3.Error as e:
+                logger.error(f"Could not write {len(batch)} ledger entries, retrying later: {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+            self._reload_today()
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flush thread and write out what is left"""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._connection.close()
+
+    def rollup(self, by="hour", since=None):
+        """
+        Calls, tokens and cost per `by` (hour, day, session_id, operation, operation_type
+        or document) from the hourly table, optionally only for the last `since` seconds.
+        """
+        self.flush()
+        with self._flush_lock:  # the connection is shared with the flush thread
+            return rollup(self._connection, by, None if since is None else self.clock() - since)
+
+def rollup(connection, by="hour", start=None):
+    if by not in ROLLUP_KEYS:
+        raise ValueError(f"Unknown rollup key: {by}")
+    key = "date(hour, 'unixepoch', 'localtime')" if by == "day" else by
+    where, params = ("WHERE hour >= ?", (int(start // 3600) * 3600,)) if start is not None else ("", ())
+    rows = connection.execute(
+        f"SELECT {key}, SUM(calls), SUM(input_tokens), SUM(cached_tokens), SUM(output_tokens), SUM(cost) "
+        f"FROM hourly_usage {where} GROUP BY {key} ORDER BY {key}",
+        params,
+    )
+    return [
+        {by: group, "calls": calls, "input_tokens": input_tokens, "cached_tokens": cached_tokens,
+         "output_tokens": output_tokens, "cost": cost}
+        for group, calls, input_tokens, cached_tokens, output_tokens, cost in rows
+    ]
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger(path, **kwargs):
+    """Open the process-wide ledger on first call and return it on every call"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CostLedger(path, **kwargs)
+            atexit.register(_ledger.close)
+            logger.info(f"Recording API costs to {path} ({kwargs})")
+        return _ledger
+
+# Spend reports from the command line, e.g.
+# python cost_ledger.py cost_ledger.db --by operation_type --since 24
+def main():
+    parser = argparse.ArgumentParser(description="Roll up recorded API spend")
+    parser.add_argument("path", nargs="?", default="cost_ledger.db")
+    parser.add_argument("--by", default="hour", choices=ROLLUP_KEYS)
+    parser.add_argument("--since", type=float, help="only the last N hours")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print("No API calls recorded")
+        return
+    connection = connect(args.path)
+    start = None if args.since is None else time.time() - args.since * 3600
+    rows = rollup(connection, args.by, start)
+    if not rows:
+        print("No API calls recorded")
+        return
+    print(f"{args.by:<24} {'calls':>7} {'in tok':>12} {'cached tok':>14} {'out tok':>11} {'cost':>11}")
+    for row in rows:
+        group = row[args.by]
+        if args.by == "hour":
+            group = time.strftime("%Y-%m-%d %H:00", time.localtime(group))
+        print(f"{str(group)[:24]:<24} {row['calls']:>7} {row['input_tokens']:>12,} {row['cached_tokens']:>14,} "
+              f"{row['output_tokens']:>11,} ${row['cost']:>10.4f}")
+    print(f"{'total':<24} {sum(r['calls'] for r in rows):>7} {'':>12} {'':>14} {'':>11} ${sum(r['cost'] for r in rows):>10.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# All prices in $ per 1M tokens (storage per 1M tokens per hour)
+Pricing = namedtuple("Pricing", [
+    "pdf_tokens", "upload_per_1m", "cached_per_1m", "storage_per_1m_hour", "input_per_1m", "output_per_1m",
+])
+
+# For command-line use; the app prices its report with chat_engine.PRICING
+DEFAULT_PRICING = Pricing(
+    pdf_tokens=387000,
+    upload_per_1m=0.15,
+    cached_per_1m=0.0375,
+    storage_per_1m_hour=0.01875,
+    input_per_1m=0.075,
+    output_per_1m=0.30,
+)
+
+# Per-query assumptions behind the report's scenarios
+DEFAULT_SCENARIO_USERS = (10, 20, 50, 70, 100)
+QUERIES_PER_USER = 10
+INPUT_TOKENS_PER_QUERY = 100
+OUTPUT_TOKENS_PER_QUERY = 300
+CACHE_TTL_HOURS = 24
+REFRESH_POLICY = "extend"  # CACHE_REFRESH_POLICY's default
+
+def daily_upload_count(refresh_policy, cache_ttl_hours):
+    """
+    Cache uploads per day for a cache in use around the clock: "extend" pushes the
+    one cache's TTL forward, so only the first upload is paid and the TTL does not
+    matter; "replace" rebuilds it ahead of every expiry and "off" lets it expire and
+    recreates it on the next start.
+    """
+    if refresh_policy == "extend":
+        return 0
+    return 24 / cache_ttl_hours
+
+REPORT_FINGERPRINT_PREFIX = "Pricing: "
+
+def daily_costs(pricing, users, queries_per_user, input_tokens, output_tokens, cache_ttl_hours,
+                refresh_policy=REFRESH_POLICY):
+    """
+    Daily cost components for one shared cache kept alive around the clock and
+    refreshed with `refresh_policy` (CACHE_REFRESH_POLICY) every `cache_ttl_hours`.
+    Arguments other than the pricing and policy may be numbers or broadcastable numpy arrays.
+    """
+    pdf_millions = pricing.pdf_tokens / 1_000_000
+    storage = pdf_millions * pricing.storage_per_1m_hour * 24
+    uploads = daily_upload_count(refresh_policy, cache_ttl_hours) * pdf_millions * pricing.upload_per_1m
+    per_query = (pdf_millions * pricing.cached_per_1m
+                 + input_tokens / 1_000_000 * pricing.input_per_1m
+                 + output_tokens / 1_000_000 * pricing.output_per_1m)
+    total_queries = users * queries_per_user
+    query_cost = total_queries * per_query
+    return {
+        "total_queries": total_queries,
+        "daily_storage": storage,
+        "daily_uploads": uploads,
+        "daily_query_cost": query_cost,
+        "total_daily_cost": storage + uploads + query_cost,
+    }
+
+def scenario_cost(pricing, users, queries_per_user=QUERIES_PER_USER, input_tokens=INPUT_TOKENS_PER_QUERY,
+                  output_tokens=OUTPUT_TOKENS_PER_QUERY, cache_ttl_hours=CACHE_TTL_HOURS, refresh_policy=REFRESH_POLICY):
+    """Daily cost breakdown for a single scenario"""
+    costs = daily_costs(pricing, users, queries_per_user, input_tokens, output_tokens, cache_ttl_hours, refresh_policy)
+    costs["users"] = users
+    costs["queries_per_user"] = queries_per_user
+    costs["cost_per_user"] = costs["total_daily_cost"] / users if users > 0 else 0
+    return costs
+
+def projection_grid(pricing, users, queries_per_user, input_tokens, cache_ttl_hours,
+                    output_tokens=OUTPUT_TOKENS_PER_QUERY, refresh_policy=REFRESH_POLICY):
+    """
+    Every combination of the given axes, priced in one vectorized pass.
+    Returns column name -> flat numpy array.
+    """
+    import numpy as np  # in requirements.txt; only grids need it
+
+    axes = np.meshgrid(
+        np.asarray(users, dtype=float),
+        np.asarray(queries_per_user, dtype=float),
+        np.asarray(input_tokens, dtype=float),
+        np.asarray(cache_ttl_hours, dtype=float),
+        indexing="ij",
+    )
+    users, queries_per_user, input_tokens, cache_ttl_hours = (axis.ravel() for axis in axes)
+    costs = daily_costs(pricing, users, queries_per_user, input_tokens, output_tokens, cache_ttl_hours, refresh_policy)
+
+    grid = {
+        "users": users,
+        "queries_per_user": queries_per_user,
+        "input_tokens": input_tokens,
+        "cache_ttl_hours": cache_ttl_hours,
+    }
+    grid.update({name: np.broadcast_to(values, users.shape) for name, values in costs.items()})
+    total = grid["total_daily_cost"]
+    grid["cost_per_user"] = np.divide(total, users, out=np.zeros_like(total), where=users > 0)
+    return grid
+
+def write_grid_csv(grid, path):
+    import numpy as np
+
+    columns = list(grid)
+    np.savetxt(path, np.column_stack([grid[c] for c in columns]), delimiter=",",
+               header=",".join(columns), comments="", fmt="%.10g")
+
+def shared_cache_savings(pricing, users, cache_ttl_hours=CACHE_TTL_HOURS, refresh_policy=REFRESH_POLICY):
+    """
+    Share of the daily cache upload and storage cost that one shared cache saves over
+    a cache per user, each user's uploaded once and stored for the day
+    """
+    shared = daily_costs(pricing, users, 0, 0, 0, cache_ttl_hours, refresh_policy)
+    shared_cost = shared["daily_storage"] + shared["daily_uploads"]
+    per_user_cost = users * (pricing.pdf_tokens / 1_000_000 * pricing.upload_per_1m + shared["daily_storage"])
+    return 1 - shared_cost / per_user_cost if per_user_cost else 0.0
+
+def _fingerprint(pricing, scenario_users, refresh_policy):
+    return f"{REPORT_FINGERPRINT_PREFIX}{tuple(pricing)} scenarios={tuple(scenario_users)} refresh={refresh_policy}"
+
+def build_report(pricing, scenario_users=DEFAULT_SCENARIO_USERS, refresh_policy=REFRESH_POLICY):
+    """The cost_analysis.txt text for `pricing`, one scenario per user count and the cache refresh policy"""
+    upload = pricing.pdf_tokens / 1_000_000 * pricing.upload_per_1m
+    storage_per_hour = pricing.pdf_tokens / 1_000_000 * pricing.storage_per_1m_hour
+    cached_per_query = pricing.pdf_tokens / 1_000_000 * pricing.cached_per_1m
+    breakdowns = [scenario_cost(pricing, users, refresh_policy=refresh_policy) for users in scenario_users]
+    if refresh_policy == "extend":
+        upload_note = "once; the cache's TTL is extended before it expires"
+    else:
+        upload_note = f"every {CACHE_TTL_HOURS}h cache rebuild, refresh policy {refresh_policy!r}"
+
+    report = f"""
+=== GEMINI API COST ANALYSIS FOR 300-PAGE PDF ===
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{_fingerprint(pricing, scenario_users, refresh_policy)}
+
+COST BREAKDOWN:
+• Initial Upload: ${upload:.5f} ({upload_note})
+• Storage: ${storage_per_hour:.8f}/hour (${storage_per_hour * 24:.5f}/day)
+• Per Query: ${cached_per_query:.7f} (cached) + input/output costs
+
+DAILY COST ESTIMATES ({QUERIES_PER_USER} queries per user, {INPUT_TOKENS_PER_QUERY} input / {OUTPUT_TOKENS_PER_QUERY} output tokens):
+"""
+    for breakdown in breakdowns:
+        report += f"""
+Users: {breakdown['users']}
+- Total Queries: {breakdown['total_queries']}
+- Storage Cost: ${breakdown['daily_storage']:.5f}
+- Upload Cost: ${breakdown['daily_uploads']:.5f}
+- Query Cost: ${breakdown['daily_query_cost']:.2f}
+- Total Daily: ${breakdown['total_daily_cost']:.2f}
+- Cost/User: ${breakdown['cost_per_user']:.4f}
+"""
+
+    per_user = "\n".join(f"• {b['users']} users: ~${b['cost_per_user']:.4f} per user per day" for b in reversed(breakdowns))
+    fewest, most = min(scenario_users), max(scenario_users)
+    savings = (f"{shared_cache_savings(pricing, fewest, refresh_policy=refresh_policy):.0%} ({fewest} users) to "
+               f"{shared_cache_savings(pricing, most, refresh_policy=refresh_policy):.0%} ({most} users)")
+    report += f"""
+COST EFFICIENCY INSIGHTS:
+• Higher user counts reduce per-user cost due to shared storage
+{per_user}
+• Global caching saves {savings} of cache upload and storage cost compared to a cache per user
+
+STORAGE SHARING BENEFITS:
+• Fixed storage cost (${storage_per_hour * 24:.5f}/day) shared across all users
+• More users = lower per-user storage cost
+• Economies of scale with global caching
+"""
+    return report
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".cost_analysis_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _written_fingerprint(path):
+    """The pricing fingerprint line of an existing report, or None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for _ in range(5):
+                line = f.readline()
+                if line.startswith(REPORT_FINGERPRINT_PREFIX):
+                    return line.strip()
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None
+
+# Fingerprint of the report last written (or found up to date) in this process
+_written = {"fingerprint": None}
+_lock = threading.Lock()
+
+def ensure_cost_report(path, pricing, scenario_users=DEFAULT_SCENARIO_USERS, refresh_policy=REFRESH_POLICY):
+    """
+    Make sure `path` holds the report for `pricing`. A no-op on reruns: the file
+    is only rewritten (atomically) when the pricing, scenarios or refresh policy
+    change, also across restarts, since the report records what it was built from.
+    """
+    fingerprint = _fingerprint(pricing, scenario_users, refresh_policy)
+    with _lock:
+        if _written["fingerprint"] == fingerprint:
+            return False
+        stale = _written_fingerprint(path) != fingerprint
+        if stale:
+            _write_atomic(path, build_report(pricing, scenario_users, refresh_policy))
+            logger.info(f"Cost analysis written to {path}")
+        _written["fingerprint"] = fingerprint
+    return stale
+
+def _parse_list(text):
+    return [float(value) for value in text.split(",")]
+
+# What-if grids from the command line, e.g.
+# python cost_projection.py --users 10,100,1000 --queries 5,10,20 --tokens 100,500,2000 --ttl 1,6,24 --csv grid.csv
+def main():
+    parser = argparse.ArgumentParser(description="Price a what-if grid of cache usage scenarios")
+    parser.add_argument("--users", type=_parse_list, default=[10, 20, 50, 70, 100, 500, 1000])
+    parser.add_argument("--queries", type=_parse_list, default=[1, 5, 10, 20, 50])
+    parser.add_argument("--tokens", type=_parse_list, default=[100, 500, 2000, 10000], help="input tokens per query")
+    parser.add_argument("--ttl", type=_parse_list, default=[1, 6, 12, 24], help="cache TTL in hours")
+    parser.add_argument("--output-tokens", type=float, default=OUTPUT_TOKENS_PER_QUERY)
+    parser.add_argument("--refresh-policy", choices=("extend", "replace", "off"), default=REFRESH_POLICY)
+    parser.add_argument("--csv", help="write the grid to this CSV file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    grid = projection_grid(DEFAULT_PRICING, args.users, args.queries, args.tokens, args.ttl, args.output_tokens,
+                           args.refresh_policy)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rows = len(grid["users"])
+    print(f"Priced {rows:,} scenarios in {elapsed_ms:.1f} ms")
+
+    cheapest = grid["cost_per_user"].argmin()
+    priciest = grid["total_daily_cost"].argmax()
+    for label, i in (("Lowest cost/user", cheapest), ("Highest daily total", priciest)):
+        print(f"{label}: {int(grid['users'][i])} users x {int(grid['queries_per_user'][i])} queries, "
+              f"{int(grid['input_tokens'][i])} tokens, TTL {grid['cache_ttl_hours'][i]:g}h -> "
+              f"${grid['total_daily_cost'][i]:.2f}/day, ${grid['cost_per_user'][i]:.4f}/user")
+    if args.csv:
+        write_grid_csv(grid, args.csv)
+        print(f"Wrote {args.csv}")
+
+if __name__ == "__main__":
+    main()
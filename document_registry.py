@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Optional per-document settings inside the documents directory:
+# {"<document id>": {"title": "...", "ttl_hours": 12}}
+DOCUMENTS_MANIFEST = "documents.json"
+
+# Process-wide state shared by all sessions
+_documents = {"key": None, "documents": {}}
+_last_used = {}  # document id -> time.time() of the last question or session start
+_lock = threading.Lock()
+
+def _document_entry(doc_id, path, meta):
+    return {
+        "id": doc_id,
+        "path": path,
+        "title": meta.get("title", doc_id),
+        "ttl_hours": meta.get("ttl_hours"),
+    }
+
+def _load_manifest(documents_dir):
+    manifest_path = os.path.join(documents_dir, DOCUMENTS_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading {manifest_path}: {e}")
+        return {}
+
+def _scan_key(documents_dir, default_pdf):
+    """Changes whenever PDFs are added, removed or the manifest is edited"""
+    try:
+        stat = os.stat(documents_dir)
+        manifest = os.path.join(documents_dir, DOCUMENTS_MANIFEST)
+        manifest_mtime = os.stat(manifest).st_mtime_ns if os.path.exists(manifest) else None
+        return (documents_dir, stat.st_mtime_ns, manifest_mtime, default_pdf)
+    except FileNotFoundError:
+        return (documents_dir, None, None, default_pdf)
+
+def discover_documents(documents_dir, default_pdf):
+    """
+    Map document id -> {"id", "path", "title", "ttl_hours"} for every PDF in
+    `documents_dir`. Without that directory (or PDFs in it) the single
+    `default_pdf` is served, as before multi-document support.
+    The directory is only rescanned when its mtime changes.
+    """
+    key = _scan_key(documents_dir, default_pdf)
+    with _lock:
+        if _documents["key"] == key:
+            return _documents["documents"]
+
+    documents = {}
+    if key[1] is not None:
+        manifest = _load_manifest(documents_dir)
+        for entry in sorted(os.scandir(documents_dir), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                doc_id = os.path.splitext(entry.name)[0]
+                documents[doc_id] = _document_entry(doc_id, entry.path, manifest.get(doc_id, {}))
+    if not documents:
+        doc_id = os.path.splitext(os.path.basename(default_pdf))[0]
+        documents[doc_id] = _document_entry(doc_id, default_pdf, {})
+
+    with _lock:
+        _documents["key"] = key
+        _documents["documents"] = documents
+    logger.info(f"Serving {len(documents)} document(s): {', '.join(documents)}")
+    return documents
+
+def touch_document(doc_id):
+    """Record that a document's cache was just used"""
+    with _lock:
+        _last_used[doc_id] = time.time()
+
+def last_used(doc_id):
+    with _lock:
+        return _last_used.get(doc_id)
+
+def select_evictions(live_caches, new_cost_per_hour, budget_per_hour):
+    """
+    Pick caches to evict, least recently used first, so that the live caches plus a
+    new one costing `new_cost_per_hour` stay within `budget_per_hour` of storage.
+    live_caches: document id -> {"cost_per_hour": float, "last_used": timestamp}
+    """
+    total = new_cost_per_hour + sum(c["cost_per_hour"] for c in live_caches.values())
+    evictions = []
+    for doc_id in sorted(live_caches, key=lambda d: live_caches[d]["last_used"]):
+        if total <= budget_per_hour:
+            break
+        evictions.append(doc_id)
+        total -= live_caches[doc_id]["cost_per_hour"]
+    return evictions
@@ -0,0 +1,73 @@
+import json
+import urllib.error
+import urllib.request
+
+from cache_registry import CacheUnavailable
+from cost_ledger import BudgetExceeded
+from request_pipeline import PipelineBusy
+
+# Error codes from engine_server.py -> the exception the engine itself would have raised
+ERRORS = {
+    "busy": PipelineBusy,
+    "budget_exceeded": BudgetExceeded,
+    "cache_unavailable": CacheUnavailable,
+    "not_found": KeyError,
+    "bad_request": ValueError,
+    "unavailable": ConnectionError,
+}
+
+class RemoteEngine:
+    """
+    The chat_engine functions the UI uses, called on an engine server over HTTP/JSON.
+    Errors come back as the same exception types, so callers handle both alike.
+    """
+    def __init__(self, base_url, timeout=300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                body = json.loads(e.read() or b"{}")
+            except ValueError:
+                body = {}
+            error = ERRORS.get(body.get("error"), RuntimeError)
+            raise error(body.get("message") or f"Engine server returned {e.code}") from None
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Engine server {self.base_url} unreachable: {e.reason}") from e
+
+    def _call(self, method, path, payload=None):
+        with self._open(method, path, payload) as response:
+            return json.loads(response.read())
+
+    def get_documents(self):
+        return self._call("GET", "/documents")
+
+    def cache_status(self, doc_id=None):
+        return self._call("GET", "/cache/status" + (f"?document={urllib.request.quote(doc_id)}" if doc_id else ""))
+
+    def start_session(self, doc_id=None, on_wait=None):
+        # No progress messages over HTTP; the request returns once the cache is ready
+        return self._call("POST", "/cache/start", {"document": doc_id})
+
+    def open_session(self, session_id=None, document_id=None, turns=None):
+        return self._call("POST", "/sessions", {"session_id": session_id, "document": document_id, "turns": turns})
+
+    def ask(self, session_id, question, language=None, document_id=None):
+        return self._call("POST", "/ask", {"session_id": session_id, "question": question, "language": language,
+                                           "document": document_id})
+
+    def stream(self, session_id, question, language=None, document_id=None):
+        with self._open("POST", "/stream", {"session_id": session_id, "question": question, "language": language,
+                                            "document": document_id}) as response:
+            for line in response:
+                event = json.loads(line)
+                if "text" in event:
+                    yield event["text"]
+                elif "error" in event:
+                    raise ERRORS.get(event["error"], RuntimeError)(event.get("message"))
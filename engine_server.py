@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from cache_registry import CacheUnavailable
+from cost_ledger import BudgetExceeded
+from request_pipeline import PipelineBusy
+from resilience import CircuitOpen, is_retryable
+from translation import OUTPUT_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_LINES = 100
+
+class HttpError(Exception):
+    def __init__(self, status, error, message=""):
+        super().__init__(message or error)
+        self.status = status
+        self.error = error
+
+def error_response(e):
+    """HTTP status and error code for an exception raised by the engine"""
+    if isinstance(e, HttpError):
+        return e.status, e.error
+    if isinstance(e, PipelineBusy):
+        return 429, "busy"
+    if isinstance(e, BudgetExceeded):
+        return 429, "budget_exceeded"
+    if isinstance(e, CacheUnavailable):
+        return 409, "cache_unavailable"
+    if isinstance(e, KeyError):
+        return 404, "not_found"
+    if isinstance(e, CircuitOpen) or is_retryable(e):
+        return 503, "unavailable"
+    return 500, "internal"
+
+class Request:
+    def __init__(self, method, target, headers, body, version):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip("/") or "/"
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        connection = headers.get("connection", "").lower()
+        self.keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+    def json(self):
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, "bad_request", f"Invalid JSON body: {e}")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "bad_request", "JSON body must be an object")
+        return payload
+
+def _language(payload):
+    language = payload.get("language")
+    if language is not None and language not in OUTPUT_LANGUAGES:
+        raise HttpError(400, "bad_request", f"'language' must be one of {', '.join(OUTPUT_LANGUAGES)}")
+    return language
+
+def _required_text(payload, field):
+    value = payload.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise HttpError(400, "bad_request", f"'{field}' is required")
+    return value
+
+class EngineServer:
+    """
+    HTTP/JSON API in front of chat_engine, on an asyncio loop.
+    Engine calls block on the Gemini API, so they run on a thread pool; the loop
+    only parses requests and writes responses, so one process can hold many
+    open (streaming) connections. Run several of these behind a load balancer:
+    they share the context cache through the cache status files and resume each
+    other's sessions from the session store, so with SESSION_STORE_FILE on storage
+    they all reach, no sticky sessions are needed.
+
+      GET  /health
+      GET  /documents
+      GET  /cache/status?document=ID
+      POST /cache/start    {"document"}
+      POST /sessions       {"session_id", "document", "turns"}  (get or create)
+      POST /ask            {"session_id", "question", "language", "document"}  (language, document optional)
+      POST /stream         {"session_id", "question", "language", "document"}  -> NDJSON: {"text"}... then {"done": true, ...}
+
+    /ask and /stream open an unknown session on "document" if given, instead of a 404.
+    """
+    def __init__(self, engine, workers=32):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="engine")
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/documents"): self.documents,
+            ("GET", "/cache/status"): self.cache_status,
+            ("POST", "/cache/start"): self.cache_start,
+            ("POST", "/sessions"): self.open_session,
+            ("POST", "/ask"): self.ask,
+            ("POST", "/stream"): self.stream,
+        }
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def health(self, request):
+        return {"ok": True}
+
+    async def documents(self, request):
+        return await self.call(self.engine.get_documents)
+
+    async def cache_status(self, request):
+        document = request.query.get("document")
+        return await self.call(self.engine.cache_status, *([document] if document else []))
+
+    async def cache_start(self, request):
+        document = request.json().get("document")
+        return await self.call(self.engine.start_session, *([document] if document else []))
+
+    async def open_session(self, request):
+        payload = request.json()
+        return await self.call(self.engine.open_session, payload.get("session_id"), payload.get("document"), payload.get("turns"))
+
+    async def ask(self, request):
+        payload = request.json()
+        return await self.call(self.engine.ask, _required_text(payload, "session_id"), _required_text(payload, "question"),
+                               _language(payload), payload.get("document"))
+
+    async def stream(self, request, writer):
+        payload = request.json()
+        session_id = _required_text(payload, "session_id")
+        question = _required_text(payload, "question")
+        language = _language(payload)
+        document = payload.get("document")
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def produce():
+            # The whole answer is generated on one worker thread; chunks are handed to the loop
+            try:
+                for text in self.engine.stream(session_id, question, language, document):
+                    loop.call_soon_threadsafe(events.put_nowait, ("text", text))
+                loop.call_soon_threadsafe(events.put_nowait, ("done", None))
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, ("error", e))
+
+        producer = loop.run_in_executor(self.executor, produce)
+        kind, value = await events.get()
+        if kind == "error":
+            await producer
+            raise value  # nothing sent yet, so it gets a proper status code
+
+        await self.send_head(writer, 200, "application/x-ndjson", request.keep_alive, chunked=True)
+        while True:
+            if kind == "text":
+                await self.send_chunk(writer, {"text": value})
+            elif kind == "done":
+                session = await self.call(self.engine.open_session, session_id, None, 0)
+                await self.send_chunk(writer, dict(session["last_answer"], done=True, total_cost=session["total_cost"]))
+                break
+            else:
+                status, error = error_response(value)
+                if status == 500:
+                    logger.error(f"Stream for session {session_id} failed", exc_info=value)
+                await self.send_chunk(writer, {"error": error, "message": str(value)})
+                break
+            kind, value = await events.get()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        await producer
+
+    async def send_head(self, writer, status, content_type, keep_alive, length=None, chunked=False, extra=()):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.append("Transfer-Encoding: chunked" if chunked else f"Content-Length: {length}")
+        lines.extend(f"{name}: {value}" for name, value in extra)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        extra = [("Retry-After", "5")] if status in (429, 503) else []
+        await self.send_head(writer, status, "application/json; charset=utf-8", keep_alive, length=len(body), extra=extra)
+        writer.write(body)
+        await writer.drain()
+
+    async def send_chunk(self, writer, payload):
+        line = (json.dumps(payload, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "bad_request", "Malformed request line")
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(431, "bad_request", "Too many headers")
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "bad_request", "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, headers, body, version)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as e:
+                    await self.send_json(writer, e.status, {"error": e.error, "message": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                await self.dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+    async def dispatch(self, request, writer):
+        handler = self.routes.get((request.method, request.path))
+        try:
+            if handler is None:
+                known = any(path == request.path for _, path in self.routes)
+                raise HttpError(405 if known else 404, "not_found", f"No route for {request.method} {request.path}")
+            if handler == self.stream:
+                await handler(request, writer)
+                return
+            result = await handler(request)
+            await self.send_json(writer, 200, result, request.keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            status, error = error_response(e)
+            if status == 500:
+                logger.exception(f"{request.method} {request.path} failed")
+            await self.send_json(writer, status, {"error": error, "message": str(e)}, request.keep_alive)
+
+    async def start(self, host, port):
+        """Listen on host:port (port 0 picks a free one); returns the asyncio server"""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = server.sockets[0].getsockname()[:2]
+        logger.info(f"Chat engine API on http://{host}:{port}")
+        return server
+
+    async def serve(self, host, port):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+# Run the chat engine as a service, e.g.
+# python engine_server.py --port 8600   (then start the UI with CHAT_ENGINE_URL=http://127.0.0.1:8600)
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the chat engine")
+    parser.add_argument("--host", default=os.getenv("ENGINE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ENGINE_PORT", "8600")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ENGINE_WORKERS", "32")), help="threads for engine calls")
+    args = parser.parse_args()
+
+    import chat_engine  # starts the engine's process-wide state (pipeline, ledger, telemetry, metrics)
+
+    try:
+        asyncio.run(EngineServer(chat_engine, args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# How long to sleep between attempts when a lock is busy
+LOCK_POLL_SECONDS = 0.05
+
+def _try_lock(handle, shared):
+    """Attempt to take the lock without blocking; return True on success"""
+    try:
+        if fcntl:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(handle.fileno(), mode | fcntl.LOCK_NB)
+        else:
+            # msvcrt only offers exclusive byte-range locks
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(handle):
+    if fcntl:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path, shared=False, timeout=None):
+    """
+    Hold a cross-process lock on the sidecar file ``<path>.lock``.
+    shared=True allows concurrent readers where the platform supports it.
+    Raises TimeoutError if the lock is not acquired within `timeout` seconds.
+    """
+    lock_path = f"{path}.lock"
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with open(lock_path, "a+") as handle:
+        while not _try_lock(handle, shared):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for lock on {path}")
+            time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            _unlock(handle)
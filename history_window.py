@@ -0,0 +1,75 @@
+import logging
+
+from token_usage import approximate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Update the running summary of a conversation about a government scheme document.
+Keep every fact, number and decision the user may refer back to; drop greetings and repetition.
+Write at most {max_words} words in English.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{turns}
+
+Updated summary:
+"""
+
+def new_summary_state():
+    """Per-session summary memo: the running summary and how many turns it covers"""
+    return {"summary": "", "covered_turns": 0}
+
+def format_turns(turns):
+    return "\n\n".join(f"User: {q}\nAssistant: {a}" for q, a in turns)
+
+def summary_prompt(previous_summary, turns, max_words=200):
+    return SUMMARY_PROMPT.format(
+        max_words=max_words,
+        summary=previous_summary or "(none yet)",
+        turns=format_turns(turns),
+    )
+
+def naive_summary(previous_summary, turns, max_chars=200, max_lines=20):
+    """Offline fallback: keep the questions and the start of each answer for the latest turns"""
+    lines = previous_summary.splitlines() if previous_summary else []
+    for q, a in turns:
+        lines.append(f"- Q: {q[:max_chars]} A: {' '.join(a.split())[:max_chars]}")
+    return "\n".join(lines[-max_lines:])
+
+def _turn_tokens(turns, count_tokens):
+    return sum(count_tokens(q) + count_tokens(a) for q, a in turns)
+
+def window_history(history, summary_state, summarize, keep_turns, token_budget, count_tokens=approximate_tokens):
+    """
+    Split (question, answer) history into a running summary plus recent verbatim turns.
+
+    At most `keep_turns` recent turns are kept verbatim, fewer if they would push the
+    summary + turns over `token_budget`. Older turns are folded into the summary
+    incrementally: `summarize(previous_summary, new_turns)` is only called for turns
+    the memoized `summary_state` does not cover yet.
+
+    Returns (summary, recent_turns, summary_state).
+    """
+    state = summary_state or new_summary_state()
+    if state["covered_turns"] > len(history):
+        # History was reset or replaced - start over
+        state = new_summary_state()
+
+    start = max(len(history) - keep_turns, state["covered_turns"], 0)
+    budget_left = token_budget - count_tokens(state["summary"]) if state["summary"] else token_budget
+    while start < len(history) - 1 and _turn_tokens(history[start:], count_tokens) > budget_left:
+        start += 1
+
+    if start > state["covered_turns"]:
+        new_turns = history[state["covered_turns"]:start]
+        try:
+            summary = summarize(state["summary"], new_turns)
+        except Exception as e:
+            logger.warning(f"History summarization failed, using naive summary: {e}")
+            summary = naive_summary(state["summary"], new_turns)
+        state = {"summary": summary, "covered_turns": start}
+
+    return state["summary"], history[start:], state
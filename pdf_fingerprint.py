@@ -0,0 +1,59 @@
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Read the file in 1 MB chunks so hashing never holds the whole PDF in memory
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Process-wide memo shared by every Streamlit session:
+# absolute path -> ((size, mtime_ns, inode), md5 hex digest)
+_fingerprints = {}
+_lock = threading.Lock()
+
+def _stat_key(path):
+    """Identify a file version by size, modification time and inode"""
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Compute the MD5 of a file by streaming it in chunks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_fingerprint(path):
+    """
+    Get the MD5 of a file, hashing it at most once per process per file version.
+    Returns None if the file does not exist.
+    """
+    abs_path = os.path.abspath(path)
+    try:
+        key = _stat_key(abs_path)
+    except FileNotFoundError:
+        with _lock:
+            _fingerprints.pop(abs_path, None)
+        return None
+
+    with _lock:
+        cached = _fingerprints.get(abs_path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        # Hash while holding the lock so concurrent sessions wait for one result
+        digest = hash_file(abs_path)
+
+        # Only memoize if the file did not change while it was being read
+        if _stat_key(abs_path) == key:
+            _fingerprints[abs_path] = (key, digest)
+            logger.info(f"Fingerprinted {path}: {digest}")
+        return digest
+
+def clear_fingerprints():
+    """Forget all memoized fingerprints"""
+    with _lock:
+        _fingerprints.clear()
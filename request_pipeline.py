@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class PipelineBusy(Exception):
+    """Raised when the request queue is full; callers should ask the user to retry"""
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` / 60 per second. It holds at
+    most `burst_seconds` worth of refill, so any 60-second window admits at most
+    per_minute * (1 + burst_seconds / 60) - keep burst_seconds small against a hard quota.
+    """
+    def __init__(self, per_minute, burst_seconds=10, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = self.rate * burst_seconds
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be taken (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+class _Ticket:
+    def __init__(self, session_id, tokens, future):
+        self.session_id = session_id
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+
+class RequestPipeline:
+    """
+    Shared admission control for Gemini calls from every session in the process.
+
+    Requests wait in per-session queues that are served round-robin, so one busy
+    session cannot starve the others. A request is granted once a concurrency
+    slot is free and the requests-per-minute and tokens-per-minute buckets allow
+    it. Past `max_queue_depth` waiting requests, new ones are rejected with
+    PipelineBusy instead of piling up.
+
+    The scheduler runs on its own asyncio loop thread. Async callers use
+    acquire()/release(); Streamlit script threads use the blocking slot().
+    """
+    def __init__(self, max_concurrency=8, requests_per_minute=1000, tokens_per_minute=4_000_000,
+                 max_queue_depth=200, burst_seconds=10):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.request_bucket = TokenBucket(requests_per_minute, burst_seconds)
+        self.token_bucket = TokenBucket(tokens_per_minute, burst_seconds)
+        self._queues = OrderedDict()  # session id -> deque of waiting tickets
+        self._active = 0
+        self._stats = {"granted": 0, "rejected": 0, "max_queue_depth": 0, "total_wait": 0.0, "max_wait": 0.0}
+        self._loop = asyncio.new_event_loop()
+        self._wake = None
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="request-pipeline", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._wake = asyncio.Event()
+        self._loop.create_task(self._dispatch())
+        ready.set()
+        self._loop.run_forever()
+
+    def _queue_depth(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def _next_ticket(self):
+        """Pop the head of the next session's queue, rotating that session to the back"""
+        session_id, queue = next(iter(self._queues.items()))
+        ticket = queue.popleft()
+        del self._queues[session_id]
+        if queue:
+            self._queues[session_id] = queue
+        return ticket
+
+    async def _dispatch(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._queues and self._active < self.max_concurrency:
+                session_id, queue = next(iter(self._queues.items()))
+                head = queue[0]
+                delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(head.tokens))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                ticket = self._next_ticket()
+                if ticket.future.done():
+                    continue  # caller gave up while queued
+                self.request_bucket.take(1)
+                self.token_bucket.take(ticket.tokens)
+                self._active += 1
+                ticket.granted_at = time.monotonic()
+                wait = ticket.granted_at - ticket.enqueued_at
+                self._stats["granted"] += 1
+                self._stats["total_wait"] += wait
+                self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+                ticket.future.set_result(ticket)
+
+    async def acquire(self, session_id, tokens=0):
+        """Wait for permission to make a call estimated at `tokens` tokens"""
+        if self._queue_depth() >= self.max_queue_depth:
+            self._stats["rejected"] += 1
+            raise PipelineBusy(f"{self._queue_depth()} requests already waiting")
+        ticket = _Ticket(session_id, tokens, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(session_id, deque()).append(ticket)
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue_depth())
+        self._wake.set()
+        try:
+            return await ticket.future
+        except asyncio.CancelledError:
+            queue = self._queues.get(session_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[session_id]
+            elif ticket.future.done() and not ticket.future.cancelled():
+                self._release(ticket, None)  # granted just before the caller gave up
+            raise
+
+    def _release(self, ticket, actual_tokens):
+        self._active -= 1
+        if actual_tokens is not None:
+            # Settle the estimate against what the call really used
+            self.token_bucket.take(actual_tokens - ticket.tokens)
+        self._wake.set()
+
+    def release(self, ticket, actual_tokens=None):
+        """Free the ticket's concurrency slot (thread-safe)"""
+        self._loop.call_soon_threadsafe(self._release, ticket, actual_tokens)
+
+    @contextmanager
+    def slot(self, session_id, tokens=0, timeout=None):
+        """
+        Block the calling thread until the call may proceed, then hold a slot
+        until the block exits. Raises PipelineBusy if the queue is full, or
+        TimeoutError if not granted within `timeout` seconds.
+        Set `usage["tokens"]` on the yielded dict to report actual token usage.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.acquire(session_id, tokens), self._loop)
+        try:
+            ticket = future.result(timeout)
+        except BaseException:
+            # Timed out or interrupted: if the slot was granted meanwhile, too late to cancel, hand it back
+            if not future.cancel() and future.done() and not future.cancelled() and future.exception() is None:
+                self.release(future.result())
+            raise
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(ticket, usage["tokens"])
+
+    def stats(self):
+        """Queue depth, concurrency and wait-time metrics"""
+        def collect():
+            granted = self._stats["granted"]
+            return {
+                "queue_depth": self._queue_depth(),
+                "queued_sessions": len(self._queues),
+                "active": self._active,
+                "granted": granted,
+                "rejected": self._stats["rejected"],
+                "max_queue_depth": self._stats["max_queue_depth"],
+                "avg_wait_seconds": self._stats["total_wait"] / granted if granted else 0.0,
+                "max_wait_seconds": self._stats["max_wait"],
+            }
+        async def run():
+            return collect()
+        return asyncio.run_coroutine_threadsafe(run(), self._loop).result()
+
+# One pipeline per process, shared by all Streamlit sessions
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline(**kwargs):
+    """Create the process-wide request pipeline on first call and return it on every call"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = RequestPipeline(**kwargs)
+            logger.info(f"Started request pipeline ({kwargs})")
+        return _pipeline
@@ -0,0 +1,210 @@
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes (google.api_core exceptions carry them as .code) worth retrying
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+# attempts: total tries; delays grow base_delay * 2**n up to max_delay, with full jitter;
+# deadline: seconds for the whole call, retries included (None = no limit)
+RetryPolicy = namedtuple("RetryPolicy", ["attempts", "base_delay", "max_delay", "deadline"])
+
+class CircuitOpen(Exception):
+    """Raised without calling the API while a model's circuit breaker is open"""
+
+def is_retryable(error):
+    """Transient errors: rate limits, server errors, timeouts and dropped connections"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+class CircuitBreaker:
+    """
+    Stops calling a failing model for a while. After `failure_threshold`
+    consecutive transient failures the circuit opens and calls fail fast with
+    CircuitOpen. After `reset_after` seconds one probe call is let through;
+    its success closes the circuit, its failure opens it again.
+    """
+    def __init__(self, name, failure_threshold=5, reset_after=30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_after and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit {self.name} opened after {self.failures} consecutive failures")
+                self.opened_at = self.clock()
+            self.probing = False
+
+    def abandon(self):
+        """A call ended with no outcome (e.g. its caller went away); if it was the probe, count it as failed"""
+        with self._lock:
+            if self.probing:
+                self.opened_at = self.clock()
+                self.probing = False
+
+# One breaker per model name, shared by all sessions in the process
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name, **kwargs):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+def backoff_delay(policy, attempt, rng=random):
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return rng.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1)))
+
+def _remaining(deadline_at):
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+def _before_attempt(breaker):
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpen(f"{breaker.name} is failing; not calling it for now")
+
+def _after_failure(error, attempt, policy, breaker, deadline_at):
+    """Record a failed attempt and return the delay before the next one, or re-raise"""
+    retryable = is_retryable(error)
+    if breaker is not None and retryable:
+        breaker.record_failure()
+    elif breaker is not None:
+        # A non-retryable error (e.g. a bad request) still means the API is up
+        breaker.record_success()
+    if not retryable or attempt >= policy.attempts:
+        raise error
+    delay = backoff_delay(policy, attempt)
+    remaining = _remaining(deadline_at)
+    if remaining is not None and remaining <= delay:
+        raise error
+    logger.warning(f"Attempt {attempt}/{policy.attempts} failed ({error}); retrying in {delay:.2f}s")
+    return delay
+
+def call_with_retry(fn, policy, breaker=None, sleep=time.sleep):
+    """
+    Call fn(timeout) until it succeeds, retrying transient errors with backoff.
+    `timeout` is the time left before the policy deadline (None without one), for
+    fn to pass on as the request timeout. Non-retryable errors, and the last error
+    once attempts or the deadline run out, are raised unchanged.
+    """
+    deadline_at = time.monotonic() + policy.deadline if policy.deadline else None
+    for attempt in range(1, policy.attempts + 1):
+        _before_attempt(breaker)
+        try:
+            result = fn(_remaining(deadline_at))
+        except Exception as e:
+            sleep(_after_failure(e, attempt, policy, breaker, deadline_at))
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+def retry_stream(open_stream, policy, breaker=None, sleep=time.sleep):
+    """
+    Like call_with_retry() for a generator: open_stream(timeout) is re-opened on
+    transient errors raised before its first item. Once items have been yielded
+    an error is raised as-is, since the caller has already shown them.
+    """
+    deadline_at = time.monotonic() + policy.deadline if policy.deadline else None
+    for attempt in range(1, policy.attempts + 1):
+        _before_attempt(breaker)
+        started = False
+        try:
+            for item in open_stream(_remaining(deadline_at)):
+                started = True
+                yield item
+        except Exception as e:
+            if started:
+                # Settle the breaker either way, or a half-open probe would stay out forever
+                if breaker is not None and is_retryable(e):
+                    breaker.record_failure()
+                elif breaker is not None:
+                    breaker.record_success()  # the API answered; the error is the stream's own
+                raise
+            sleep(_after_failure(e, attempt, policy, breaker, deadline_at))
+            continue
+        except BaseException:
+            # GeneratorExit when the caller stops reading (e.g. the client disconnected)
+            if breaker is not None:
+                breaker.abandon()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return
+
+# Workers for hedged requests; losers run to completion in the background
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+def _discard_with(on_discard):
+    def callback(future):
+        if not future.cancelled() and future.exception() is None:
+            on_discard(future.result())
+    return callback
+
+def hedged_call(fn, hedge_after, max_hedges=1, on_hedge=None, on_discard=None):
+    """
+    Call fn(); if it has not finished after `hedge_after` seconds, start another
+    identical call (up to `max_hedges` extra) and return whichever succeeds first.
+    Trims long-tail latency at the price of paying for the duplicate calls:
+    on_discard(result) gets each losing call's result once it finishes (on its
+    worker thread), so its cost can be recorded too.
+    The first error is raised only once every call has failed.
+    """
+    futures = [_hedge_executor.submit(fn)]
+    hedges = 0
+    errors = []
+    while futures:
+        done, _ = wait(futures, timeout=hedge_after if hedges < max_hedges else None, return_when=FIRST_COMPLETED)
+        if not done:
+            hedges += 1
+            if on_hedge:
+                on_hedge(hedges)
+            futures.append(_hedge_executor.submit(fn))
+            continue
+        for future in done:
+            futures.remove(future)
+            if future.exception() is None:
+                if on_discard:
+                    for loser in futures:
+                        loser.add_done_callback(_discard_with(on_discard))
+                return future.result()
+            errors.append(future.exception())
+    raise errors[0]
@@ -0,0 +1,177 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from answer_cache import cosine_similarity, normalize_question
+from single_flight import run_once
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+CHUNK_MAX_CHARS = 1200
+CHUNK_OVERLAP_SENTENCES = 1
+# Telugu words carry long case/plural suffixes; also index a short stem so
+# inflected forms of the same word still match
+TELUGU_STEM_CHARS = 4
+
+# Sentence ends: Latin punctuation, Devanagari/Telugu dandas, blank lines
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n\s*\n")
+
+def extract_pages(pdf_path):
+    """Extract the text of each PDF page (requires pypdf)"""
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("Retrieval mode needs pypdf: pip install pypdf") from e
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+def _is_telugu(token):
+    return any("ఀ" <= ch <= "౿" for ch in token)
+
+def tokenize(text):
+    """Normalized word tokens, plus stems for Telugu words"""
+    tokens = []
+    for word in normalize_question(text).split():
+        tokens.append(word)
+        if _is_telugu(word) and len(word) > TELUGU_STEM_CHARS:
+            tokens.append(word[:TELUGU_STEM_CHARS] + "*")
+    return tokens
+
+def chunk_pages(pages, max_chars=CHUNK_MAX_CHARS, overlap=CHUNK_OVERLAP_SENTENCES):
+    """Split page texts into sentence-aligned chunks of at most ~max_chars, never crossing pages"""
+    chunks = []
+    for page_number, text in enumerate(pages, start=1):
+        sentences = [s.strip() for s in SENTENCE_END.split(text) if s and s.strip()]
+        current = []
+        for sentence in sentences:
+            if current and sum(len(s) + 1 for s in current) + len(sentence) > max_chars:
+                chunks.append({"page": page_number, "text": " ".join(current)})
+                current = current[-overlap:] if overlap else []
+            current.append(sentence[:max_chars])
+        if current:
+            chunks.append({"page": page_number, "text": " ".join(current)})
+    return chunks
+
+class RetrievalIndex:
+    """BM25 over PDF chunks, optionally fused with embedding similarity"""
+    def __init__(self, chunks, chunk_tokens, embeddings=None, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.chunk_tokens = chunk_tokens
+        self.embeddings = embeddings
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokens) for tokens in chunk_tokens]
+        self.doc_freq = Counter()
+        for term_freq in self.term_freqs:
+            self.doc_freq.update(term_freq.keys())
+        self.avg_len = sum(len(t) for t in chunk_tokens) / len(chunk_tokens) if chunk_tokens else 0.0
+
+    @classmethod
+    def build(cls, pages, embed_documents=None):
+        chunks = chunk_pages(pages)
+        embeddings = embed_documents([c["text"] for c in chunks]) if embed_documents and chunks else None
+        return cls(chunks, [tokenize(c["text"]) for c in chunks], embeddings)
+
+    def _idf(self, term):
+        n = len(self.chunks)
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def bm25_scores(self, query_tokens):
+        scores = []
+        for tokens, term_freq in zip(self.chunk_tokens, self.term_freqs):
+            length_norm = self.k1 * (1 - self.b + self.b * len(tokens) / (self.avg_len or 1))
+            score = 0.0
+            for term in query_tokens:
+                tf = term_freq.get(term, 0)
+                if tf:
+                    score += self._idf(term) * tf * (self.k1 + 1) / (tf + length_norm)
+            scores.append(score)
+        return scores
+
+    def search(self, query, k=5, query_embedding=None):
+        """Top-k chunks for the query; BM25 and embedding rankings are merged by reciprocal rank fusion"""
+        if not self.chunks:
+            return []
+        bm25 = self.bm25_scores(tokenize(query))
+        rankings = [sorted(range(len(bm25)), key=lambda i: -bm25[i])]
+        if self.embeddings and query_embedding is not None:
+            similarity = [cosine_similarity(query_embedding, e) for e in self.embeddings]
+            rankings.append(sorted(range(len(similarity)), key=lambda i: -similarity[i]))
+
+        fused = Counter()
+        for ranking in rankings:
+            for rank, i in enumerate(ranking):
+                fused[i] += 1 / (60 + rank)
+        return [self.chunks[i] for i, _ in fused.most_common(k)]
+
+    def save(self, path):
+        data = {
+            "version": INDEX_VERSION,
+            "chunks": self.chunks,
+            "chunk_tokens": self.chunk_tokens,
+            "embeddings": self.embeddings,
+        }
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Index {path} has version {data.get('version')}, expected {INDEX_VERSION}")
+        return cls(data["chunks"], data["chunk_tokens"], data.get("embeddings"))
+
+def format_context(chunks):
+    """Render retrieved chunks for the prompt, citing their pages"""
+    return "\n\n".join(f"[Page {c['page']}] {c['text']}" for c in chunks)
+
+# Process-wide indexes: pdf hash -> RetrievalIndex
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(pdf_path, pdf_hash, index_dir, embed_documents=None):
+    """
+    Load the on-disk index for this PDF version, building and persisting it on first use.
+    Built once per PDF version across sessions and processes.
+    """
+    with _indexes_lock:
+        if pdf_hash in _indexes:
+            return _indexes[pdf_hash]
+
+    os.makedirs(index_dir, exist_ok=True)
+    suffix = "embed" if embed_documents else "bm25"
+    index_path = os.path.join(index_dir, f"{pdf_hash}.{suffix}.json")
+
+    def load_existing():
+        if os.path.exists(index_path):
+            try:
+                return RetrievalIndex.load(index_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Rebuilding unreadable index {index_path}: {e}")
+        return None
+
+    def build():
+        started = time.perf_counter()
+        index = RetrievalIndex.build(extract_pages(pdf_path), embed_documents)
+        index.save(index_path)
+        logger.info(f"Built retrieval index for {pdf_path}: {len(index.chunks)} chunks in {time.perf_counter() - started:.2f}s")
+        return index
+
+    index = load_existing()
+    if index is None:
+        index, _ = run_once(f"retrieval_index:{pdf_hash}", build, lock_path=index_path, check_existing=load_existing)
+
+    with _indexes_lock:
+        _indexes[pdf_hash] = index
+    return index
@@ -0,0 +1,139 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+from cost_ledger import connect
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer BLOB NOT NULL,
+    PRIMARY KEY (session_id, turn)
+) WITHOUT ROWID;
+"""
+
+UPSERT_SESSION = """
+INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET
+    summary = excluded.summary,
+    turns = excluded.turns,
+    updated_at = excluded.updated_at
+"""
+
+class TurnConflict(Exception):
+    """The turn number is taken: another copy of the session (e.g. on another engine worker) stored turns first"""
+
+def compress(text, level=6):
+    return zlib.compress(text.encode("utf-8"), level)
+
+def decompress(data):
+    return zlib.decompress(data).decode("utf-8")
+
+class SessionStore:
+    """
+    Chat sessions kept on disk so conversations survive restarts and can be dropped
+    from memory: one row per session (document, running summary, turn count) and
+    one per turn with the answer zlib-compressed.
+
+    A session is only written once it has a turn, so visitors who never ask
+    anything leave nothing behind. Writes are one small transaction per turn.
+    """
+    def __init__(self, path, compress_level=6, clock=time.time):
+        self.path = path
+        self.compress_level = compress_level
+        self.clock = clock
+        self._connection = connect(path)
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()  # the connection is shared by every session's thread
+
+    def load(self, session_id):
+        """{"document", "summary", "turns"} of a stored session, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT document, summary, turns FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        document, summary, turns = row
+        return {"document": document, "summary": json.loads(summary), "turns": turns}
+
+    def turns(self, session_id, start=0, end=None):
+        """(question, answer) turns start..end-1 of a session, oldest first"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT question, answer FROM turns WHERE session_id = ? AND turn >= ? AND turn < ? ORDER BY turn",
+                (session_id, start, end if end is not None else 2 ** 62),
+            ).fetchall()
+        return [(question, decompress(answer)) for question, answer in rows]
+
+    def append_turn(self, session_id, document, turn, question, answer, summary):
+        """
+        Record turn number `turn` (0-based) together with the session's current summary state.
+        Raises TurnConflict unless it is the session's next turn in the store, so two copies
+        of a session never overwrite each other's turns or set the turn count back.
+        """
+        now = self.clock()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT turns FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            stored = row[0] if row else 0
+            if stored != turn:
+                raise TurnConflict(f"Session {session_id} has {stored} stored turns, not {turn}")
+            try:
+                self._connection.execute("INSERT INTO turns VALUES (?, ?, ?, ?)",
+                                         (session_id, turn, question, compress(answer, self.compress_level)))
+            except sqlite3.IntegrityError as e:  # another process stored it since the SELECT
+                raise TurnConflict(f"Turn {turn} of session {session_id} is already stored") from e
+            self._connection.execute(UPSERT_SESSION, (session_id, document, json.dumps(summary), turn + 1, now, now))
+
+    def delete(self, session_id):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def prune(self, max_idle_seconds):
+        """Delete sessions untouched for longer than `max_idle_seconds`; returns how many"""
+        cutoff = self.clock() - max_idle_seconds
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)", (cutoff,))
+            return self._connection.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+    def stats(self):
+        with self._lock:
+            sessions, = self._connection.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            turns, answer_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(answer)), 0) FROM turns").fetchone()
+        return {"sessions": sessions, "turns": turns, "answer_bytes": answer_bytes}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store(path, **kwargs):
+    """Open the process-wide session store on first call and return it on every call"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(path, **kwargs)
+            atexit.register(_store.close)
+            logger.info(f"Storing chat sessions in {path}")
+        return _store
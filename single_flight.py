@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+# How often waiters wake up to report progress
+WAIT_POLL_SECONDS = 0.5
+
+class _Call:
+    """An in-flight call that other threads can wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.started_at = time.monotonic()
+        self.progress = "Starting..."
+        self.result = None
+        self.error = None
+
+# Process-wide in-flight calls: key -> _Call
+_calls = {}
+_lock = threading.Lock()
+
+def set_progress(key, message):
+    """Publish a progress message from the leader to everyone waiting on `key`"""
+    with _lock:
+        call = _calls.get(key)
+    if call:
+        call.progress = message
+
+def _wait_for_leader(call, on_wait):
+    while not call.done.wait(WAIT_POLL_SECONDS):
+        if on_wait:
+            on_wait(call.progress, time.monotonic() - call.started_at)
+    if call.error is not None:
+        raise call.error
+    return call.result
+
+def _lead(key, fn, lock_path, check_existing, on_wait):
+    """Run `fn` once across processes, unless `check_existing` finds a result first"""
+    if lock_path is None:
+        return fn(), True
+
+    started_at = time.monotonic()
+    while True:
+        try:
+            with file_lock(lock_path, timeout=WAIT_POLL_SECONDS):
+                # Another process may have finished while we were waiting for the lock
+                existing = check_existing() if check_existing else None
+                if existing is not None:
+                    logger.info(f"Single-flight {key}: reusing result created by another process")
+                    return existing, False
+                return fn(), True
+        except TimeoutError:
+            set_progress(key, "Waiting for another worker to finish...")
+            if on_wait:
+                on_wait("Waiting for another worker to finish...", time.monotonic() - started_at)
+
+def run_once(key, fn, lock_path=None, check_existing=None, on_wait=None):
+    """
+    Run `fn` for `key` so that concurrent callers share a single execution.
+
+    Threads in this process wait for the first caller's result. If `lock_path` is
+    given, processes are serialized on a file lock and `check_existing` is called
+    after acquiring it so later processes pick up the result instead of redoing it.
+    `on_wait(progress_message, elapsed_seconds)` is called periodically while waiting.
+
+    Returns (result, created) where created is True only for the caller that ran `fn`.
+    """
+    with _lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        logger.info(f"Single-flight {key}: waiting for in-flight call")
+        return _wait_for_leader(call, on_wait), False
+
+    try:
+        call.result, created = _lead(key, fn, lock_path, check_existing, on_wait)
+        return call.result, created
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.done.set()
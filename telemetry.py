@@ -0,0 +1,157 @@
+import argparse
+import atexit
+import glob
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_LOGGER = "telemetry.api_calls"  # not this module's own logger, whose messages go to the app log
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: the record's `telemetry` fields plus a UTC timestamp"""
+    def format(self, record):
+        fields = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")}
+        fields.update(getattr(record, "telemetry", {}))
+        return json.dumps(fields, ensure_ascii=False, default=str)
+
+# One listener per process, shared by all sessions
+_listener = None
+_lock = threading.Lock()
+
+def start_telemetry(path, max_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    Route telemetry records through a queue to a size-rotated JSON-lines file.
+    The request path only enqueues; a listener thread does the disk writes.
+    Safe to call on every rerun: the handlers are attached once per process.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonLinesFormatter())
+            records = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(records, file_handler)
+            _listener.start()
+            atexit.register(stop_telemetry)
+
+            telemetry_logger = logging.getLogger(TELEMETRY_LOGGER)
+            telemetry_logger.setLevel(logging.INFO)
+            telemetry_logger.propagate = False  # keep JSON out of api_calls.log and the console
+            telemetry_logger.addHandler(logging.handlers.QueueHandler(records))
+            logger.info(f"Writing API call telemetry to {path}")
+    return logging.getLogger(TELEMETRY_LOGGER)
+
+def stop_telemetry():
+    """Write out everything still queued and detach the handlers"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+            telemetry_logger = logging.getLogger(TELEMETRY_LOGGER)
+            for handler in list(telemetry_logger.handlers):
+                telemetry_logger.removeHandler(handler)
+
+def record_event(event, **fields):
+    """Queue one telemetry record for the JSON-lines file set up by start_telemetry()"""
+    logging.getLogger(TELEMETRY_LOGGER).info(event, extra={"telemetry": {"event": event, **fields}})
+
+def read_records(path):
+    """Records from `path` and its rotated backups, oldest file first"""
+    backups = [p for p in glob.glob(f"{path}.*") if p.rsplit(".", 1)[1].isdigit()]
+    for file_path in sorted(backups, key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True):
+        yield from _read_file(file_path)
+    yield from _read_file(path)
+
+def _read_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+    except FileNotFoundError:
+        return
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(records, group_by="operation"):
+    """Per-group call counts, throughput, latency percentiles, tokens, cost and cost per hour"""
+    groups = defaultdict(list)
+    for record in records:
+        if record.get("event") == "api_call":
+            groups[record.get(group_by) or "-"].append(record)
+
+    summary = {}
+    for key, items in sorted(groups.items()):
+        times = [datetime.fromisoformat(r["ts"]).timestamp() for r in items]
+        hours = max((max(times) - min(times)) / 3600, 1 / 60)  # at least a minute
+        latencies = [r["latency_s"] for r in items if r.get("latency_s") is not None]
+        cost = sum(r.get("cost", 0.0) for r in items)
+        hits = sum(1 for r in items if r.get("answer_cache_hit"))
+        translation_hits = sum(1 for r in items if r.get("translation_cache_hit"))
+        summary[key] = {
+            "calls": len(items),
+            "calls_per_minute": len(items) / (hours * 60),
+            "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95),
+            "p99_s": percentile(latencies, 99),
+            "input_tokens": sum(r.get("input_tokens", 0) for r in items),
+            "cached_tokens": sum(r.get("cached_tokens", 0) for r in items),
+            "output_tokens": sum(r.get("output_tokens", 0) for r in items),
+            "answer_cache_hits": hits,
+            "translation_cache_hits": translation_hits,
+            # for operation "Question Answering": share served by the bank or cache; for "Translation": by the translation cache
+            "hit_rate": (hits + translation_hits) / len(items),
+            "output_tokens_saved": sum(r.get("output_tokens_saved") or 0 for r in items),
+            "cost_saved": sum(r.get("cost_saved") or 0.0 for r in items),
+            "cost": cost,
+            "cost_per_hour": cost / hours,
+        }
+    return summary
+
+# Query the telemetry log from the command line, e.g.
+# python telemetry.py api_telemetry.jsonl --since 24 --by session_id
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate API call telemetry")
+    parser.add_argument("path", nargs="?", default="api_telemetry.jsonl")
+    parser.add_argument("--since", type=float, help="only the last N hours")
+    parser.add_argument("--by", default="operation", help="field to group by (operation, operation_type, language, document, session_id)")
+    args = parser.parse_args()
+
+    records = read_records(args.path)
+    if args.since:
+        cutoff = time.time() - args.since * 3600
+        records = (r for r in records if datetime.fromisoformat(r["ts"]).timestamp() >= cutoff)
+    summary = summarize(records, args.by)
+    if not summary:
+        print("No API calls recorded")
+        return
+
+    seconds = lambda value: "-" if value is None else f"{value:.2f}s"
+    print(f"{args.by:<24} {'calls':>6} {'/min':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'in tok':>10} "
+          f"{'cached tok':>12} {'out tok':>9} {'saved tok':>10} {'hits':>5} {'tr hits':>7} {'hit %':>6} {'cost':>10} {'saved $':>10} {'$/hour':>9}")
+    for key, row in summary.items():
+        print(f"{str(key)[:24]:<24} {row['calls']:>6} {row['calls_per_minute']:>7.2f} {seconds(row['p50_s']):>7} "
+              f"{seconds(row['p95_s']):>7} {seconds(row['p99_s']):>7} {row['input_tokens']:>10,} "
+              f"{row['cached_tokens']:>12,} {row['output_tokens']:>9,} {row['output_tokens_saved']:>10,} {row['answer_cache_hits']:>5} "
+              f"{row['translation_cache_hits']:>7} {row['hit_rate'] * 100:>5.1f}% ${row['cost']:>9.4f} ${row['cost_saved']:>9.4f} ${row['cost_per_hour']:>8.4f}")
+
+if __name__ == "__main__":
+    main()
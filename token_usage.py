@@ -0,0 +1,41 @@
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# prompt_tokens includes the cached PDF; input_tokens is only what was sent fresh
+TokenUsage = namedtuple("TokenUsage", ["prompt_tokens", "cached_tokens", "output_tokens"])
+TokenUsage.input_tokens = property(lambda self: max(self.prompt_tokens - self.cached_tokens, 0))
+
+# Rough characters-per-token ratios used when no tokenizer is reachable.
+# Latin text averages ~4 characters per token; Telugu script splits much finer.
+ASCII_CHARS_PER_TOKEN = 4
+NON_ASCII_CHARS_PER_TOKEN = 1.5
+
+def usage_from_metadata(usage_metadata):
+    """Build a TokenUsage from a generate_content response's usage_metadata (None if missing)"""
+    if usage_metadata is None:
+        return None
+    prompt_tokens = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    if not prompt_tokens:
+        return None
+    return TokenUsage(
+        prompt_tokens=prompt_tokens,
+        cached_tokens=getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+        output_tokens=getattr(usage_metadata, "candidates_token_count", 0) or 0,
+    )
+
+def _as_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(_as_text(part) for part in contents)
+
+def approximate_tokens(contents):
+    """
+    Estimate tokens locally for a string or list of strings. Not memoized: a whole
+    conversation rarely repeats, and counting is one linear pass in C.
+    """
+    text = _as_text(contents)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    non_ascii_chars = len(text) - ascii_chars
+    return int(ascii_chars / ASCII_CHARS_PER_TOKEN + non_ascii_chars / NON_ASCII_CHARS_PER_TOKEN)
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Answer languages: the label each is shown under, and its rough output size in tokens
+# relative to English (Telugu script takes more tokens for the same text), used to
+# estimate what a single-language answer saves over a bilingual one
+LANGUAGES = {
+    "english": {"label": "English (Formal)", "token_ratio": 1.0},
+    "telugu": {"label": "Telugu (Formal)", "token_ratio": 2.0},
+}
+OUTPUT_LANGUAGES = ("english", "telugu", "both")
+
+def other_language(language):
+    return "telugu" if language == "english" else "english"
+
+def answer_prompt(question, language):
+    """Prompt for an answer in one language (the bilingual prompt asked for both in one pass)"""
+    name = language.capitalize()
+    return f"""
+    Please answer the following question in formal {name} only:
+
+    Question: {question}
+
+    Give only the answer, without a heading. Make sure it is comprehensive, professional and complete.
+    """
+
+def translation_prompt(text, language):
+    name = language.capitalize()
+    return f"""
+    Translate the following answer into formal {name}. Keep its structure (paragraphs, lists, numbers)
+    and give only the translation, without a heading or notes.
+
+    {text}
+    """
+
+def estimated_tokens_saved(output_tokens, language):
+    """Output tokens the other language would have cost had this answer been bilingual"""
+    other = other_language(language)
+    return int(output_tokens * LANGUAGES[other]["token_ratio"] / LANGUAGES[language]["token_ratio"])
+
+def labelled(language, text):
+    return f"{LANGUAGES[language]['label']}:\n{text}"
+
+class TranslationCache:
+    """
+    Translations keyed on (target language, SHA-256 of the source text), least
+    recently used evicted past `max_entries`. Answers shared through the answer
+    cache or bank have identical text, so they share the translation too.
+    """
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> {"text", "output_tokens", "cost"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_output_tokens = 0
+        self.saved_cost = 0.0
+
+    @staticmethod
+    def _key(text, language):
+        return language, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text, language):
+        """The cached translation entry, or None"""
+        key = self._key(text, language)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_output_tokens += entry["output_tokens"]
+            self.saved_cost += entry["cost"]
+            return entry
+
+    def put(self, text, language, translation, output_tokens, cost):
+        key = self._key(text, language)
+        with self._lock:
+            self._entries[key] = {"text": translation, "output_tokens": output_tokens, "cost": cost}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "saved_output_tokens": self.saved_output_tokens,
+                "saved_cost": self.saved_cost,
+            }
+
+# One translation cache per process, shared by all sessions
+_translation_cache = None
+_translation_cache_lock = threading.Lock()
+
+def get_translation_cache(**kwargs):
+    global _translation_cache
+    with _translation_cache_lock:
+        if _translation_cache is None:
+            _translation_cache = TranslationCache(**kwargs)
+        return _translation_cache